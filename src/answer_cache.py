@@ -0,0 +1,147 @@
+"""
+このファイルは、似た質問に対する回答を使い回すためのキャッシュ（セマンティックキャッシュ）が記述されたファイルです。
+"""
+
+############################################################
+# ライブラリの読み込み
+############################################################
+import threading
+import time
+from collections import OrderedDict
+from itertools import count
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+############################################################
+# クラス定義
+############################################################
+class SemanticAnswerCache:
+    """
+    「モード」「質問文に含まれる固有の語」と「質問文の埋め込みベクトル」をキーに、LLMの回答と参照元ドキュメントを保持するキャッシュ
+
+    - 同じモード・同じ固有の語で、コサイン類似度がしきい値以上の質問がキャッシュにあれば、その回答を返す
+      （「営業部の〜」と「人事部の〜」のように、埋め込みでは近くても答えが異なる質問を取り違えないよう、
+      部署名などの固有の語は完全一致を条件とする）
+    - インデックスのバージョン（再取り込みのたびに変わる）が保存時と異なるエントリーは使わずに破棄する
+    - 保存から一定時間（TTL）が経過したエントリーは破棄し、件数の上限を超えた場合は最も使われていないものから破棄する
+    """
+
+    def __init__(self, similarity_threshold: float, ttl_seconds: float, max_entries: int):
+        """
+        Args:
+            similarity_threshold: キャッシュを使うコサイン類似度の下限
+            ttl_seconds: エントリーの有効期間（秒）
+            max_entries: 保持するエントリー数の上限
+        """
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._ids = count()
+        self._index_version = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def _sync_index_version(self, index_version: int):
+        # インデックスが更新されていれば、それ以前の回答はすべて破棄する
+        if index_version != self._index_version:
+            self._entries.clear()
+            self._index_version = index_version
+
+    def _purge_expired(self, now: float):
+        expired = [key for key, entry in self._entries.items() if now - entry["created_at"] > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+
+    def lookup(
+        self,
+        mode: str,
+        query_vector: List[float],
+        index_version: int,
+        entities: Tuple[str, ...] = ()
+    ) -> Optional[Dict]:
+        """
+        似た質問に対する回答をキャッシュから取得
+
+        Args:
+            mode: 回答モード
+            query_vector: 質問文の埋め込みベクトル
+            index_version: 現在のインデックスのバージョン
+            entities: 質問文に含まれる固有の語（部署名・数値など。すべて一致するエントリーのみを対象とする）
+
+        Returns:
+            「answer」「context」「similarity」をキーとする辞書（該当がない場合はNone）
+        """
+        query = self._normalize(query_vector)
+        now = time.time()
+        with self._lock:
+            self._sync_index_version(index_version)
+            self._purge_expired(now)
+
+            candidates = [
+                (key, entry) for key, entry in self._entries.items()
+                if entry["mode"] == mode and entry["entities"] == tuple(entities)
+            ]
+            if not candidates:
+                self.misses += 1
+                return None
+
+            similarities = np.stack([entry["vector"] for _, entry in candidates]) @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            key, entry = candidates[best]
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return {"answer": entry["answer"], "context": entry["context"], "similarity": float(similarities[best])}
+
+    def store(
+        self,
+        mode: str,
+        query_vector: List[float],
+        index_version: int,
+        answer: str,
+        context: List,
+        entities: Tuple[str, ...] = ()
+    ):
+        """
+        回答をキャッシュに保存
+
+        Args:
+            mode: 回答モード
+            query_vector: 質問文の埋め込みベクトル
+            index_version: 回答時点のインデックスのバージョン
+            answer: LLMからの回答
+            context: 回答の根拠となったドキュメント
+            entities: 質問文に含まれる固有の語
+        """
+        with self._lock:
+            self._sync_index_version(index_version)
+            self._entries[next(self._ids)] = {
+                "mode": mode,
+                "entities": tuple(entities),
+                "vector": self._normalize(query_vector),
+                "answer": answer,
+                "context": context,
+                "created_at": time.time()
+            }
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        すべてのエントリーを破棄
+        """
+        with self._lock:
+            self._entries.clear()
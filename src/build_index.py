@@ -0,0 +1,127 @@
+"""
+このファイルは、Webアプリとは別に、社員名簿用・全体用のインデックスを事前に構築するコマンドです。
+
+新しいバージョンのフォルダにインデックスを構築し、検証に成功した場合のみ「現在のバージョン」を切り替えます。
+構築・検証に失敗した場合は切り替えないため、アプリは前回のインデックスを使い続けます。
+
+使い方（srcフォルダと同じ階層で実行）:
+    python src/build_index.py                 # 現在のバージョンをコピーし、変更のあったデータソースのみ取り込む
+    python src/build_index.py --full-rebuild  # すべてのデータソースを取り込み直す
+"""
+
+############################################################
+# ライブラリの読み込み
+############################################################
+import argparse
+import logging
+import sys
+import time
+
+import constants as ct
+from embedding_cache import CachedEmbeddings, create_embeddings
+from index_builder import create_text_splitter, find_employee_csv_path, get_index_metadata, sync_vectorstores
+from retriever_modules.index_store import IndexStore
+from retriever_modules.retriever_factory import open_persisted_vectorstore
+
+
+############################################################
+# 関数定義
+############################################################
+def initialize_cli_logger():
+    """
+    コマンド実行時のログ出力の設定（ログをターミナルに表示する）
+    """
+    logger = logging.getLogger(ct.LOGGER_NAME)
+    if logger.hasHandlers():
+        return
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("[%(levelname)s] %(asctime)s %(message)s"))
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+
+
+def validate_index(db_path, embeddings):
+    """
+    構築したインデックスに、社員名簿用・全体用のどちらのコレクションにもチャンクが登録されているかを確認
+
+    Args:
+        db_path: 構築したインデックスの保存先
+        embeddings: 埋め込みモデル
+
+    Returns:
+        「コレクション名: 登録チャンク数」の辞書
+    """
+    counts = {}
+    for collection_name in (ct.EMPLOYEE_COLLECTION_NAME, ct.FULL_COLLECTION_NAME):
+        vectordb = open_persisted_vectorstore(db_path, collection_name, embeddings=embeddings)
+        counts[collection_name] = len(vectordb.get(include=[])["ids"])
+        if counts[collection_name] == 0:
+            raise ValueError(f"コレクション「{collection_name}」にチャンクが1件も登録されていません")
+    return counts
+
+
+def build_index(full_rebuild=False, keep_versions=None):
+    """
+    インデックスを新しいバージョンとして構築し、検証に成功したら現在のバージョンを切り替える
+
+    Args:
+        full_rebuild: Trueの場合、現在のバージョンを引き継がずにすべてのデータソースを取り込み直す
+        keep_versions: 残すバージョン数（省略時は「PREBUILT_INDEX_KEEP_VERSIONS」）
+
+    Returns:
+        成功した場合はTrue
+    """
+    store = IndexStore(ct.PREBUILT_INDEX_DIR_PATH)
+    if not store.acquire_build_lock():
+        print(f"❌ ほかのインデックス構築が実行中です（終了済みの場合は「{store.LOCK_FILE_NAME}」を削除してください）")
+        return False
+
+    version = None
+    try:
+        started = time.monotonic()
+        version = store.create_version(base_on_current=not full_rebuild)
+        db_path = store.version_path(version)
+        print(f"インデックスを構築しています: {db_path}")
+
+        embeddings = create_embeddings()
+        text_splitter, chunking_signature = create_text_splitter()
+        sync_vectorstores(
+            db_path,
+            embeddings,
+            text_splitter,
+            chunking_signature,
+            find_employee_csv_path(),
+            lambda fraction, message: print(f"  [{fraction:>4.0%}] {message}")
+        )
+        if isinstance(embeddings, CachedEmbeddings):
+            embeddings.log_stats("インデックス構築時の埋め込みキャッシュ")
+
+        counts = validate_index(db_path, embeddings)
+        # アプリは、構築時の設定が自身の設定と一致するバージョンのみを使う
+        store.write_metadata(version, {**get_index_metadata(chunking_signature), "counts": counts})
+        store.publish(version)
+        # 実行中のアプリが開いている古いバージョンは、リースが切れるまで削除しない
+        removed = store.prune(keep_versions or ct.PREBUILT_INDEX_KEEP_VERSIONS, ct.PREBUILT_INDEX_LEASE_SECONDS)
+    except Exception as e:
+        if version is not None:
+            store.discard(version)
+        print(f"❌ インデックスの構築に失敗しました（現在のバージョンは変更していません）: {e}")
+        return False
+    finally:
+        store.release_build_lock()
+
+    print(f"✅ インデックスを構築しました: {version}（{time.monotonic() - started:.1f}秒, {counts}）")
+    if removed:
+        print(f"古いバージョンを削除しました: {', '.join(removed)}")
+    print("アプリケーションを再起動すると、新しいインデックスが使われます")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="社員名簿用・全体用のインデックスを事前に構築します")
+    parser.add_argument("--full-rebuild", action="store_true", help="すべてのデータソースを取り込み直す")
+    parser.add_argument("--keep", type=int, default=None, help="残すバージョン数（現在のバージョンを含む）")
+    args = parser.parse_args()
+
+    initialize_cli_logger()
+    sys.exit(0 if build_index(full_rebuild=args.full_rebuild, keep_versions=args.keep) else 1)
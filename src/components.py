@@ -14,8 +14,22 @@ import constants as ct
 # 関数定義
 ############################################################
 
-def display_app_title():
-    st.markdown(f"## {ct.APP_NAME}")
+@st.fragment(run_every=ct.INDEX_STATUS_REFRESH_SECONDS)
+def display_index_status(index_ready=False):
+    """
+    検索用データの準備中に、進み具合を表示（一定間隔でこの部分のみ再描画し、準備が終わったら画面全体を再読み込み）
+
+    Args:
+        index_ready: 画面の読み込み時点で、取り込み済みのデータのみを検索できるretrieverが使えたかどうか
+    """
+    registry = utils.get_retriever_registry()
+    # 取り込みが完了した場合と、取り込み途中のretrieverが新たに使えるようになった場合に画面全体を再読み込み
+    if registry.is_complete or registry.error is not None or (registry.is_ready and not index_ready):
+        st.rerun()
+
+    fraction, message = registry.progress
+    status_message = ct.INDEX_PARTIAL_MESSAGE if index_ready else ct.INDEX_WARMUP_MESSAGE
+    st.progress(fraction, text=f"{status_message}（{message}）" if message else status_message)
 
 
 def display_select_mode():
@@ -147,10 +161,8 @@ def display_search_llm_response(llm_response):
 
         # ドキュメントが2件以上検索できた場合（サブドキュメントが存在する場合）のみ、サブドキュメントのありかを一覧表示
         # 「source_documents」内のリストの2番目以降をスライスで参照（2番目以降がなければfor文内の処理は実行されない）
-        for document in llm_response["context"][1:]:
-            # ドキュメントのファイルパスを取得
-            sub_file_path = document.metadata["source"]
-
+        # 重複チャンクとして統合されたほかの参照元も、サブドキュメントとして表示する
+        for sub_file_path, sub_page in list(utils.iter_document_sources(llm_response["context"]))[1:]:
             # メインドキュメントのファイルパスと重複している場合、処理をスキップ（表示しない）
             if sub_file_path == main_file_path:
                 continue
@@ -163,9 +175,9 @@ def display_search_llm_response(llm_response):
             duplicate_check_list.append(sub_file_path)
             
             # ページ番号が取得できない場合のための分岐処理
-            if "page" in document.metadata:
+            if sub_page is not None:
                 # ページ番号を取得
-                sub_page_number = document.metadata["page"] + 1
+                sub_page_number = sub_page + 1
                 # 「サブドキュメントのファイルパス」と「ページ番号」の辞書を作成
                 sub_choice = {"source": sub_file_path, "page_number": sub_page_number}
             else:
@@ -232,7 +244,77 @@ def display_search_llm_response(llm_response):
 def display_contact_llm_response(llm_response):
     st.markdown(llm_response["answer"])
 
-    result_docs = llm_response.get("context", [])
+    message, file_info_list = display_contact_sources(llm_response["context"], llm_response["answer"])
+
+    content = {}
+    content["mode"] = ct.ANSWER_MODE_2
+    content["answer"] = llm_response["answer"]
+    if llm_response["answer"] != ct.INQUIRY_NO_MATCH_ANSWER:
+        content["message"] = message
+        content["file_info_list"] = file_info_list
+
+    return content
+
+
+def display_contact_llm_response_stream(response_events):
+    """
+    「社内問い合わせ」モードにおけるLLMレスポンスを、生成されたトークンから順次表示
+
+    参照元の一覧は検索が完了した時点で表示し、回答はその上に逐次書き足していく
+
+    Args:
+        response_events: 「utils.stream_llm_response」が返すイベント（「context」「answer」）のイテレーター
+
+    Returns:
+        LLMからの回答を画面表示用に整形した辞書データ
+    """
+    answer_area = st.container()
+    sources_area = st.empty()
+    llm_response = {"context": [], "answer": ""}
+    file_info = {"message": None, "file_info_list": []}
+
+    def answer_tokens():
+        waiting_area = answer_area.empty()
+        waiting_area.caption(ct.SPINNER_TEXT)
+        for kind, value in response_events:
+            if kind == "context":
+                # 検索が完了した時点で、回答の生成を待たずに参照元を表示
+                llm_response["context"] = value
+                with sources_area.container():
+                    file_info["message"], file_info["file_info_list"] = display_contact_sources(value, None)
+            else:
+                waiting_area.empty()
+                yield value
+        waiting_area.empty()
+
+    llm_response["answer"] = answer_area.write_stream(answer_tokens())
+
+    # 情報が見つからなかった旨の回答の場合、先に表示した参照元を取り下げる
+    if llm_response["answer"] == ct.INQUIRY_NO_MATCH_ANSWER:
+        with sources_area.container():
+            display_contact_sources(llm_response["context"], llm_response["answer"])
+
+    content = {}
+    content["mode"] = ct.ANSWER_MODE_2
+    content["answer"] = llm_response["answer"]
+    if llm_response["answer"] != ct.INQUIRY_NO_MATCH_ANSWER:
+        content["message"] = file_info["message"]
+        content["file_info_list"] = file_info["file_info_list"]
+
+    return content
+
+
+def display_contact_sources(result_docs, answer):
+    """
+    「社内問い合わせ」モードにおける、該当社員数と参照元の一覧を表示
+
+    Args:
+        result_docs: 回答の根拠として検索されたドキュメント
+        answer: LLMからの回答（ストリーミング中で未確定の場合はNone）
+
+    Returns:
+        参照元一覧の見出しと、参照元の表示文言のリスト
+    """
     result_count = len({doc.metadata.get("employee_id") for doc in result_docs if doc.metadata.get("type") == "employee"})
 
     last_input = st.session_state.get("last_user_message", "")
@@ -241,24 +323,27 @@ def display_contact_llm_response(llm_response):
             st.warning("❌ 社員情報が見つかりませんでした。部署名や表現を見直すと結果が得られる可能性があります。")
         elif result_count == 1:
             st.info("⚠️ 該当者は1名だけでした。条件が適切かご確認ください。")
+        elif st.session_state.get("employee_results_truncated"):
+            # 関連度の高い上位のみに絞り込んでいるため、該当する全社員の数ではない
+            st.info(f"ℹ️ 質問との関連度が高い社員を上位 {result_count} 名に絞り込んで表示しています（該当する社員がほかにもいる可能性があります）。")
         else:
             st.success(f"✅ 条件に一致する社員が {result_count} 名見つかりました。")
 
-    if llm_response["answer"] != ct.INQUIRY_NO_MATCH_ANSWER:
+    message = "情報源"
+    file_info_list = []
+
+    if answer != ct.INQUIRY_NO_MATCH_ANSWER:
         st.divider()
-        message = "情報源"
         st.markdown(f"##### {message}")
 
         file_path_list = []
-        file_info_list = []
 
-        for document in llm_response["context"]:
-            file_path = document.metadata["source"]
+        for file_path, page in utils.iter_document_sources(result_docs):
             if file_path in file_path_list:
                 continue
 
-            if "page" in document.metadata:
-                page_number = document.metadata["page"] + 1
+            if page is not None:
+                page_number = page + 1
                 file_info = f"{file_path}（{page_number}ページ目）"
             else:
                 file_info = f"{file_path}"
@@ -269,11 +354,4 @@ def display_contact_llm_response(llm_response):
             file_path_list.append(file_path)
             file_info_list.append(file_info)
 
-    content = {}
-    content["mode"] = ct.ANSWER_MODE_2
-    content["answer"] = llm_response["answer"]
-    if llm_response["answer"] != ct.INQUIRY_NO_MATCH_ANSWER:
-        content["message"] = message
-        content["file_info_list"] = file_info_list
-
-    return content
\ No newline at end of file
+    return message, file_info_list
@@ -2,13 +2,6 @@
 このファイルは、固定の文字列や数値などのデータを変数として一括管理するファイルです。
 """
 
-############################################################
-# ライブラリの読み込み
-############################################################
-from langchain_community.document_loaders import PyMuPDFLoader, Docx2txtLoader, TextLoader
-from langchain_community.document_loaders.csv_loader import CSVLoader
-
-
 ############################################################
 # 共通変数の定義
 ############################################################
@@ -25,6 +18,10 @@ LINK_SOURCE_ICON = ":material/link: "
 WARNING_ICON = ":material/warning:"
 ERROR_ICON = ":material/error:"
 SPINNER_TEXT = "回答生成中..."
+STREAM_RESPONSE = True   # Trueの場合、「社内問い合わせ」モードの回答を生成されたトークンから順次表示する
+INDEX_WARMUP_MESSAGE = "検索用データを準備しています。完了するまでお待ちください。"
+INDEX_PARTIAL_MESSAGE = "残りの検索用データを取り込んでいます。完了するまでは、取り込み済みのデータのみをもとに回答します。"
+INDEX_STATUS_REFRESH_SECONDS = 1   # 検索用データの準備中に、進み具合の表示を更新する間隔（秒）
 
 
 # ==========================================
@@ -41,21 +38,35 @@ APP_BOOT_MESSAGE = "アプリが起動されました。"
 # ==========================================
 MODEL = "gpt-4o-mini"
 TEMPERATURE = 0.5
+LLM_HTTP_MAX_CONNECTIONS = 100              # LLMへのリクエストで共有するHTTPコネクションプールの最大接続数
+LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS = 20     # 再利用のために維持しておく接続数
+LLM_HTTP_TIMEOUT = 60.0                     # LLMへのリクエストのタイムアウト（秒）
 
 
 # ==========================================
 # RAG参照用のデータソース系
 # ==========================================
 RAG_TOP_FOLDER_PATH = "./data"
+# 拡張子ごとのローダー（「モジュール」「クラス名」「追加の引数」）
+# ローダーのモジュールは、その拡張子のファイルを初めて読み込むときにimportする（起動時に読み込むと時間がかかるため）
 SUPPORTED_EXTENSIONS = {
-    ".pdf": PyMuPDFLoader,
-    ".docx": Docx2txtLoader,
-    ".csv": lambda path: CSVLoader(path, encoding="utf-8-sig"),
-    ".txt": lambda path: TextLoader(path, encoding="utf-8") 
+    ".pdf": ("langchain_community.document_loaders.pdf", "PyMuPDFLoader", {}),
+    ".docx": ("langchain_community.document_loaders.word_document", "Docx2txtLoader", {}),
+    ".csv": ("langchain_community.document_loaders.csv_loader", "CSVLoader", {"encoding": "utf-8-sig"}),
+    ".txt": ("langchain_community.document_loaders.text", "TextLoader", {"encoding": "utf-8"})
 }
 WEB_URL_LOAD_TARGETS = [
     "https://generative-ai.web-camp.io/"
 ]
+LOADER_MAX_WORKERS = None        # ファイル読み込みを並列実行するプロセス数（Noneの場合はCPUコア数）
+LOADER_MAX_IN_FLIGHT = 16        # 並列読み込みで、結果未回収のまま同時に処理するファイル数の上限
+EMPLOYEE_CSV_CHUNK_ROWS = 5000   # 社員名簿のCSVをストリーミング読み込みする際の、1回に読み込む行数
+ENABLE_WEB_PAGE_CACHE = True                    # Trueの場合、取得したWebページをキャッシュし、次回は変更がある場合のみ本文を受け取る
+WEB_PAGE_CACHE_DIR = "./cache/web_pages"        # Webページのキャッシュの保存先フォルダ
+WEB_FETCH_TIMEOUT_SECONDS = 10.0                # Webページ取得の1リクエストあたりのタイムアウト（秒）
+WEB_FETCH_MAX_CONNECTIONS = 16                  # Webページを並行取得する際の、全体での同時接続数の上限
+WEB_FETCH_MAX_CONNECTIONS_PER_HOST = 4          # 同じホストへの同時リクエスト数の上限
+WEB_FETCH_USER_AGENT = "company-inner-search-app"   # Webページ取得時に送るUser-Agent
 
 # ==========================================
 # RAG設定系（ベクターストア、チャンク関連）
@@ -63,7 +74,105 @@ WEB_URL_LOAD_TARGETS = [
 NUM_RELATED_DOCUMENTS = 5        # プロンプトに埋め込む関連ドキュメントの数
 CHUNK_SIZE = 500                # チャンク分割時のサイズ（文字数）
 CHUNK_OVERLAP = 50               # チャンク間の重なり部分の文字数
+INGEST_BATCH_SIZE = 256          # 取り込み時に、まとめて埋め込み・ベクターストアへ登録するチャンク数
+STRUCTURE_AWARE_CHUNKING = True  # Trueの場合、PDF・Wordファイルは見出しなどの文書構造に沿ってセクション単位で分割する
+ENABLE_CHUNK_DEDUP = True        # Trueの場合、取り込み時にほぼ同じ内容のチャンクを1つにまとめる（参照元は「sources」メタデータに記録）
+DEDUP_SIMILARITY_THRESHOLD = 0.8 # 重複とみなす、文字n-gramのJaccard係数（MinHashでの推定値）の下限
+DEDUP_SHINGLE_SIZE = 5           # 重複検出に使う文字n-gramの文字数
+DEDUP_NUM_PERM = 64              # MinHashのハッシュ関数の数（多いほど推定が正確になるが、計算量が増える）
+DEDUP_LSH_BANDS = 16             # LSHのバンド数（DEDUP_NUM_PERMを割り切れる数。多いほど類似度の低い候補まで拾う）
+ENABLE_HYBRID_SEARCH = True      # Trueの場合、全体の検索でベクトル検索とキーワード検索（BM25）を組み合わせる
+HYBRID_RRF_K = 60                # 検索結果を統合する際の順位の緩和定数（Reciprocal Rank Fusion）
+KEYWORD_LOOKUP_MAX_CHARS = 30    # この文字数以下で本文にそのまま含まれる入力は、キーワード検索のみで回答する
+ENABLE_RERANK = True             # Trueの場合、検索で多めに取得した候補を並べ替え、上位のみをLLMに渡す
+RERANK_CANDIDATE_COUNT = 50      # 並べ替えの対象として取得する候補の数
+RERANK_EMPLOYEE_TOP_N = 30       # 社員名簿の検索（部署・従業員区分の条件がない場合）で、並べ替え後にLLMに渡す件数
+RERANK_LEXICAL_WEIGHT = 0.5      # 語彙ベースの並べ替えで、質問文との語の重なりを重視する度合い（残りは元の検索順位）
+RERANK_CROSS_ENCODER_MODEL = None    # ローカルのクロスエンコーダーのモデル名（sentence-transformersが必要。Noneの場合は語彙ベース）
+
 
+# ==========================================
+# ベクターストアの永続化系
+# ==========================================
+PERSIST_VECTORSTORE = True                  # Trueの場合、ディスク上のインデックスを再利用し、変更のあったデータのみ取り込み直す
+BACKGROUND_INDEX_WARMUP = True              # Trueの場合、インデックスの読み込み・取り込みをバックグラウンドで行い、画面はすぐに表示する
+VECTORSTORE_DIR_PATH = "./chroma_db"        # 永続化したベクターストアの保存先
+VECTORSTORE_BACKEND = "chroma"              # ベクターストアの種類（「chroma」: Chroma、「numpy」: NumPyの行列での総当たり検索。数千チャンク程度ならnumpyの方が速い）
+NUMPY_VECTOR_DTYPE = "float32"              # 「numpy」の場合のベクトルの型（「int8」にするとメモリ使用量が約1/4になるが、類似度はわずかに粗くなる）
+EMPLOYEE_COLLECTION_NAME = "employee"       # 社員名簿用のコレクション名
+FULL_COLLECTION_NAME = "full_documents"     # 全体用のコレクション名
+INDEX_MANIFEST_SUFFIX = "_manifest.json"    # 取り込み済みデータソースを記録するマニフェストのファイル名（コレクション名の後ろに付与）
+USE_PREBUILT_INDEX = True                   # Trueの場合、build_index.pyで事前に構築したインデックスがあれば、アプリ内で取り込みを行わずに開く
+PREBUILT_INDEX_DIR_PATH = "./index_store"   # 事前に構築したインデックスの保存先（バージョンごとのフォルダと、現在のバージョンを示す「CURRENT」ファイル）
+PREBUILT_INDEX_KEEP_VERSIONS = 3            # 事前に構築したインデックスを、現在のものを含めて残すバージョン数
+PREBUILT_INDEX_LEASE_SECONDS = 300          # アプリが使用中のバージョンに置くリースの有効秒数（この間に更新のないリースは終了したアプリのものとみなし、削除を妨げない）
+ENABLE_DATA_WATCHER = True                  # Trueの場合、アプリ内で取り込んだインデックスに、データソースのフォルダの変更を自動で反映する
+DATA_WATCH_DEBOUNCE_SECONDS = 2.0           # 最後のファイル変更から、インデックスへの反映を始めるまでの待機秒数（保存時の連続したイベントをまとめる）
+
+
+# ==========================================
+# 埋め込みAPI系
+# ==========================================
+EMBEDDING_MODEL = "text-embedding-ada-002"      # 埋め込みモデル名（変更した場合はベクターストアの作り直しが必要）
+USE_EMBEDDING_SCHEDULER = True                  # Trueの場合、埋め込みリクエストをバッチ化して並行送信する
+EMBEDDING_API_BASE_URL = None                   # 埋め込みAPIのベースURL（Noneの場合はOpenAIの標準。スタブサーバーでの動作確認時に変更）
+EMBEDDING_MAX_CONCURRENCY = 4                   # 同時に送信するリクエスト数の上限
+EMBEDDING_BATCH_MAX_TOKENS = 8000               # 1リクエストに含めるトークン数の上限
+EMBEDDING_BATCH_MAX_SIZE = 256                  # 1リクエストに含めるテキスト数の上限
+EMBEDDING_REQUESTS_PER_MINUTE = 3000            # 1分あたりのリクエスト数の上限（0の場合は無制限）
+EMBEDDING_TOKENS_PER_MINUTE = 1000000           # 1分あたりのトークン数の上限（0の場合は無制限）
+EMBEDDING_MAX_RETRIES = 6                       # 1リクエストあたりの再試行回数の上限
+EMBEDDING_RETRY_BASE_SECONDS = 1.0              # 再試行時の待機時間の基準値（再試行のたびに倍増）
+EMBEDDING_RETRY_MAX_SECONDS = 60.0              # 再試行時の待機時間の上限
+
+
+# ==========================================
+# 埋め込みキャッシュ系
+# ==========================================
+ENABLE_EMBEDDING_CACHE = True                               # Trueの場合、同じテキストの埋め込みをローカルのキャッシュから返す
+EMBEDDING_CACHE_PATH = "./cache/embedding_cache.sqlite3"    # キャッシュ（SQLite）ファイルの保存先
+EMBEDDING_CACHE_MAX_ENTRIES = 20000                         # キャッシュする件数の上限（超えた分は参照日時の古い順に削除）
+
+
+
+# ==========================================
+# 回答キャッシュ系
+# ==========================================
+ENABLE_ANSWER_CACHE = True                  # Trueの場合、似た質問への回答をキャッシュから返す（会話履歴がない質問のみ）
+ANSWER_CACHE_SIMILARITY_THRESHOLD = 0.95    # キャッシュを使う質問文どうしのコサイン類似度の下限
+ANSWER_CACHE_TTL_SECONDS = 6 * 60 * 60      # キャッシュした回答の有効期間（秒）
+ANSWER_CACHE_MAX_ENTRIES = 1000             # キャッシュする回答数の上限（超えた分は使われていない順に破棄）
+
+
+# ==========================================
+# フィルタ抽出系
+# ==========================================
+FILTER_CACHE_MAX_ENTRIES = 512                          # フィルタ抽出結果をキャッシュする質問文の数の上限
+FILTER_CACHE_PATH = "./cache/filter_extraction.json"    # キャッシュの保存先（Noneの場合はメモリ上のみ）
+FILTER_CACHE_FLUSH_EVERY = 16                           # 未保存の抽出結果がこの件数に達したら、キャッシュをファイルに書き出す
+FILTER_CACHE_FLUSH_SECONDS = 30                         # 前回の書き出しからこの秒数が経過していれば、件数に達していなくても書き出す
+PARALLEL_QUERY_PREPARATION = True                       # フィルタ抽出と質問文の書き換え（LLM呼び出し）を並行して実行するか
+QUERY_PREPARATION_MAX_WORKERS = 8                       # 並行実行に使うスレッド数の上限（全セッションで共有）
+
+
+# ==========================================
+# 会話履歴系
+# ==========================================
+CHAT_HISTORY_MAX_TOKENS = 2000      # プロンプトに含める会話履歴（要約を含む）のトークン数の目安
+CHAT_HISTORY_RECENT_TURNS = 3       # 要約せずにそのまま残す直近のやりとり（質問と回答の組）の数
+
+
+# ==========================================
+# 質問文の書き換え系
+# ==========================================
+QUESTION_REWRITE_CACHE_MAX_ENTRIES = 1024   # 書き換え結果をキャッシュする「会話履歴と質問文の組」の数の上限
+QUESTION_REWRITE_SHORT_INPUT_CHARS = 8      # この文字数以下の入力は、前の会話を受けた質問とみなして書き換える
+# 前の会話を参照している（単独では意味が通らない）とみなす表現
+QUESTION_REWRITE_REFERENCE_WORDS = [
+    "それ", "その", "それら", "これ", "この", "あれ", "あの", "そこ", "上記", "前述",
+    "さっき", "先ほど", "先程", "前の", "同じ", "他に", "ほかに", "他の", "ほかの",
+    "彼", "彼女", "その人", "では", "じゃあ", "さらに", "もっと", "詳しく", "続き"
+]
 
 
 # ==========================================
@@ -71,6 +180,15 @@ CHUNK_OVERLAP = 50               # チャンク間の重なり部分の文字数
 # ==========================================
 SYSTEM_PROMPT_CREATE_INDEPENDENT_TEXT = "会話履歴と最新の入力をもとに、会話履歴なしでも理解できる独立した入力テキストを生成してください。"
 
+SYSTEM_PROMPT_SUMMARIZE_HISTORY = """
+これまでの会話の要約と、それ以降の会話をもとに、会話全体の要約を更新してください。
+後続の質問に答えるために必要な情報（話題になった部署・社員・資料名、ユーザーの関心、確定した条件など）を漏らさず、
+箇条書きで簡潔にまとめてください。要約以外の文章は出力しないでください。
+
+【これまでの会話の要約】
+{summary}
+"""
+
 SYSTEM_PROMPT_DOC_SEARCH = """
 あなたは社内情報に精通した、非常に優秀なアシスタントです。
 提供された【文脈】情報のみを厳密に参照し、ユーザーの質問に回答してください。
@@ -128,13 +246,20 @@ EXTRACTION_SYSTEM_PROMPT = """
 【従業員区分の例】
 - 正社員・契約社員・アルバイト・派遣・インターン など
 
+【役職・スキル・入社年】
+- 質問文に役職（例：課長、主任）、スキル（例：Python、AWS）、入社年（例：2020年入社）が含まれる場合は、
+  それぞれ「role」「skill」「join_year」として抽出する。入社年は西暦4桁の数値にする。
+
 【出力形式】
 Pythonの辞書形式で、以下のように出力してください：
 
 ```python
 {
     "department": "営業部",
-    "employment_type": "正社員"
+    "employment_type": "正社員",
+    "role": "課長",
+    "skill": "Python",
+    "join_year": 2020
 }
 もし該当する条件が見つからなかった場合、そのキーは含めないようにしてください。
 """
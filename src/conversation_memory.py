@@ -0,0 +1,130 @@
+"""
+このファイルは、LLMとのやりとり用の会話履歴を一定のサイズに保つ処理（直近のやりとりの保持と古いやりとりの要約）が記述されたファイルです。
+"""
+
+############################################################
+# ライブラリの読み込み
+############################################################
+import logging
+import threading
+from typing import Callable, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+import constants as ct
+from token_counter import get_token_counter
+
+
+############################################################
+# クラス定義
+############################################################
+class ConversationMemory:
+    """
+    会話履歴を「直近のやりとり（そのまま保持）」と「それより古いやりとりの要約」に分けて保持するクラス
+
+    - プロンプトに含める会話履歴は、要約と直近のやりとりを合わせてトークン数の目安（max_tokens）以内に収める
+    - 直近から外れたやりとりは、回答の表示を待たせないよう、バックグラウンドで要約に取り込む
+    - 要約が終わるまでの間は、目安に収まらない古いやりとりをプロンプトに含めない
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None, recent_turns: Optional[int] = None):
+        """
+        Args:
+            max_tokens: プロンプトに含める会話履歴のトークン数の目安（省略時は設定値）
+            recent_turns: 要約せずに残す直近のやりとりの数（省略時は設定値）
+        """
+        self.max_tokens = max_tokens or ct.CHAT_HISTORY_MAX_TOKENS
+        self.recent_turns = recent_turns or ct.CHAT_HISTORY_RECENT_TURNS
+        self.count_tokens = get_token_counter(ct.MODEL)
+        self.summary = ""
+        self._lock = threading.Lock()
+        # 要約に取り込まれていないやりとり（「質問」と「回答」のメッセージの組）
+        self._turns: List[tuple] = []
+        self._total_turns = 0
+        self._compacting = False
+
+    def __len__(self) -> int:
+        # 要約済みのものを含めた、これまでのやりとりの数
+        return self._total_turns
+
+    def add_turn(self, question: str, answer: str):
+        """
+        やりとりを1件追加
+
+        Args:
+            question: ユーザー入力値
+            answer: LLMからの回答
+        """
+        with self._lock:
+            self._turns.append((HumanMessage(content=question), AIMessage(content=answer)))
+            self._total_turns += 1
+
+    def _turn_tokens(self, turn) -> int:
+        return sum(self.count_tokens(message.content) for message in turn)
+
+    def _verbatim_start(self) -> int:
+        """そのままプロンプトに含めるやりとりの開始位置（件数とトークン数の目安に収まる範囲）を返す"""
+        start = max(0, len(self._turns) - self.recent_turns)
+        budget = self.max_tokens - self.count_tokens(self.summary)
+        tokens = 0
+        i = len(self._turns)
+        while i > start:
+            turn_tokens = self._turn_tokens(self._turns[i - 1])
+            # 最新のやりとりは、目安を超える場合でも必ず含める
+            if tokens + turn_tokens > budget and i < len(self._turns):
+                break
+            tokens += turn_tokens
+            i -= 1
+        return i
+
+    def messages(self) -> List[BaseMessage]:
+        """
+        プロンプトに含める会話履歴を取得
+
+        Returns:
+            要約（ある場合）と直近のやりとりのメッセージのリスト
+        """
+        with self._lock:
+            messages: List[BaseMessage] = []
+            if self.summary:
+                messages.append(SystemMessage(content=f"これまでの会話の要約:\n{self.summary}"))
+            for turn in self._turns[self._verbatim_start():]:
+                messages.extend(turn)
+            return messages
+
+    def compact(self, summarize: Callable[[str, List[BaseMessage]], str], executor=None):
+        """
+        直近から外れたやりとりを要約に取り込む（すでに要約中の場合は何もしない）
+
+        Args:
+            summarize: 「これまでの要約」と「取り込むメッセージ」を受け取り、更新後の要約を返す関数
+            executor: 要約をバックグラウンドで実行するためのスレッドプール（省略時はその場で実行）
+        """
+        with self._lock:
+            if self._compacting:
+                return
+            end = self._verbatim_start()
+            if end == 0:
+                return
+            previous_summary = self.summary
+            folded_messages = [message for turn in self._turns[:end] for message in turn]
+            self._compacting = True
+
+        def run():
+            try:
+                summary = summarize(previous_summary, folded_messages)
+            except Exception as e:
+                logging.getLogger(ct.LOGGER_NAME).warning(f"会話履歴の要約に失敗: {e}")
+                summary = None
+
+            with self._lock:
+                if summary is not None:
+                    self.summary = summary
+                    # 要約中に追加されたやりとりは末尾に付くため、先頭から取り込んだ分だけ取り除けばよい
+                    del self._turns[:end]
+                self._compacting = False
+
+        if executor is None:
+            run()
+        else:
+            executor.submit(run)
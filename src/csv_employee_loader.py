@@ -1,11 +1,20 @@
 import os
+from collections import Counter
 import pandas as pd
 from langchain_core.documents import Document
 
 class EmployeeCSVLoader:
+    # 部署列の自動判定で、値を確認する先頭からの行数（大きな名簿でも全行を走査しない）
+    DETECTION_SAMPLE_ROWS = 1000
+    # 役職・スキルの列名の候補（スキルは「, 」区切りの複数値）
+    ROLE_COLUMNS = ["役職", "role"]
+    SKILL_COLUMNS = ["スキルセット", "スキル", "skills"]
+
     def __init__(self, file_path, encoding="utf-8-sig"):
         self.file_path = file_path
         self.encoding = encoding
+        # ストリーミング読み込み中に更新される、部署別の社員数（読み込み済みの行までの集計）
+        self.department_counts = Counter()
 
     def _detect_department_column(self, df):
         """部署に該当する列を検出する（明示候補 → 自動推測）"""
@@ -15,8 +24,13 @@ class EmployeeCSVLoader:
                 return key
 
         # 自動判定：列のいずれかに「◯◯部」という値が含まれていたら部署列とみなす
-        for col in df.columns:
-            if df[col].astype(str).str.contains(r".+部").any():
+        # （文字列の列のみ、先頭の行の重複を除いた値で判定する）
+        sample = df.head(self.DETECTION_SAMPLE_ROWS)
+        for col in sample.columns:
+            if sample[col].dtype != object:
+                continue
+            values = pd.Series(sample[col].dropna().unique()).astype(str)
+            if values.str.contains(r".+部").any():
                 return col
 
         raise ValueError(f"部署に該当する列が見つかりません（候補: {possible_keys}）")
@@ -31,7 +45,10 @@ class EmployeeCSVLoader:
 
     def _create_summary_document(self, df, dept_col):
         """部署別の社員数サマリーをDocumentで返す"""
-        dept_summary = df[dept_col].value_counts().to_dict()
+        return self._build_summary_document(df[dept_col].value_counts().to_dict())
+
+    def _build_summary_document(self, dept_summary):
+        """部署別の社員数（部署名: 人数の辞書）から、サマリーのDocumentを作成する"""
         summary_text = "社員数の部署別内訳は以下の通りです：\n"
         for dept, count in dept_summary.items():
             summary_text += f"- {dept}: {count}名\n"
@@ -45,18 +62,30 @@ class EmployeeCSVLoader:
         )
 
     def _create_employee_documents(self, df, dept_col, emp_col):
-        """社員ごとのDocumentをリストで返す"""
+        """社員ごとのDocumentをリストで返す（本文・メタデータは行ごとのループではなく列単位でまとめて作成）"""
+        if df.empty:
+            return []
+
+        # 「列名: 値, 列名: 値, ...」の本文を、列ごとの文字列連結で全行分まとめて作る
+        row_texts = None
+        for col in df.columns:
+            column_text = f"{col}: " + df[col].astype(str)
+            row_texts = column_text if row_texts is None else row_texts + ", " + column_text
+
+        source = os.path.basename(self.file_path)
+        departments = df[dept_col].tolist() if dept_col in df.columns else [""] * len(df)
+        employment_types = df[emp_col].tolist() if emp_col else None
+
         documents = []
-        for idx, row in df.iterrows():
-            row_data = ", ".join(f"{col}: {row[col]}" for col in df.columns)
+        for i, (idx, row_data) in enumerate(zip(df.index.tolist(), row_texts.tolist())):
             metadata = {
-                "source": os.path.basename(self.file_path),
+                "source": source,
                 "type": "employee",
-                "department": row.get(dept_col, ""),
+                "department": departments[i],
                 "employee_id": idx
             }
-            if emp_col:
-                metadata["employment_type"] = row.get(emp_col, "")
+            if employment_types is not None:
+                metadata["employment_type"] = employment_types[i]
 
             documents.append(Document(
                 page_content=row_data,
@@ -64,22 +93,66 @@ class EmployeeCSVLoader:
             ))
         return documents
 
+    def load_dataframe(self):
+        """CSVをDataFrameとして読み込み、部署列・従業員区分列の列名と合わせて返す"""
+        df = pd.read_csv(self.file_path, encoding=self.encoding)
+        df.columns = df.columns.str.strip()
+
+        dept_col = self._detect_department_column(df)
+        emp_col = self._detect_employment_column(df)
+        return df, dept_col, emp_col
+
+    def load_vocabulary(self):
+        """名簿に登場する部署名・従業員区分・役職・スキルの一覧を返す（フィルタ抽出の高速判定用）"""
+        df, dept_col, emp_col = self.load_dataframe()
+        role_col = next((c for c in self.ROLE_COLUMNS if c in df.columns), None)
+        skill_col = next((c for c in self.SKILL_COLUMNS if c in df.columns), None)
+
+        skills = set()
+        if skill_col:
+            for value in df[skill_col].dropna().astype(str):
+                skills.update(s.strip() for s in value.split(",") if s.strip())
+
+        return {
+            "department": sorted(df[dept_col].dropna().astype(str).unique()),
+            "employment_type": sorted(df[emp_col].dropna().astype(str).unique()) if emp_col else [],
+            "role": sorted(df[role_col].dropna().astype(str).str.strip().unique()) if role_col else [],
+            "skill": sorted(skills)
+        }
+
     def load(self):
-        documents = []
-        try:
-            df = pd.read_csv(self.file_path, encoding=self.encoding)
-            df.columns = df.columns.str.strip()
+        """
+        部署別サマリーと社員ごとのDocumentをリストで返す
+
+        読み込みに失敗した場合は例外をそのまま送出する（空のリストを返すと、名簿が空になったものとして取り込まれるため）
+        """
+        df, dept_col, emp_col = self.load_dataframe()
+
+        documents = [self._create_summary_document(df, dept_col)]
+        documents.extend(self._create_employee_documents(df, dept_col, emp_col))
+        return documents
 
-            dept_col = self._detect_department_column(df)
-            emp_col = self._detect_employment_column(df)
+    def lazy_load(self, chunksize=5000):
+        """
+        CSVを一定行数ずつ読み込み、社員ごとのDocumentを順次返す（名簿全体をメモリ上に持たない）
 
-            summary_doc = self._create_summary_document(df, dept_col)
-            documents.append(summary_doc)
+        部署別の社員数は読み込みながら「department_counts」に集計し、全行を読み終えた後に
+        サマリーのDocumentを最後に返す。
 
-            employee_docs = self._create_employee_documents(df, dept_col, emp_col)
-            documents.extend(employee_docs)
+        読み込みに失敗した場合は、途中まで返した後でも例外をそのまま送出する
+        （呼び出し元で読み込み失敗として扱い、前回取り込んだ名簿を残せるようにする）
+        """
+        self.department_counts = Counter()
+        dept_col, emp_col = None, None
+        for chunk in pd.read_csv(self.file_path, encoding=self.encoding, chunksize=chunksize):
+            chunk.columns = chunk.columns.str.strip()
+            if dept_col is None:
+                # 列の判定は最初のチャンクでのみ行う
+                dept_col = self._detect_department_column(chunk)
+                emp_col = self._detect_employment_column(chunk)
 
-        except Exception as e:
-            print(f"[ERROR] CSV読み込みに失敗: {self.file_path} → {e}")
+            self.department_counts.update(chunk[dept_col].value_counts().to_dict())
+            yield from self._create_employee_documents(chunk, dept_col, emp_col)
 
-        return documents
\ No newline at end of file
+        if dept_col is not None:
+            yield self._build_summary_document(dict(self.department_counts.most_common()))
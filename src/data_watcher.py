@@ -0,0 +1,132 @@
+"""
+このファイルは、データソースのフォルダを監視し、追加・変更・削除されたファイルをまとめて通知する処理が記述されたファイルです。
+"""
+
+############################################################
+# ライブラリの読み込み
+############################################################
+import logging
+import os
+import threading
+from typing import Callable, List, Optional, Set
+
+from watchdog.events import FileSystemEvent, FileSystemEventHandler
+from watchdog.observers import Observer
+
+import constants as ct
+
+
+############################################################
+# クラス定義
+############################################################
+class DataFolderWatcher(FileSystemEventHandler):
+    """
+    フォルダ配下のファイルの変更をOSのファイル監視（Linuxではinotify）で検知し、一定時間変更が続かなくなった時点で
+    変更のあったパスをまとめてコールバックに渡すクラス
+
+    - ファイルの保存時は「作成・変更・移動」のイベントが短時間に何度も発生するため、最後のイベントから
+      「debounce_seconds」秒経過するまで待ってから1回だけ通知する
+    - 通知中に発生した変更は、通知の完了後にあらためてまとめて通知する（コールバックが同時に実行されることはない）
+    """
+
+    # Officeの一時ファイル・エディタのスワップファイルなど、取り込み対象にしないファイル名の先頭・末尾
+    IGNORED_PREFIXES = ("~$", ".~", ".#")
+    IGNORED_SUFFIXES = ("~", ".swp", ".tmp")
+
+    def __init__(
+        self,
+        root_path: str,
+        on_change: Callable[[List[str]], None],
+        debounce_seconds: float = 2.0,
+        extensions: Optional[Set[str]] = None,
+        timer_factory: Callable[[float, Callable[[], None]], threading.Timer] = threading.Timer
+    ):
+        """
+        Args:
+            root_path: 監視するフォルダ（配下のフォルダも監視する）
+            on_change: 変更のあったパス（ファイルまたはフォルダ）のリストを受け取る関数
+            debounce_seconds: 最後の変更から通知までの待機秒数
+            extensions: 通知対象のファイルの拡張子（省略時は「SUPPORTED_EXTENSIONS」）
+            timer_factory: 「待機秒数」と「通知する関数」から、開始前のタイマーを作成する関数（テストで時刻を進める場合に差し替える）
+        """
+        super().__init__()
+        self.root_path = root_path
+        self.on_change = on_change
+        self.debounce_seconds = debounce_seconds
+        self.extensions = extensions or set(ct.SUPPORTED_EXTENSIONS)
+        self.timer_factory = timer_factory
+        self.logger = logging.getLogger(ct.LOGGER_NAME)
+
+        self._lock = threading.Lock()
+        self._pending: Set[str] = set()
+        self._timer: Optional[threading.Timer] = None
+        self._running = threading.Lock()
+        self._observer = None
+
+    def start(self):
+        """フォルダの監視を開始"""
+        self._observer = Observer()
+        self._observer.schedule(self, self.root_path, recursive=True)
+        self._observer.daemon = True
+        self._observer.start()
+        self.logger.info(f"データソースのフォルダの監視を開始しました: {self.root_path}")
+
+    def stop(self):
+        """フォルダの監視を終了（通知待ちの変更は破棄する）"""
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._pending.clear()
+
+    def _is_target(self, path: str, is_directory: bool) -> bool:
+        if is_directory:
+            # フォルダの削除・移動では、配下のファイルごとのイベントが発生しない場合がある
+            return True
+        name = os.path.basename(path)
+        if name.startswith(self.IGNORED_PREFIXES) or name.endswith(self.IGNORED_SUFFIXES):
+            return False
+        return os.path.splitext(name)[1].lower() in self.extensions
+
+    def on_any_event(self, event: FileSystemEvent):
+        if event.event_type not in ("created", "modified", "deleted", "moved"):
+            return
+        # フォルダの「変更」は配下のファイルの追加・削除に伴うもので、ファイル側のイベントで処理する
+        if event.is_directory and event.event_type == "modified":
+            return
+
+        paths = [event.src_path]
+        if event.event_type == "moved":
+            paths.append(event.dest_path)
+        paths = [os.fsdecode(p) for p in paths if self._is_target(os.fsdecode(p), event.is_directory)]
+        if not paths:
+            return
+
+        with self._lock:
+            self._pending.update(paths)
+            self._schedule()
+
+    def _schedule(self):
+        """最後の変更から「debounce_seconds」秒後に通知するよう、タイマーを設定し直す（ロック取得済みの状態で呼ぶ）"""
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = self.timer_factory(self.debounce_seconds, self._flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush(self):
+        with self._running:
+            with self._lock:
+                paths = sorted(self._pending)
+                self._pending.clear()
+                self._timer = None
+            if not paths:
+                return
+            self.logger.info(f"データソースの変更を検知しました: {len(paths)}件")
+            try:
+                self.on_change(paths)
+            except Exception as e:
+                self.logger.error(f"データソースの変更の反映に失敗しました: {type(e).__name__}: {e}")
@@ -0,0 +1,174 @@
+"""
+このファイルは、RAGの参照先となるファイルの読み込み処理が記述されたファイルです。
+"""
+
+############################################################
+# ライブラリの読み込み
+############################################################
+import importlib
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import constants as ct
+from csv_employee_loader import EmployeeCSVLoader
+from structured_document_loader import StructuredDocxLoader, StructuredPDFLoader
+
+
+############################################################
+# 関数定義
+############################################################
+def get_loader(file_path, ext):
+    """拡張子に応じた適切なローダーを取得する"""
+    if ext == ".csv":
+        return EmployeeCSVLoader(file_path, encoding="utf-8-sig")
+
+    # PDF・Wordファイルは、見出しなどの文書構造に沿ったセクション単位で読み込む
+    if ct.STRUCTURE_AWARE_CHUNKING and ext == ".pdf":
+        return StructuredPDFLoader(file_path, chunk_size=ct.CHUNK_SIZE)
+    if ct.STRUCTURE_AWARE_CHUNKING and ext == ".docx":
+        return StructuredDocxLoader(file_path, chunk_size=ct.CHUNK_SIZE)
+
+    loader_spec = ct.SUPPORTED_EXTENSIONS.get(ext)
+    if loader_spec:
+        # ローダーのモジュールは、対象の拡張子のファイルが見つかった時点で初めて読み込む
+        module_name, class_name, loader_kwargs = loader_spec
+        loader_class = getattr(importlib.import_module(module_name), class_name)
+        return loader_class(file_path, **loader_kwargs)
+
+    return None
+
+
+def list_data_files(path):
+    """
+    指定されたパス配下の、読み込み対象（対応する拡張子）のファイルパスを再帰的に列挙する
+
+    Args:
+        path: 探索を開始するフォルダのパス
+
+    Returns:
+        ファイルパスのリスト（実行環境によらず同じ順序になるよう並び替え済み）
+    """
+    file_paths = []
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for file in sorted(files):
+            file_ext = os.path.splitext(file)[1].lower()
+            if file_ext in ct.SUPPORTED_EXTENSIONS:
+                file_paths.append(os.path.join(root, file))
+    return file_paths
+
+
+def _parse_file(file_path):
+    """
+    1ファイル分のドキュメントを解析する（ワーカープロセス内でも実行される）
+
+    ワーカープロセスにはロガーの設定が引き継がれないため、ログ出力は行わずに結果とエラー内容を返す
+
+    Args:
+        file_path: 読み込むファイルのパス
+
+    Returns:
+        「読み込んだドキュメントのリスト（対象外・失敗時はNone）」と「エラー内容（成功時はNone）」のタプル
+    """
+    file_ext = os.path.splitext(file_path)[1].lower()
+
+    loader = get_loader(file_path, file_ext)
+    if not loader:
+        return None, None
+
+    try:
+        return loader.load(), None
+    except Exception as e:
+        return None, str(e)
+
+
+def _log_result(file_path, docs, error):
+    logger = logging.getLogger(ct.LOGGER_NAME)
+    if error is not None:
+        logger.error(f"読み込み失敗: {file_path}, エラー: {error}")
+    elif docs is not None:
+        logger.info(f"読み込み成功: {file_path} ({len(docs)}件)")
+
+
+def load_file(file_path):
+    """
+    1ファイル分のドキュメントを読み込む
+
+    Args:
+        file_path: 読み込むファイルのパス
+
+    Returns:
+        読み込んだドキュメントのリスト（読み込みに失敗した場合はNone）
+    """
+    docs, error = _parse_file(file_path)
+    _log_result(file_path, docs, error)
+    return docs
+
+
+def iter_loaded_files(file_paths):
+    """
+    複数のファイルをプロセスプールで並列に読み込み、指定された順番どおりに結果を返す
+
+    PDFの解析などCPU負荷の高い処理をCPUコア数分並列化する。
+    処理中（結果未回収）のファイル数を「LOADER_MAX_IN_FLIGHT」までに制限し、
+    読み込み済みドキュメントがメモリ上に溜まりすぎないようにする。
+
+    Args:
+        file_paths: 読み込むファイルパスのリスト
+
+    Yields:
+        「ファイルパス」と「読み込んだドキュメントのリスト（読み込みに失敗した場合はNone）」のタプル
+    """
+    file_paths = list(file_paths)
+    max_workers = min(ct.LOADER_MAX_WORKERS or os.cpu_count() or 1, len(file_paths))
+
+    # 並列化の効果がない場合は、プロセス起動のコストをかけずにそのまま読み込む
+    if max_workers <= 1:
+        for file_path in file_paths:
+            yield file_path, load_file(file_path)
+        return
+
+    max_in_flight = max(ct.LOADER_MAX_IN_FLIGHT, max_workers)
+    next_index = 0
+    pending = deque()
+
+    try:
+        # Streamlitのサーバーはマルチスレッドで動作しているため、forkではなくspawnでワーカーを起動する
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            while pending or next_index < len(file_paths):
+                while next_index < len(file_paths) and len(pending) < max_in_flight:
+                    file_path = file_paths[next_index]
+                    pending.append((file_path, executor.submit(_parse_file, file_path)))
+                    next_index += 1
+
+                # 先頭（投入順で最も古いもの）から結果を回収することで、出力順を入力順に揃える
+                file_path, future = pending[0]
+                docs, error = future.result()
+                pending.popleft()
+                _log_result(file_path, docs, error)
+                yield file_path, docs
+    except BrokenProcessPool as e:
+        logger = logging.getLogger(ct.LOGGER_NAME)
+        logger.warning(f"並列読み込みに失敗したため、残りのファイルを順次読み込みます: {e}")
+        # 結果を返し終えていないファイルから順次読み込みを再開
+        remaining = [file_path for file_path, _ in pending] + file_paths[next_index:]
+        for file_path in remaining:
+            yield file_path, load_file(file_path)
+
+
+def load_documents_from_path(path):
+    """指定されたパスからドキュメントを再帰的に読み込む"""
+    documents = []
+    logger = logging.getLogger(ct.LOGGER_NAME)
+    logger.info(f"データソース探索開始: {path}")
+
+    for _, docs in iter_loaded_files(list_data_files(path)):
+        if docs:
+            documents.extend(docs)
+    return documents
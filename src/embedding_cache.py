@@ -0,0 +1,248 @@
+"""
+このファイルは、埋め込みベクトルをローカルにキャッシュする処理が記述されたファイルです。
+"""
+
+############################################################
+# ライブラリの読み込み
+############################################################
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+import constants as ct
+from embedding_scheduler import ScheduledEmbeddings
+
+
+############################################################
+# 関数定義
+############################################################
+def normalize_text(text: str) -> str:
+    """
+    キャッシュキー計算用にテキストを正規化（Unicode正規化と前後の空白除去）
+
+    Args:
+        text: 埋め込み対象のテキスト
+
+    Returns:
+        正規化したテキスト
+    """
+    return unicodedata.normalize("NFC", text).strip()
+
+
+def make_cache_key(model: str, text: str) -> str:
+    """
+    「モデル名」と「正規化したテキスト」からキャッシュキーを作成
+
+    Args:
+        model: 埋め込みモデル名
+        text: 埋め込み対象のテキスト
+
+    Returns:
+        キャッシュキー（SHA-256の16進数表記）
+    """
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+def create_embeddings() -> Embeddings:
+    """
+    アプリ全体で使用する埋め込みモデルのオブジェクトを作成
+
+    設定で有効化されている場合、ドキュメント・質問文の両方の埋め込みをキャッシュするラッパーで包む
+
+    Returns:
+        埋め込みモデルのオブジェクト
+    """
+    if ct.USE_EMBEDDING_SCHEDULER:
+        embeddings = ScheduledEmbeddings()
+    else:
+        embeddings = OpenAIEmbeddings(model=ct.EMBEDDING_MODEL)
+
+    if not ct.ENABLE_EMBEDDING_CACHE:
+        return embeddings
+
+    return CachedEmbeddings(
+        embeddings,
+        cache_path=ct.EMBEDDING_CACHE_PATH,
+        max_entries=ct.EMBEDDING_CACHE_MAX_ENTRIES
+    )
+
+
+############################################################
+# クラス定義
+############################################################
+class EmbeddingCacheStore:
+    """
+    埋め込みベクトルをSQLiteに保存するストア
+
+    ベクトルはfloat32の配列としてBLOB列に格納し、最終参照日時が古いものから削除（LRU）して件数の上限を保つ。
+    複数スレッド（Streamlitのセッション）から同時に使われるため、接続はロックで保護する。
+    """
+
+    def __init__(self, cache_path: str, max_entries: int):
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings (last_access)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """
+        複数キーの埋め込みベクトルをまとめて取得し、ヒットしたものの最終参照日時を更新
+
+        Args:
+            keys: キャッシュキーのリスト
+
+        Returns:
+            キャッシュキーと埋め込みベクトルの辞書（ヒットしたもののみ）
+        """
+        found = {}
+        if not keys:
+            return found
+
+        with self._lock:
+            # SQLiteの変数の上限を超えないよう、一定件数ずつ問い合わせる
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        """
+        埋め込みベクトルをまとめて保存し、上限を超えた分を古い順に削除
+
+        Args:
+            items: キャッシュキーと埋め込みベクトルの辞書
+        """
+        if not items:
+            return
+
+        now = time.time()
+        rows = [(key, array("f", vector).tobytes(), now) for key, vector in items.items()]
+        with self._lock:
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)", rows
+            )
+            self._count += max(cursor.rowcount, 0)
+
+            if self._count > self.max_entries:
+                overflow = self._count - self.max_entries
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN"
+                    " (SELECT key FROM embeddings ORDER BY last_access LIMIT ?)",
+                    (overflow,)
+                )
+                self._count = self.max_entries
+            self._conn.commit()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    既存の埋め込みモデルを包み、同じテキストの埋め込みをローカルのキャッシュから返すクラス
+
+    キャッシュキーは「モデル名＋正規化したテキストのハッシュ値」のため、ドキュメントと質問文で同じキャッシュを共有する。
+    """
+
+    def __init__(self, underlying: Embeddings, cache_path: str, max_entries: int, model: Optional[str] = None):
+        """
+        Args:
+            underlying: 実際に埋め込みを計算するモデル
+            cache_path: キャッシュ（SQLite）ファイルのパス
+            max_entries: キャッシュする件数の上限
+            model: キャッシュキーに含めるモデル名（省略時は埋め込みモデルの設定値）
+        """
+        self.underlying = underlying
+        self.model = model or getattr(underlying, "model", type(underlying).__name__)
+        self.store = EmbeddingCacheStore(cache_path, max_entries)
+        self.logger = logging.getLogger(ct.LOGGER_NAME)
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @property
+    def stats(self) -> Dict:
+        """キャッシュのヒット数・ミス数・ヒット率"""
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": round(self.hit_rate, 3)}
+
+    def log_stats(self, label: str = "埋め込みキャッシュ"):
+        """
+        キャッシュのヒット率をログ出力
+
+        Args:
+            label: ログメッセージの先頭に付ける文言
+        """
+        self.logger.info(f"{label}: ヒット{self.hits}件 / ミス{self.misses}件（ヒット率 {self.hit_rate:.1%}）")
+
+    def _record(self, hits: int, misses: int):
+        with self._stats_lock:
+            self.hits += hits
+            self.misses += misses
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [make_cache_key(self.model, text) for text in texts]
+        cached = self.store.get_many(list(set(keys)))
+
+        # キャッシュにないテキストのみ、重複を除いて埋め込みモデルに渡す
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.store.put_many(computed)
+            cached.update(computed)
+
+        self._record(len(texts) - len(missing), len(missing))
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = make_cache_key(self.model, text)
+        cached = self.store.get_many([key])
+        if key in cached:
+            self._record(1, 0)
+            return cached[key]
+
+        vector = self.underlying.embed_query(text)
+        self.store.put_many({key: vector})
+        self._record(0, 1)
+        return vector
@@ -0,0 +1,267 @@
+"""
+このファイルは、埋め込みAPIへのリクエストをまとめて並行送信するスケジューラーが記述されたファイルです。
+"""
+
+############################################################
+# ライブラリの読み込み
+############################################################
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import openai
+from langchain_core.embeddings import Embeddings
+
+import constants as ct
+from token_counter import get_token_counter
+
+
+############################################################
+# クラス定義
+############################################################
+class RateLimitWindow:
+    """
+    直近60秒間のリクエスト数・トークン数を記録し、上限（RPM / TPM）を超えないよう送信を待たせるクラス
+
+    429（レート制限）を受けた場合は、指定時間だけ全リクエストの送信を止める（クールダウン）。
+    """
+
+    WINDOW_SECONDS = 60.0
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._lock = threading.Lock()
+        self._events = deque()
+        self._tokens_in_window = 0
+        self._resume_at = 0.0
+
+    def _reserve(self, tokens: int) -> float:
+        """送信枠を確保できれば0を、できなければ待つべき秒数を返す"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._resume_at:
+                return self._resume_at - now
+
+            while self._events and now - self._events[0][0] >= self.WINDOW_SECONDS:
+                _, expired_tokens = self._events.popleft()
+                self._tokens_in_window -= expired_tokens
+
+            over_requests = self.requests_per_minute and len(self._events) + 1 > self.requests_per_minute
+            # 1リクエストでTPMを超える場合でも、窓が空であれば送信を許可する（永久に送れなくなるのを防ぐ）
+            over_tokens = (
+                self.tokens_per_minute
+                and self._events
+                and self._tokens_in_window + tokens > self.tokens_per_minute
+            )
+            if over_requests or over_tokens:
+                return max(self.WINDOW_SECONDS - (now - self._events[0][0]), 0.01)
+
+            self._events.append((now, tokens))
+            self._tokens_in_window += tokens
+            return 0.0
+
+    async def acquire(self, tokens: int):
+        """
+        送信枠が空くまで待機してから、送信枠を確保
+
+        Args:
+            tokens: 送信するリクエストのトークン数
+        """
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def cool_down(self, seconds: float):
+        """
+        指定秒数の間、すべてのリクエストの送信を止める
+
+        Args:
+            seconds: 送信を止める秒数
+        """
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+
+class ScheduledEmbeddings(Embeddings):
+    """
+    埋め込み対象のテキストをトークン数の上限ごとのバッチにまとめ、複数バッチを並行して埋め込みAPIに送信するクラス
+
+    - RPM（1分あたりのリクエスト数）・TPM（1分あたりのトークン数）の上限を守るよう送信を調整
+    - 429（レート制限）を受けた場合は、Retry-Afterまたは指数バックオフの時間だけ全体の送信を止め、
+      同時送信数を半分に減らす（成功が続くと1ずつ戻す）
+    - 処理件数・トークン数・所要時間からスループットをログ出力
+    """
+
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        max_batch_tokens: Optional[int] = None,
+        max_batch_size: Optional[int] = None,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_retries: Optional[int] = None
+    ):
+        """
+        Args:
+            model: モデル名
+            base_url: 埋め込みAPIのベースURL（ローカルのスタブサーバーで動作確認する場合などに指定）
+            api_key: APIキー（省略時は環境変数 OPENAI_API_KEY）
+            max_concurrency: 同時に送信するリクエスト数の上限
+            max_batch_tokens: 1リクエストに含めるトークン数の上限
+            max_batch_size: 1リクエストに含めるテキスト数の上限
+            requests_per_minute: 1分あたりのリクエスト数の上限（0の場合は無制限）
+            tokens_per_minute: 1分あたりのトークン数の上限（0の場合は無制限）
+            max_retries: 1リクエストあたりの再試行回数の上限
+        """
+        self.model = model or ct.EMBEDDING_MODEL
+        self.base_url = base_url or ct.EMBEDDING_API_BASE_URL
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency or ct.EMBEDDING_MAX_CONCURRENCY
+        self.max_batch_tokens = max_batch_tokens or ct.EMBEDDING_BATCH_MAX_TOKENS
+        self.max_batch_size = max_batch_size or ct.EMBEDDING_BATCH_MAX_SIZE
+        self.max_retries = ct.EMBEDDING_MAX_RETRIES if max_retries is None else max_retries
+        self.rate_limit = RateLimitWindow(
+            ct.EMBEDDING_REQUESTS_PER_MINUTE if requests_per_minute is None else requests_per_minute,
+            ct.EMBEDDING_TOKENS_PER_MINUTE if tokens_per_minute is None else tokens_per_minute
+        )
+        self.count_tokens = get_token_counter(self.model)
+        self.logger = logging.getLogger(ct.LOGGER_NAME)
+
+        # 429を受けるたびに半減し、成功が続くと上限まで戻る同時送信数
+        self._concurrency = self.max_concurrency
+        self._sync_client = None
+        self.stats = {"texts": 0, "tokens": 0, "requests": 0, "retries": 0, "rate_limited": 0, "seconds": 0.0}
+
+    def _client_kwargs(self):
+        # 再試行は本クラスで制御するため、SDK側の自動再試行は無効にする
+        return {"base_url": self.base_url, "api_key": self.api_key, "max_retries": 0}
+
+    def make_batches(self, texts: List[str]) -> List[List[int]]:
+        """
+        テキストをトークン数・件数の上限に収まるバッチに分ける
+
+        Args:
+            texts: 埋め込み対象のテキスト
+
+        Returns:
+            バッチごとの「テキストの添字」のリスト
+        """
+        batches = []
+        current, current_tokens = [], 0
+        for i, text in enumerate(texts):
+            tokens = self.count_tokens(text)
+            if current and (current_tokens + tokens > self.max_batch_tokens or len(current) >= self.max_batch_size):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.aembed_documents(texts))
+
+        # すでにイベントループが動いているスレッドから呼ばれた場合は、別スレッドで実行する
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self.aembed_documents(texts)).result()
+
+    def embed_query(self, text: str) -> List[float]:
+        if self._sync_client is None:
+            self._sync_client = openai.OpenAI(**{**self._client_kwargs(), "max_retries": self.max_retries})
+        response = self._sync_client.embeddings.create(model=self.model, input=[text])
+        return response.data[0].embedding
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        started = time.monotonic()
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        batches = self.make_batches(texts)
+        active = 0
+        condition = asyncio.Condition()
+
+        async with openai.AsyncOpenAI(**self._client_kwargs()) as client:
+
+            async def run_batch(indexes: List[int]):
+                nonlocal active
+                # 同時送信数の上限は429の発生状況に応じて変わるため、セマフォではなく条件変数で制御する
+                async with condition:
+                    await condition.wait_for(lambda: active < self._concurrency)
+                    active += 1
+                try:
+                    vectors = await self._send_with_retry(client, [texts[i] for i in indexes])
+                finally:
+                    async with condition:
+                        active -= 1
+                        condition.notify_all()
+                for i, vector in zip(indexes, vectors):
+                    results[i] = vector
+
+            await asyncio.gather(*(run_batch(indexes) for indexes in batches))
+
+        elapsed = time.monotonic() - started
+        self.stats["seconds"] += elapsed
+        self.logger.info(
+            f"埋め込みAPI: {len(texts)}件を{len(batches)}リクエストで処理（{elapsed:.2f}秒, "
+            f"{len(texts) / max(elapsed, 1e-6):.1f}件/秒, 同時送信数{self._concurrency}）"
+        )
+        return results
+
+    async def _send_with_retry(self, client, batch_texts: List[str]) -> List[List[float]]:
+        tokens = sum(self.count_tokens(text) for text in batch_texts)
+        attempt = 0
+        while True:
+            await self.rate_limit.acquire(tokens)
+            try:
+                response = await client.embeddings.create(model=self.model, input=batch_texts)
+            except (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._retry_delay(e, attempt)
+                if isinstance(e, openai.RateLimitError):
+                    self.stats["rate_limited"] += 1
+                    self._concurrency = max(1, self._concurrency // 2)
+                    # 1つのリクエストが429を受けた時点で、ほかのリクエストの送信も止める
+                    self.rate_limit.cool_down(delay)
+                self.stats["retries"] += 1
+                self.logger.warning(f"埋め込みAPIの再試行（{attempt + 1}回目, {delay:.1f}秒後）: {e}")
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+
+            if self._concurrency < self.max_concurrency:
+                self._concurrency += 1
+            self.stats["texts"] += len(batch_texts)
+            self.stats["tokens"] += tokens
+            self.stats["requests"] += 1
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        """Retry-Afterヘッダーがあればそれに従い、なければジッター付きの指数バックオフで待機時間を決める"""
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return min(ct.EMBEDDING_RETRY_MAX_SECONDS, (2 ** attempt) * ct.EMBEDDING_RETRY_BASE_SECONDS) * random.uniform(0.5, 1.0) + 0.1
@@ -0,0 +1,179 @@
+"""
+このファイルは、社員名簿への絞り込み・集計の質問にベクトル検索を使わず正確に答えるための検索エンジンが記述されたファイルです。
+"""
+
+############################################################
+# ライブラリの読み込み
+############################################################
+import os
+import re
+
+import numpy as np
+import pandas as pd
+from langchain_core.documents import Document
+
+from csv_employee_loader import EmployeeCSVLoader
+
+
+############################################################
+# クラス定義
+############################################################
+class EmployeeQueryEngine:
+    """
+    社員名簿のDataFrameを列ごとのNumPy配列（カラムナ形式）として保持し、フィルタ条件に一致する社員を漏れなく返すクラス
+
+    ベクトル検索（k件で打ち切り）と異なり、条件に一致する全社員を返すため、一覧化や人数の集計が正確になる。
+    LLMは検索結果の整形にのみ使う。
+    """
+
+    # フィルタのキーと、名簿上の列名の候補
+    OPTIONAL_COLUMNS = {
+        "role": EmployeeCSVLoader.ROLE_COLUMNS,
+        "skill": EmployeeCSVLoader.SKILL_COLUMNS,
+        "join_year": ["入社日", "入社年月日", "join_date"],
+    }
+    # 値の完全一致で絞り込むキー
+    EXACT_MATCH_KEYS = ("department", "employment_type", "role")
+
+    def __init__(self, loader):
+        """
+        Args:
+            loader: 社員名簿のCSVローダー（EmployeeCSVLoader）
+        """
+        self.loader = loader
+        self.df, dept_col, emp_col = loader.load_dataframe()
+
+        self.columns = {"department": dept_col, "employment_type": emp_col}
+        for key, candidates in self.OPTIONAL_COLUMNS.items():
+            self.columns[key] = next((c for c in candidates if c in self.df.columns), None)
+
+        # 完全一致で絞り込む列は、文字列のNumPy配列として保持
+        self._values = {
+            key: self.df[col].fillna("").astype(str).str.strip().to_numpy()
+            for key, col in self.columns.items()
+            if col and key in self.EXACT_MATCH_KEYS
+        }
+        self.vocabulary = {key: set(values) - {""} for key, values in self._values.items()}
+
+        # スキルは「, 」区切りの複数値のため、社員ごとの集合として保持
+        skill_col = self.columns["skill"]
+        self._skills = (
+            [frozenset(s.strip() for s in str(v).split(",") if s.strip()) for v in self.df[skill_col].fillna("")]
+            if skill_col else None
+        )
+
+        join_col = self.columns["join_year"]
+        self._join_years = (
+            pd.to_datetime(self.df[join_col], errors="coerce").dt.year.to_numpy(dtype=float)
+            if join_col else None
+        )
+
+    @property
+    def size(self):
+        return len(self.df)
+
+    def _normalize_filters(self, filters):
+        return {k: v for k, v in filters.items() if v not in (None, "", [])}
+
+    def supports(self, filters):
+        """
+        フィルタ条件をこのエンジンで正確に処理できるかを判定
+
+        名簿に存在しない列や値（例：「人事」のような部署名の略称）が含まれる場合は、ベクトル検索に任せるためFalseを返す
+
+        Args:
+            filters: フィルタ条件
+
+        Returns:
+            処理できる場合はTrue
+        """
+        filters = self._normalize_filters(filters)
+        if not filters:
+            return False
+
+        for key, value in filters.items():
+            if not self.columns.get(key):
+                return False
+            if key in self.EXACT_MATCH_KEYS:
+                values = value if isinstance(value, list) else [value]
+                if not all(str(v).strip() in self.vocabulary[key] for v in values):
+                    return False
+            if key == "join_year" and self._parse_year(value) is None:
+                return False
+        return True
+
+    @staticmethod
+    def _parse_year(value):
+        match = re.search(r"\d{4}", str(value))
+        return int(match.group()) if match else None
+
+    def query(self, filters):
+        """
+        フィルタ条件に一致する社員の行位置を取得
+
+        Args:
+            filters: フィルタ条件（キーは「department」「employment_type」「role」「skill」「join_year」）
+
+        Returns:
+            一致した社員の行位置の配列（名簿の並び順）
+        """
+        mask = np.ones(self.size, dtype=bool)
+        for key, value in self._normalize_filters(filters).items():
+            if key in self.EXACT_MATCH_KEYS:
+                values = [str(v).strip() for v in (value if isinstance(value, list) else [value])]
+                mask &= np.isin(self._values[key], values)
+            elif key == "skill":
+                skills = value if isinstance(value, list) else [value]
+                mask &= np.fromiter(
+                    (all(skill in row for skill in skills) for row in self._skills),
+                    dtype=bool,
+                    count=self.size
+                )
+            elif key == "join_year":
+                mask &= self._join_years == self._parse_year(value)
+        return np.flatnonzero(mask)
+
+    def to_documents(self, positions):
+        """
+        行位置に対応する社員のドキュメントを作成（名簿の読み込み時と同じ形式）
+
+        Args:
+            positions: 社員の行位置の配列
+
+        Returns:
+            社員ごとのドキュメントのリスト
+        """
+        docs = self.loader._create_employee_documents(
+            self.df.iloc[positions],
+            self.columns["department"],
+            self.columns["employment_type"]
+        )
+        for doc in docs:
+            doc.metadata["category"] = "employee"
+        return docs
+
+    def summarize(self, positions, filters):
+        """
+        検索条件と該当人数・内訳をまとめたドキュメントを作成（LLMが人数を数え間違えないよう、集計結果を明示する）
+
+        Args:
+            positions: 社員の行位置の配列
+            filters: フィルタ条件
+
+        Returns:
+            集計結果のドキュメント
+        """
+        labels = {"department": "部署", "employment_type": "従業員区分", "role": "役職", "skill": "スキル", "join_year": "入社年"}
+        condition_text = "、".join(f"{labels.get(k, k)}: {v}" for k, v in self._normalize_filters(filters).items())
+        lines = [f"検索条件（{condition_text}）に一致する社員は {len(positions)} 名です（名簿から漏れなく抽出済み）。"]
+
+        for key in ("department", "employment_type"):
+            if key not in self._values or len(positions) == 0:
+                continue
+            counts = pd.Series(self._values[key][positions]).value_counts()
+            lines.append(f"{labels[key]}別の内訳: " + "、".join(f"{name} {count}名" for name, count in counts.items()))
+
+        return Document(
+            page_content="\n".join(lines),
+            metadata={"source": os.path.basename(self.loader.file_path), "type": "summary", "category": "employee"}
+        )
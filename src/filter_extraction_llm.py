@@ -1,22 +1,195 @@
 import re
 import json
+import os
+import atexit
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+import constants as ct
 from constants import EXTRACTION_SYSTEM_PROMPT
 from openai import OpenAI
 
 # OpenAIクライアントの初期化（環境変数 OPENAI_API_KEY が必要）
 client = OpenAI()
 
-def extract_filters_from_text(question: str) -> dict:
+EXTRACTION_MODEL = "gpt-4o"
+EXTRACTION_ASSISTANT_MESSAGE = "あなたはPythonで辞書形式のデータ抽出を専門とするアシスタントです。"
+
+
+def get_extraction_signature() -> str:
+    """
+    抽出に使うモデル・プロンプトを表すハッシュ値（プロンプトや出力形式が変わると、以前の抽出結果は使わない）
+    """
+    source = "\n".join([EXTRACTION_MODEL, EXTRACTION_ASSISTANT_MESSAGE, EXTRACTION_SYSTEM_PROMPT])
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+
+
+class FilterExtractionCache:
+    """
+    正規化した質問文をキーに、フィルタの抽出結果を保持するLRUキャッシュ（任意でJSONファイルに永続化）
+
+    - ファイルには抽出に使ったプロンプトのハッシュ値を記録し、現在のものと異なる場合は読み込まない
+    - 追加のたびにファイル全体を書き直さないよう、一定件数または一定時間ごとにまとめて書き出す
+      （一時ファイルに書き出してから置き換えるため、書き込み途中で終了してもファイルは壊れない）
+    """
+
+    def __init__(self, max_entries, path=None, signature="", flush_every=1, flush_interval=0.0):
+        self.max_entries = max_entries
+        self.path = path
+        self.signature = signature
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._unsaved = 0
+        self._last_saved_at = time.monotonic()
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("signature") == signature:
+                    self._entries.update(data.get("entries", {}))
+                else:
+                    print("[INFO] 抽出用のプロンプトが変わったため、フィルタ抽出キャッシュを使わずに作り直します")
+            except Exception as e:
+                print(f"[ERROR] フィルタ抽出キャッシュの読み込み失敗: {e}")
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return dict(self._entries[key])
+
+    def put(self, key, filters):
+        with self._lock:
+            self._entries[key] = dict(filters)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._unsaved += 1
+            due = (
+                self._unsaved >= self.flush_every
+                or time.monotonic() - self._last_saved_at >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        未保存の抽出結果があれば、ファイルに書き出す
+        """
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._unsaved:
+                    return
+                data = {"signature": self.signature, "entries": dict(self._entries)}
+                self._unsaved = 0
+                self._last_saved_at = time.monotonic()
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                print(f"[ERROR] フィルタ抽出キャッシュの保存失敗: {e}")
+
+
+_cache = FilterExtractionCache(
+    ct.FILTER_CACHE_MAX_ENTRIES,
+    ct.FILTER_CACHE_PATH,
+    signature=get_extraction_signature(),
+    flush_every=ct.FILTER_CACHE_FLUSH_EVERY,
+    flush_interval=ct.FILTER_CACHE_FLUSH_SECONDS
+)
+# まだ書き出していない抽出結果は、プロセスの終了時に書き出す
+atexit.register(_cache.flush)
+
+
+def normalize_question(question: str) -> str:
+    """
+    キャッシュキー用に質問文を正規化する（全角・半角の統一、空白と文末記号の除去）
+    """
+    text = unicodedata.normalize("NFKC", question)
+    text = re.sub(r"\s+", "", text)
+    return text.rstrip("。.？?！!")
+
+
+# 入社年の条件（例:「2020年入社」「2020年に入社」）
+JOIN_YEAR_PATTERN = re.compile(r"\d{4}\s*年\s*(?:度\s*)?(?:に\s*)?入社")
+
+
+def match_roster_filters(question: str, departments=(), employment_types=(), roles=(), skills=()) -> dict:
+    """
+    質問文に名簿上の部署名と従業員区分がそのまま含まれている場合、LLMを使わずにフィルタを作成する
+
+    どちらかが含まれていない、または複数の候補に一致する（あいまいな）場合は空の辞書を返す
+    役職・スキル・入社年の条件も含まれる場合は、それらの条件を落とさないよう空の辞書を返す（LLMで抽出する）
+    """
+    if any(term and term in question for term in (*roles, *skills)):
+        return {}
+    if JOIN_YEAR_PATTERN.search(unicodedata.normalize("NFKC", question)):
+        return {}
+
+    matched_departments = [d for d in departments if d and d in question]
+    matched_employment_types = [e for e in employment_types if e and e in question]
+
+    # 「契約社員」に含まれる「社員」のように、ほかの候補の一部としてのみ一致したものは除外
+    matched_employment_types = [
+        e for e in matched_employment_types
+        if not any(e != other and e in other for other in matched_employment_types)
+    ]
+
+    if len(matched_departments) != 1 or len(matched_employment_types) != 1:
+        return {}
+
+    return {
+        "department": matched_departments[0],
+        "employment_type": matched_employment_types[0]
+    }
+
+
+def extract_filters_from_text(question: str, departments=(), employment_types=(), roles=(), skills=()) -> dict:
     """
     ユーザーの質問文から検索用フィルタ（例: 部署、従業員区分）を抽出する
+
+    1. 名簿上の部署名・従業員区分がそのまま含まれ、ほかの条件（役職・スキル・入社年）がなければ、LLMを使わずに返す
+    2. 同じ質問文（正規化後）の抽出結果がキャッシュにあれば、それを返す
+    3. どちらでもなければLLMで抽出し、結果をキャッシュに保存する
+    """
+    roster_filters = match_roster_filters(question, departments, employment_types, roles, skills)
+    if roster_filters:
+        return roster_filters
+
+    key = normalize_question(question)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    filters = _extract_filters_with_llm(question)
+    if filters is not None:
+        _cache.put(key, filters)
+        return filters
+    return {}
+
+
+def _extract_filters_with_llm(question: str):
+    """
+    LLMで質問文からフィルタを抽出する（失敗時はNoneを返し、キャッシュしない）
     """
     prompt = EXTRACTION_SYSTEM_PROMPT + f"\n\n質問文: {question}"
 
     try:
         response = client.chat.completions.create(
-            model="gpt-4o",
+            model=EXTRACTION_MODEL,
             messages=[
-                {"role": "system", "content": "あなたはPythonで辞書形式のデータ抽出を専門とするアシスタントです。"},
+                {"role": "system", "content": EXTRACTION_ASSISTANT_MESSAGE},
                 {"role": "user", "content": prompt}
             ],
             temperature=0
@@ -29,10 +202,10 @@ def extract_filters_from_text(question: str) -> dict:
 
         if not isinstance(filters, dict):
             print("[ERROR] 抽出結果が辞書型ではありません。")
-            return {}
+            return None
 
         return filters
 
     except Exception as e:
         print(f"[ERROR] フィルタ抽出失敗: {e}")
-        return {}
+        return None
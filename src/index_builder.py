@@ -0,0 +1,267 @@
+"""
+このファイルは、社員名簿用・全体用のインデックスへのデータソースの取り込み処理が記述されたファイルです。
+
+アプリの起動時（initialize.py）と、インデックス構築用のコマンド（build_index.py）の両方から使うため、
+Streamlitには依存しません。
+"""
+
+############################################################
+# ライブラリの読み込み
+############################################################
+import glob
+import logging
+import os
+
+from langchain_text_splitters import CharacterTextSplitter
+
+import constants as ct
+from csv_employee_loader import EmployeeCSVLoader
+from document_loader import iter_loaded_files, list_data_files
+from retriever_modules.incremental_index import IncrementalIndexer
+from retriever_modules.near_duplicate import NearDuplicateDetector
+from retriever_modules.retriever_factory import open_persisted_vectorstore
+from structured_document_loader import StructureAwareSplitter
+from web_fetcher import fetch_web_documents
+
+
+############################################################
+# 関数定義
+############################################################
+def find_employee_csv_path():
+    """
+    社員名簿のCSVファイルのパスを取得（ファイル名は自動検出）
+
+    Returns:
+        社員名簿のCSVファイルのパス
+    """
+    employee_folder_path = os.path.join(ct.RAG_TOP_FOLDER_PATH, "社員について")
+    csv_files = glob.glob(os.path.join(employee_folder_path, "*.csv"))
+
+    if not csv_files:
+        raise FileNotFoundError("社員名簿のCSVファイルが見つかりませんでした。")
+
+    return csv_files[0]
+
+
+def create_text_splitter():
+    """
+    全体 retriever 用のテキストスプリッターを作成
+
+    Returns:
+        スプリッターと、分割方法を表す文字列（差分取り込みで、前回と分割方法が変わったかの判定に使う）のタプル
+    """
+    text_splitter = CharacterTextSplitter(
+        chunk_size=ct.CHUNK_SIZE,
+        chunk_overlap=ct.CHUNK_OVERLAP,
+        separator="\n"
+    )
+    if ct.STRUCTURE_AWARE_CHUNKING:
+        # PDF・Wordファイルのセクションは見出し単位のまま、それ以外のドキュメントは従来どおり分割
+        text_splitter = StructureAwareSplitter(fallback_splitter=text_splitter)
+    chunking_signature = f"{type(text_splitter).__name__}:{ct.CHUNK_SIZE}:{ct.CHUNK_OVERLAP}"
+    if ct.STRUCTURE_AWARE_CHUNKING:
+        chunking_signature += f":r{StructureAwareSplitter.REVISION}"
+    if ct.ENABLE_CHUNK_DEDUP:
+        # 重複の判定基準が変わった場合も、統合の結果が変わるため取り込み直す
+        chunking_signature += f":dedup={ct.DEDUP_SIMILARITY_THRESHOLD}/{ct.DEDUP_SHINGLE_SIZE}/{ct.DEDUP_NUM_PERM}/{ct.DEDUP_LSH_BANDS}"
+    return text_splitter, chunking_signature
+
+
+def get_index_metadata(chunking_signature):
+    """
+    インデックスの内容を左右する設定（分割方法・ベクターストアの種類・埋め込みモデル）を取得
+
+    事前に構築したインデックスに記録しておき、アプリの設定と一致する場合のみそのインデックスを使う
+
+    Args:
+        chunking_signature: 分割方法を表す文字列
+
+    Returns:
+        設定の辞書
+    """
+    return {
+        "chunking_signature": chunking_signature,
+        "vectorstore_backend": ct.VECTORSTORE_BACKEND,
+        "embedding_model": ct.EMBEDDING_MODEL
+    }
+
+
+def get_manifest_path(collection_name, db_path=None):
+    """
+    コレクションごとのマニフェストファイルのパスを取得
+
+    Args:
+        collection_name: コレクション名
+        db_path: ベクターストアの保存先（省略時は「VECTORSTORE_DIR_PATH」）
+
+    Returns:
+        マニフェストファイルのパス
+    """
+    # ベクターストアの種類ごとに登録先が異なるため、Chroma以外はマニフェストも分けて記録する
+    if ct.VECTORSTORE_BACKEND != "chroma":
+        collection_name = f"{collection_name}.{ct.VECTORSTORE_BACKEND}"
+    return os.path.join(db_path or ct.VECTORSTORE_DIR_PATH, f"{collection_name}{ct.INDEX_MANIFEST_SUFFIX}")
+
+
+def sync_vectorstores(
+    db_path,
+    embeddings,
+    text_splitter,
+    chunking_signature,
+    employee_csv_path,
+    report_progress=None,
+    on_full_flush=None
+):
+    """
+    永続化した社員名簿用・全体用のコレクションに、変更・追加されたデータソースのみを取り込む
+
+    アプリの起動時と、インデックス構築用のコマンド（build_index.py）の両方から使う
+
+    Args:
+        db_path: ベクターストアの保存先
+        embeddings: 埋め込みモデル
+        text_splitter: 全体用のコレクションに登録するチャンクの分割に使うスプリッター
+        chunking_signature: 分割方法を表す文字列
+        employee_csv_path: 社員名簿のCSVファイルのパス
+        report_progress: 進み具合（0〜1の割合と処理中の内容）を受け取る関数（省略時は通知しない）
+        on_full_flush: 全体用のコレクションへの1回分の登録が終わるたびに、全体用のベクターストアを受け取る関数
+            （省略時は通知しない）
+
+    Returns:
+        社員名簿用と全体用の差分取り込みの状態（IncrementalIndexer）のタプル
+    """
+    logger = logging.getLogger(ct.LOGGER_NAME)
+    report_progress = report_progress or (lambda fraction, message: None)
+
+    # 🔹 社員名簿（名簿ファイルが変更されていれば取り込み直す）
+    report_progress(0.05, "社員名簿を取り込んでいます")
+    employee_db = open_persisted_vectorstore(
+        db_path,
+        ct.EMPLOYEE_COLLECTION_NAME,
+        embeddings=embeddings,
+        collection_metadata={"category": "employee"}
+    )
+    employee_indexer = IncrementalIndexer(employee_db, get_manifest_path(ct.EMPLOYEE_COLLECTION_NAME, db_path))
+    employee_indexer.sync_files(
+        [employee_csv_path],
+        # 名簿は一定行数ずつ読み込みながら埋め込み・登録するため、行数が多くてもメモリ使用量は増えない
+        lambda file_paths: ((file_path, iter_employee_documents(file_path)) for file_path in file_paths)
+    )
+    employee_indexer.prune()
+    employee_indexer.save()
+    logger.info(f"社員名簿インデックスの差分反映結果: {employee_indexer.stats}")
+
+    # 🔸 全体（変更・追加されたデータソースのみ分割・埋め込みを行う）
+    report_progress(0.2, "社内文書を取り込んでいます")
+    full_db = open_persisted_vectorstore(
+        db_path,
+        ct.FULL_COLLECTION_NAME,
+        embeddings=embeddings
+    )
+    full_indexer = IncrementalIndexer(
+        full_db,
+        get_manifest_path(ct.FULL_COLLECTION_NAME, db_path),
+        split_documents=text_splitter.split_documents,
+        pipeline_signature=chunking_signature,
+        deduplicator=NearDuplicateDetector() if ct.ENABLE_CHUNK_DEDUP else None,
+        on_flush=(lambda total: on_full_flush(full_db)) if on_full_flush else None
+    )
+    full_indexer.sync_files(list_data_files(ct.RAG_TOP_FOLDER_PATH), iter_loaded_files)
+    report_progress(0.7, "Webページを取り込んでいます")
+    for web_url, web_docs in iter_web_documents():
+        if web_docs is None:
+            # 一時的な通信エラーで、登録済みの内容が消えないようにする
+            full_indexer.keep_source(web_url)
+        else:
+            full_indexer.sync_documents(web_url, web_docs)
+    full_indexer.prune()
+    full_indexer.save()
+    logger.info(f"全体インデックスの差分反映結果: {full_indexer.stats}")
+
+    return employee_indexer, full_indexer
+
+
+def iter_employee_documents(employee_csv_path):
+    """
+    社員名簿のCSVファイルを一定行数ずつ読み込み、社員ごとのドキュメントを順次返す（名簿全体をメモリ上に持たない）
+
+    Args:
+        employee_csv_path: 社員名簿のCSVファイルのパス
+
+    Yields:
+        社員ごとのドキュメント（最後に部署別サマリー）
+    """
+    csv_loader = EmployeeCSVLoader(file_path=employee_csv_path, encoding="utf-8-sig")
+    employee_count = 0
+    for doc in csv_loader.lazy_load(chunksize=ct.EMPLOYEE_CSV_CHUNK_ROWS):
+        doc.metadata["category"] = "employee"
+        if doc.metadata.get("type") == "employee":
+            employee_count += 1
+        yield doc
+
+    logging.getLogger(ct.LOGGER_NAME).debug(
+        f"社員名簿を読み込みました: {employee_count}名, 部署: {sorted(map(str, csv_loader.department_counts))}"
+    )
+
+
+def load_employee_documents(employee_csv_path):
+    """
+    社員名簿のCSVファイルから、社員ごとのドキュメントを読み込む
+
+    Args:
+        employee_csv_path: 社員名簿のCSVファイルのパス
+
+    Returns:
+        社員ごとのドキュメント（部署別サマリー含む）のリスト
+    """
+    return list(iter_employee_documents(employee_csv_path))
+
+
+def iter_web_documents():
+    """
+    Webベースのデータソースを並行取得する（キャッシュ済みで変更のないページは本文を再取得しない）
+
+    Yields:
+        「URL」と「読み込んだドキュメントのリスト（読み込みに失敗した場合はNone）」のタプル
+    """
+    logger = logging.getLogger(ct.LOGGER_NAME)
+
+    if not (hasattr(ct, 'WEB_URL_LOAD_TARGETS') and ct.WEB_URL_LOAD_TARGETS):
+        logger.info("WEB_URL_LOAD_TARGETSが未設定または空のため、Web読み込みをスキップ")
+        return
+
+    logger.info(f"Web読み込み開始: {len(ct.WEB_URL_LOAD_TARGETS)}件のURL")
+    yield from fetch_web_documents(list(ct.WEB_URL_LOAD_TARGETS))
+
+
+def iter_data_source_documents():
+    """
+    RAGの参照先となるデータソースのドキュメントを、読み込んだものから順に返す
+
+    Yields:
+        読み込んだドキュメント
+    """
+    # 1. ファイルベースのドキュメントを読み込む
+    logger = logging.getLogger(ct.LOGGER_NAME)
+    logger.info(f"データソース探索開始: {ct.RAG_TOP_FOLDER_PATH}")
+    for _, docs in iter_loaded_files(list_data_files(ct.RAG_TOP_FOLDER_PATH)):
+        if docs:
+            yield from docs
+
+    # 2. Webベースのドキュメントを読み込む
+    for _, web_docs in iter_web_documents():
+        if web_docs:
+            yield from web_docs
+
+
+def load_data_sources():
+    """
+    RAGの参照先となるデータソースの読み込み
+    """
+    logger = logging.getLogger(ct.LOGGER_NAME)
+
+    # ファイルとWebのドキュメントを結合
+    docs_all = list(iter_data_source_documents())
+    logger.info(f"総読み込み完了: 合計{len(docs_all)}件のドキュメント")
+
+    return docs_all
@@ -6,30 +6,42 @@
 # ライブラリの読み込み
 ############################################################
 from logging.handlers import TimedRotatingFileHandler
+import atexit
 import logging
 import shutil
+import threading
+import time
 from uuid import uuid4
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), ".")))
-from retriever_modules.retriever_factory import build_employee_retriever
+from retriever_modules.retriever_factory import build_employee_retriever, create_vectorstore, open_persisted_vectorstore
+from retriever_modules.index_store import IndexStore
+from retriever_modules.ingestion_pipeline import ingest_documents
+from retriever_modules.near_duplicate import NearDuplicateDetector
+from retriever_modules.retriever_registry import RetrieverRegistry
+from retriever_modules.hybrid_retriever import HybridRetriever, KeywordIndex
+from retriever_modules.reranker import RerankingRetriever, create_reranker
 import unicodedata
 from dotenv import load_dotenv
-from langchain_openai import OpenAIEmbeddings
+from embedding_cache import CachedEmbeddings, create_embeddings
+from conversation_memory import ConversationMemory
 import streamlit as st
-from docx import Document
-from langchain_community.document_loaders import WebBaseLoader
 from langchain_text_splitters import CharacterTextSplitter, RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
 import constants as ct
 from csv_employee_loader import EmployeeCSVLoader
-from langchain_community.document_loaders import TextLoader
-from langchain_community.document_loaders.csv_loader import CSVLoader
-from langchain_core.documents import Document
-import csv
-from langchain_core.documents import Document
-import csv
-import glob
+from employee_query_engine import EmployeeQueryEngine
+from document_loader import get_loader, list_data_files, load_file, iter_loaded_files, load_documents_from_path
+from data_watcher import DataFolderWatcher
+from index_builder import (
+    create_text_splitter,
+    find_employee_csv_path,
+    get_index_metadata,
+    iter_data_source_documents,
+    iter_employee_documents,
+    load_employee_documents,
+    sync_vectorstores,
+)
 
 ############################################################
 # 設定関連
@@ -45,6 +57,9 @@ load_dotenv()
 def initialize():
     """
     画面読み込み時に実行する初期化処理
+
+    Returns:
+        retrieverの準備ができている場合はTrue（バックグラウンドで構築中の場合はFalse）
     """
     # 初期化データの用意
     initialize_session_state()
@@ -53,7 +68,7 @@ def initialize():
     # ログ出力の設定
     initialize_logger()
     # RAGのRetrieverを作成 （retriever構築を切り出し）
-    initialize_all_retrievers()
+    return initialize_all_retrievers()
 
 
 def initialize_logger():
@@ -110,160 +125,384 @@ def initialize_session_id():
 
 def initialize_all_retrievers():
     """
-    社員名簿用と全体用の retriever を構築
+    社員名簿用と全体用の retriever をセッションに紐付け
+
+    retriever自体はプロセス全体で1度だけ構築され、全セッションで共有される
+    ファイル監視でインデックスが更新された（レジストリのバージョンが変わった）場合は、新しいretrieverに紐付け直す
+
+    Returns:
+        retrieverの準備ができている場合はTrue（バックグラウンドで構築中の場合はFalse）
     """
-    logger = logging.getLogger(ct.LOGGER_NAME)
+    registry = get_retriever_registry()
+    if registry.error is not None:
+        # 次の画面読み込み時に構築をやり直せるよう、失敗したレジストリは破棄する
+        get_retriever_registry.clear()
+        raise registry.error
+    if not registry.is_ready:
+        return False
+
+    version = registry.version
+    if st.session_state.get("retriever_version") != version:
+        # 共有のretrieverへの参照を渡すだけなので、セッション数が増えてもメモリ使用量は増えない
+        st.session_state.employee_retriever = registry.get("employee_retriever")
+        st.session_state.full_retriever = registry.get("full_retriever")
+        st.session_state.retriever_version = version
+    return True
+
+
+@st.cache_resource(show_spinner=False)
+def get_retriever_registry():
+    """
+    プロセス全体で共有するretrieverのレジストリを取得
 
-    if "employee_retriever" in st.session_state and "full_retriever" in st.session_state:
-        return
+    「st.cache_resource」によりサーバープロセス内で1度だけ実行される
+    （同時に複数セッションから呼ばれた場合も、構築処理は1回のみ）
 
-    embeddings = OpenAIEmbeddings()
-    text_splitter = CharacterTextSplitter(
-        chunk_size=ct.CHUNK_SIZE,
-        chunk_overlap=ct.CHUNK_OVERLAP,
-        separator="\n"
-    )
+    バックグラウンドでの構築が有効な場合は、構築の完了を待たずにレジストリを返すため、画面はすぐに表示される。
+    retrieverは構築の完了時に登録され、それまでの進み具合はレジストリの「progress」で参照できる。
 
-    # 🔹 社員名簿 retriever（分割しない＋ファイル名自動検出＋メタデータでフィルタリング）
-    employee_folder_path = os.path.join(ct.RAG_TOP_FOLDER_PATH, "社員について")
-    csv_files = glob.glob(os.path.join(employee_folder_path, "*.csv"))
-
-    if not csv_files:
-        raise FileNotFoundError("社員名簿のCSVファイルが見つかりませんでした。")
-
-    employee_csv_path = csv_files[0]
-    csv_loader = EmployeeCSVLoader(file_path=employee_csv_path, encoding="utf-8-sig")
-    employee_docs = csv_loader.load()
-    print("[DEBUG] 社員ドキュメント数（summary含む）:", len(employee_docs))
-    employee_count = 0
-    found_hayashi = False
-    departments = set()
-    print("\n[DEBUG] 社員一覧（部署と名前）:")
-    for doc in employee_docs:
-        if doc.metadata.get("type") != "employee":
-            continue  # summaryドキュメントは除外
-
-        employee_count += 1
-        content = doc.page_content
-        dept = doc.metadata.get("department", "")
-        departments.add(dept)
-
-        print(f"- 部署: {dept} / 内容: {content[:40]}...")  # 短く切って表示
-        
-        if "林" in content and "千代" in content:
-            found_hayashi = True
-            print("✅ 林 千代さんのレコードを検出しました！")
-
-    print(f"\n[DEBUG] 登録された社員数（summary除く）: {employee_count}")
-    print(f"[DEBUG] 登録された部署一覧: {sorted(departments)}")
-    print("\n[DEBUG] 最初の3人のemployeeドキュメント内容:")
-    employee_only_docs = [doc for doc in employee_docs if doc.metadata.get("type") == "employee"][:3]
-    for doc in employee_only_docs:
-        print(doc.page_content)
-        print(doc.metadata)
-
-    if not found_hayashi:
-        print("❌ 林 千代さんのレコードは employee_docs に見つかりませんでした。")
-
-    for doc in employee_docs:
-        doc.metadata["category"] = "employee"
-
-    st.session_state.employee_retriever = build_employee_retriever(
-    docs=employee_docs,
-    embeddings=embeddings,
-    filter_conditions={"category": "employee"},
-    k=100
-)
+    Returns:
+        社員名簿用と全体用のretrieverを登録済み（または登録予定）のレジストリ
+    """
+    registry = RetrieverRegistry()
+    if ct.BACKGROUND_INDEX_WARMUP:
+        threading.Thread(target=warm_up_registry, args=(registry,), name="index-warmup", daemon=True).start()
+    else:
+        registry.publish(**build_all_retrievers(registry.report_progress))
+        start_data_watcher(registry)
+    return registry
 
-    # 🔸 全体 retriever（従来通り分割あり）
-    full_docs = load_data_sources()
-    splitted_docs = text_splitter.split_documents(full_docs)
-    full_db = Chroma.from_documents(splitted_docs, embedding=embeddings)
-    st.session_state.full_retriever = full_db.as_retriever(search_kwargs={"k": ct.NUM_RELATED_DOCUMENTS})
 
-    # ✅ デバッグ用（削除してもOK）
-    for doc in employee_docs:
-        print("----")
-        print(doc.page_content)
+def warm_up_registry(registry):
+    """
+    retrieverをバックグラウンドで構築し、完了したらレジストリに登録
+
+    Args:
+        registry: 構築したretrieverの登録先
+    """
+    try:
+        # 取り込みに時間がかかる場合も、最初のチャンクが登録された時点から質問を受け付ける
+        registry.publish(**build_all_retrievers(registry.report_progress, registry.publish_partial))
+    except Exception as e:
+        logging.getLogger(ct.LOGGER_NAME).error(f"{ct.INITIALIZE_ERROR_MESSAGE}\n{e}")
+        registry.mark_failed(e)
+        return
+    start_data_watcher(registry)
 
 
-def initialize_session_state():
+def start_data_watcher(registry):
     """
-    初期化データの用意
+    データソースのフォルダの監視を開始し、変更のあったファイルのみを共有のインデックスに反映する
+
+    アプリ内で差分取り込みを行った場合のみ有効（事前に構築したインデックスは読み取りのみのため、監視しない）
+
+    Args:
+        registry: 構築済みのretrieverを登録したレジストリ
     """
-    if "messages" not in st.session_state:
-        # 「表示用」の会話ログを順次格納するリストを用意
-        st.session_state.messages = []
-        # 「LLMとのやりとり用」の会話ログを順次格納するリストを用意
-        st.session_state.chat_history = []
+    if not ct.ENABLE_DATA_WATCHER or registry.get("full_indexer") is None:
+        return
+    watcher = DataFolderWatcher(
+        ct.RAG_TOP_FOLDER_PATH,
+        on_change=lambda paths: reindex_changed_paths(registry, paths),
+        debounce_seconds=ct.DATA_WATCH_DEBOUNCE_SECONDS
+    )
+    watcher.start()
 
 
-def get_loader(file_path, ext):
-    """拡張子に応じた適切なローダーを取得する"""
-    if ext == ".csv":
-        return EmployeeCSVLoader(file_path, encoding="utf-8-sig")
-    
-    loader_class = ct.SUPPORTED_EXTENSIONS.get(ext)
-    if loader_class:
-        # TextLoaderの場合、エンコーディングを指定
-        if loader_class == TextLoader:
-            return loader_class(file_path, encoding="utf-8")
-        return loader_class(file_path)
-    
-    return None
+def reindex_changed_paths(registry, paths):
+    """
+    ファイル監視で検知した変更を共有のインデックスに反映し、変更があればretrieverを新しいバージョンとして登録
 
+    全体用のコレクションに登録されたチャンクはそのまま検索に使われるため、キーワード検索用のインデックスは
+    変更のあったチャンクのみを差分で更新する（retrieverは作り直さない）。
+    社員名簿が変更された場合は、社員名簿のコレクションと検索エンジンも更新する。
 
-def load_documents_from_path(path):
-    """指定されたパスからドキュメントを再帰的に読み込む"""
-    documents = []
+    Args:
+        registry: retrieverを登録したレジストリ
+        paths: 変更のあったファイルまたはフォルダのパス
+    """
     logger = logging.getLogger(ct.LOGGER_NAME)
-    logger.info(f"データソース探索開始: {path}")
-    
-    for root, _, files in os.walk(path):
-        for file in files:
-            file_path = os.path.join(root, file)
-            file_ext = os.path.splitext(file)[1].lower()
-            
-            loader = get_loader(file_path, file_ext)
-            if loader:
-                try:
-                    docs = loader.load()
-                    documents.extend(docs)
-                    logger.info(f"読み込み成功: {file_path} ({len(docs)}件)")
-                except Exception as e:
-                    logger.error(f"読み込み失敗: {file_path}, エラー: {e}")
-    return documents
-
-
-def load_data_sources():
+    started = time.monotonic()
+    updates = {}
+
+    full_indexer = registry.get("full_indexer")
+    version = full_indexer.version
+    full_indexer.sync_paths(paths, iter_loaded_files, list_data_files)
+    full_indexer.save()
+    changed_ids = full_indexer.pop_changed_ids()
+    if full_indexer.version != version:
+        keyword_index = registry.get("keyword_index")
+        if keyword_index is not None:
+            keyword_index.refresh(full_indexer.vectordb, changed_ids)
+            logger.info(f"キーワード検索用インデックスを更新: {len(changed_ids)}チャンク（計{len(keyword_index)}チャンク）")
+        # 同じretrieverを登録し直し、バージョンを上げて回答キャッシュを無効にする
+        updates["full_retriever"] = registry.get("full_retriever")
+
+    try:
+        employee_csv_path = find_employee_csv_path()
+    except FileNotFoundError as e:
+        # 名簿が見つからない間は、前回取り込んだ名簿の内容で回答する
+        logger.warning(f"社員名簿の変更は反映しません: {e}")
+        employee_csv_path = None
+    # 社員名簿のファイル自体、または名簿を含むフォルダが変更された場合
+    if employee_csv_path and any(
+        os.path.commonpath([os.path.abspath(employee_csv_path), os.path.abspath(path)]) == os.path.abspath(path)
+        for path in paths
+    ):
+        employee_indexer = registry.get("employee_indexer")
+        version = employee_indexer.version
+        employee_indexer.sync_paths(
+            [employee_csv_path],
+            lambda file_paths: ((file_path, iter_employee_documents(file_path)) for file_path in file_paths),
+            lambda folder_path: []
+        )
+        employee_indexer.save()
+        if employee_indexer.version != version:
+            updates["employee_query_engine"] = build_employee_query_engine(employee_csv_path)
+
+    if not updates:
+        logger.info("インデックスに反映する変更はありませんでした")
+        return
+    # レジストリのバージョンが変わるため、各セッションのretrieverと回答キャッシュは次の画面読み込み時に切り替わる
+    version = registry.publish(**updates)
+    logger.info(f"データソースの変更をインデックスに反映しました（{time.monotonic() - started:.2f}秒, バージョン{version}）")
+
+
+def build_all_retrievers(report_progress=None, publish_partial=None):
     """
-    RAGの参照先となるデータソースの読み込み
+    社員名簿用と全体用の retriever、社員名簿の検索エンジンを構築
+
+    Args:
+        report_progress: 進み具合（0〜1の割合と処理中の内容）を受け取る関数（省略時は通知しない）
+        publish_partial: 全体用のコレクションに最初のチャンクが登録された時点で、取り込み済みのチャンクのみを
+            検索できるretrieverを受け取る関数（省略時は取り込みの完了まで登録しない）
+
+    Returns:
+        「employee_retriever」「full_retriever」「employee_query_engine」「reranker」をキーとする辞書
+        （アプリ内で差分取り込みを行った場合は、ファイル監視での反映に使う「employee_indexer」「full_indexer」も含む）
     """
     logger = logging.getLogger(ct.LOGGER_NAME)
-    
-    # 1. ファイルベースのドキュメントを読み込む
-    docs_all = load_documents_from_path(ct.RAG_TOP_FOLDER_PATH)
-
-    # 2. Webベースのドキュメントを読み込む
-    web_docs_all = []
-    if hasattr(ct, 'WEB_URL_LOAD_TARGETS') and ct.WEB_URL_LOAD_TARGETS:
-        logger.info(f"Web読み込み開始: {len(ct.WEB_URL_LOAD_TARGETS)}件のURL")
-        for web_url in ct.WEB_URL_LOAD_TARGETS:
-            try:
-                loader = WebBaseLoader(web_url)
-                web_docs = loader.load()
-                web_docs_all.extend(web_docs)
-                logger.info(f"Web読み込み成功: {web_url}")
-            except Exception as e:
-                logger.error(f"Web読み込みエラー {web_url}: {e}")
+    logger.info("retrieverの構築を開始します（プロセス内で1度のみ実行）")
+    report_progress = report_progress or (lambda fraction, message: None)
+
+    report_progress(0.0, "埋め込みモデルを準備しています")
+    embeddings = create_embeddings()
+    text_splitter, chunking_signature = create_text_splitter()
+    employee_csv_path = find_employee_csv_path()
+    employee_query_engine = build_employee_query_engine(employee_csv_path)
+    employee_indexer, full_indexer = None, None
+    employee_retriever = None
+    db_path = None
+    partial_published = False
+
+    def publish_first_batch(full_db):
+        """全体用のコレクションに最初のチャンクが登録された時点で、ベクトル検索のみのretrieverを仮に登録"""
+        nonlocal partial_published
+        if publish_partial is None or partial_published:
+            return
+        partial_published = True
+        publish_partial(
+            employee_retriever=employee_retriever or open_employee_retriever(db_path, embeddings),
+            # キーワード検索・並べ替えは、取り込みの完了後に登録するretrieverで行う
+            full_retriever=full_db.as_retriever(search_kwargs={"k": ct.NUM_RELATED_DOCUMENTS}),
+            employee_query_engine=employee_query_engine
+        )
+        logger.info("取り込み済みのチャンクのみを検索できるretrieverを登録しました（取り込みは継続中）")
+
+    if ct.PERSIST_VECTORSTORE:
+        if ct.USE_PREBUILT_INDEX:
+            # 🔹 事前に構築したインデックスがあれば、取り込みを行わずにそのまま開く（読み取りのみ）
+            store = IndexStore(ct.PREBUILT_INDEX_DIR_PATH)
+            version = store.current_version()
+            mismatch = version and store.find_mismatch(version, get_index_metadata(chunking_signature))
+            if mismatch:
+                # 分割方法やベクターストアの種類が異なるインデックスは、現在の設定では正しく検索できないため使わない
+                logger.warning(
+                    f"事前に構築したインデックスが現在の設定と異なるため使用しません（build_index.pyで構築し直してください）: "
+                    f"{version}（{mismatch}）"
+                )
+                version = None
+            db_path = store.version_path(version) if version else None
+            if db_path:
+                # 新しいバージョンの構築後も、このプロセスが開いているバージョンは削除されないようにする
+                hold_index_lease(store, version)
+                logger.info(f"事前に構築したインデックスを使用します: {db_path}")
+            elif not mismatch:
+                logger.warning(f"事前に構築したインデックスが見つからないため、アプリ内で取り込みを行います: {ct.PREBUILT_INDEX_DIR_PATH}")
+
+        if db_path:
+            report_progress(0.2, "インデックスを読み込んでいます")
+            full_db = open_persisted_vectorstore(db_path, ct.FULL_COLLECTION_NAME, embeddings=embeddings)
+        else:
+            db_path = ct.VECTORSTORE_DIR_PATH
+            employee_indexer, full_indexer = sync_vectorstores(
+                db_path,
+                embeddings,
+                text_splitter,
+                chunking_signature,
+                employee_csv_path,
+                report_progress,
+                publish_first_batch
+            )
+            full_db = full_indexer.vectordb
+
+        # 🔹 社員名簿 retriever（永続化したコレクションを開く）
+        employee_retriever = open_employee_retriever(db_path, embeddings)
     else:
-        logger.info("WEB_URL_LOAD_TARGETSが未設定または空のため、Web読み込みをスキップ")
-    
-    # ファイルとWebのドキュメントを結合
-    docs_all.extend(web_docs_all)
-    logger.info(f"総読み込み完了: 合計{len(docs_all)}件のドキュメント")
+        # 🔹 社員名簿 retriever（分割しない＋ファイル名自動検出＋メタデータでフィルタリング）
+        report_progress(0.05, "社員名簿を取り込んでいます")
+        employee_docs = load_employee_documents(employee_csv_path)
+        employee_retriever = build_employee_retriever(
+            docs=employee_docs,
+            embeddings=embeddings,
+            filter_conditions={"category": "employee"},
+            k=100
+        )
+
+        # 🔸 全体 retriever（読み込んだドキュメントから順に分割・埋め込み・登録していく）
+        report_progress(0.2, "社内文書・Webページを取り込んでいます")
+        full_db = create_vectorstore(ct.FULL_COLLECTION_NAME, embeddings=embeddings)
+        ingest_documents(
+            full_db,
+            iter_data_source_documents(),
+            split_documents=text_splitter.split_documents,
+            deduplicator=NearDuplicateDetector() if ct.ENABLE_CHUNK_DEDUP else None,
+            on_flush=lambda total: publish_first_batch(full_db)
+        )
+
+    report_progress(0.85, "検索用のインデックスを作成しています")
+    reranker = create_reranker() if ct.ENABLE_RERANK else None
+    keyword_index = None
+    if ct.ENABLE_HYBRID_SEARCH:
+        # 🔸 登録済みのチャンクからキーワード検索用の転置インデックスを作成（埋め込みは行わない）
+        keyword_index = KeywordIndex.from_vectorstore(full_db)
+        logger.info(f"キーワード検索用インデックスを作成: {len(keyword_index)}チャンク")
+        if full_indexer is not None:
+            # 取り込み済みのチャンクはすべて含まれるため、ファイル監視での反映はこれ以降の変更のみを対象とする
+            full_indexer.pop_changed_ids()
+    full_retriever = build_full_retriever(full_db, reranker, keyword_index)
+
+    if isinstance(embeddings, CachedEmbeddings):
+        embeddings.log_stats("データ取り込み時の埋め込みキャッシュ")
+
+    logger.info("retrieverの構築が完了しました")
+
+    return {
+        "employee_retriever": employee_retriever,
+        "full_retriever": full_retriever,
+        "employee_query_engine": employee_query_engine,
+        "reranker": reranker,
+        "keyword_index": keyword_index,
+        "employee_indexer": employee_indexer,
+        "full_indexer": full_indexer,
+    }
+
+
+def hold_index_lease(store, version):
+    """
+    事前に構築したインデックスのバージョンにリースを置き、プロセスの終了まで定期的に更新する
+
+    build_index.pyでの古いバージョンの削除は、リースが有効なバージョンを対象外とする
+
+    Args:
+        store: インデックスの保存先
+        version: 使用するバージョン名
+    """
+    lease_path = store.acquire_lease(version)
+    stopped = threading.Event()
+
+    def renew():
+        # 有効期間の1/3ごとに更新し、更新が1〜2回遅れてもリースが切れないようにする
+        while not stopped.wait(ct.PREBUILT_INDEX_LEASE_SECONDS / 3):
+            store.renew_lease(lease_path)
+
+    def release():
+        stopped.set()
+        store.release_lease(lease_path)
+
+    threading.Thread(target=renew, name="index-lease", daemon=True).start()
+    atexit.register(release)
+
 
-    return docs_all
+def open_employee_retriever(db_path, embeddings):
+    """
+    永続化した社員名簿用のコレクションを開き、社員名簿 retriever を構築
+
+    Args:
+        db_path: ベクターストアの保存先
+        embeddings: 埋め込みモデル
+
+    Returns:
+        社員名簿 retriever
+    """
+    return build_employee_retriever(
+        db_path=db_path,
+        collection_name=ct.EMPLOYEE_COLLECTION_NAME,
+        embeddings=embeddings,
+        filter_conditions={"category": "employee"},
+        k=100
+    )
+
+
+def build_full_retriever(full_db, reranker=None, keyword_index=None):
+    """
+    全体用のベクターストアから、全体 retriever を構築
+
+    Args:
+        full_db: 全体用のベクターストア
+        reranker: 検索結果の並べ替えに使うモデル（省略時は並べ替えない）
+        keyword_index: キーワード検索用のインデックス（省略時はベクトル検索のみ）
+
+    Returns:
+        全体 retriever
+    """
+    # 並べ替えを行う場合は、候補を多めに取得してから上位のみに絞り込む
+    candidate_count = ct.RERANK_CANDIDATE_COUNT if reranker else ct.NUM_RELATED_DOCUMENTS
+
+    full_retriever = full_db.as_retriever(search_kwargs={"k": candidate_count})
+    if keyword_index is not None:
+        full_retriever = HybridRetriever(
+            vector_retriever=full_retriever,
+            keyword_index=keyword_index,
+            k=candidate_count,
+            rrf_k=ct.HYBRID_RRF_K,
+            keyword_lookup_max_chars=ct.KEYWORD_LOOKUP_MAX_CHARS
+        )
+    if reranker:
+        full_retriever = RerankingRetriever(
+            base_retriever=full_retriever,
+            reranker=reranker,
+            top_n=ct.NUM_RELATED_DOCUMENTS
+        )
+    return full_retriever
+
+
+def build_employee_query_engine(employee_csv_path):
+    """
+    社員名簿の検索エンジン（条件に一致する社員を漏れなく抽出する）を構築
+
+    Args:
+        employee_csv_path: 社員名簿のCSVファイルのパス
+
+    Returns:
+        社員名簿の検索エンジン（構築に失敗した場合はNoneを返し、ベクトル検索のみで回答する）
+    """
+    try:
+        return EmployeeQueryEngine(EmployeeCSVLoader(employee_csv_path))
+    except Exception as e:
+        logging.getLogger(ct.LOGGER_NAME).warning(f"社員名簿の検索エンジンの構築に失敗: {e}")
+        return None
+
+
+def initialize_session_state():
+    """
+    初期化データの用意
+    """
+    if "messages" not in st.session_state:
+        # 「表示用」の会話ログを順次格納するリストを用意
+        st.session_state.messages = []
+        # 「LLMとのやりとり用」の会話ログ（古いやりとりは要約して一定のサイズに保つ）を用意
+        st.session_state.chat_history = ConversationMemory()
 
 
 def adjust_string(s):
@@ -11,12 +11,6 @@ from dotenv import load_dotenv
 import logging
 # streamlitアプリの表示を担当するモジュール
 import streamlit as st
-# （自作）画面表示以外の様々な関数が定義されているモジュール
-import utils
-# （自作）アプリ起動時に実行される初期化処理が記述された関数
-from initialize import initialize
-# （自作）画面表示系の関数が定義されているモジュール
-import components as cn
 # （自作）変数（定数）がまとめて定義・管理されているモジュール
 import constants as ct
 
@@ -34,11 +28,31 @@ logger = logging.getLogger(ct.LOGGER_NAME)
 
 
 ############################################################
-# 3. 初期化処理
+# 3. タイトル表示
+############################################################
+# LangChainなどの読み込みに時間がかかるライブラリより先に表示し、起動直後でも画面がすぐに表示されるようにする
+st.markdown(f"## {ct.APP_NAME}")
+
+
+############################################################
+# 4. 画面表示・初期化処理用のモジュールの読み込み
+############################################################
+# サーバー起動後の初回のみ数秒かかる（2回目以降の画面読み込みでは、読み込み済みのモジュールが使われる）
+# （自作）画面表示以外の様々な関数が定義されているモジュール
+import utils
+# （自作）アプリ起動時に実行される初期化処理が記述された関数
+from initialize import initialize
+# （自作）画面表示系の関数が定義されているモジュール
+import components as cn
+
+
+############################################################
+# 5. 初期化処理
 ############################################################
 try:
     # 初期化処理（「initialize.py」の「initialize」関数を実行）
-    initialize()
+    # 検索用データの準備はバックグラウンドで行われ、準備中の場合は「index_ready」がFalseになる
+    index_ready = initialize()
     # st.write("employee_retriever" in st.session_state)
     # st.write("full_retriever" in st.session_state)
 except Exception as e:
@@ -56,20 +70,22 @@ if not "initialized" in st.session_state:
 
 
 ############################################################
-# 4. 初期表示
+# 6. 初期表示
 ############################################################
-# タイトル表示
-cn.display_app_title()
-
 # モード表示
 cn.display_select_mode()
 
 # AIメッセージの初期表示
 cn.display_initial_ai_message()
 
+# 検索用データの準備中は、進み具合を表示（準備が終わると画面が再読み込みされる）
+# 取り込みの途中でも、取り込み済みのデータのみで検索できるようになった時点から質問は受け付ける
+if not index_ready or not utils.get_retriever_registry().is_complete:
+    cn.display_index_status(index_ready)
+
 
 ############################################################
-# 5. 会話ログの表示
+# 7. 会話ログの表示
 ############################################################
 try:
     # 会話ログの表示
@@ -84,17 +100,18 @@ except Exception as e:
 
 
 ############################################################
-# 6. チャット入力の受け付け
+# 8. チャット入力の受け付け
 ############################################################
-chat_message = st.chat_input(ct.CHAT_INPUT_HELPER_TEXT)
+# 検索用データの準備が終わるまでは、入力を受け付けない
+chat_message = st.chat_input(ct.CHAT_INPUT_HELPER_TEXT, disabled=not index_ready)
 
 
 ############################################################
-# 7. チャット送信時の処理
+# 9. チャット送信時の処理
 ############################################################
 if chat_message:
     # ==========================================
-    # 7-1. ユーザーメッセージの表示
+    # 9-1. ユーザーメッセージの表示
     # ==========================================
     # ユーザーメッセージのログ出力
     logger.info({"message": chat_message, "application_mode": st.session_state.mode})
@@ -105,7 +122,30 @@ if chat_message:
         st.markdown(chat_message)
 
     # ==========================================
-    # 7-2. LLMからの回答取得
+    # 9-2. LLMからの回答をストリーミング表示（「社内問い合わせ」モードの場合）
+    # ==========================================
+    if ct.STREAM_RESPONSE and st.session_state.mode == ct.ANSWER_MODE_2:
+        with st.chat_message("assistant"):
+            try:
+                # 参照元は検索完了時点で、回答は生成されたトークンから順次表示
+                content = cn.display_contact_llm_response_stream(utils.stream_llm_response(chat_message))
+                # AIメッセージのログ出力
+                logger.info({"message": content, "application_mode": st.session_state.mode})
+            except Exception as e:
+                # エラーログの出力
+                logger.error(f"{ct.GET_LLM_RESPONSE_ERROR_MESSAGE}\n{e}")
+                # エラーメッセージの画面表示
+                st.error(utils.build_error_message(ct.GET_LLM_RESPONSE_ERROR_MESSAGE), icon=ct.ERROR_ICON)
+                # 後続の処理を中断
+                st.stop()
+
+        # 表示用の会話ログにユーザーメッセージとAIメッセージを追加
+        st.session_state.messages.append({"role": "user", "content": chat_message})
+        st.session_state.messages.append({"role": "assistant", "content": content})
+        st.stop()
+
+    # ==========================================
+    # 9-3. LLMからの回答取得
     # ==========================================
     # 「st.spinner」でグルグル回っている間、表示の不具合が発生しないよう空のエリアを表示
     res_box = st.empty()
@@ -123,7 +163,7 @@ if chat_message:
             st.stop()
     
     # ==========================================
-    # 7-3. LLMからの回答表示
+    # 9-4. LLMからの回答表示
     # ==========================================
     with st.chat_message("assistant"):
         try:
@@ -152,7 +192,7 @@ if chat_message:
             st.stop()
 
     # ==========================================
-    # 7-4. 会話ログへの追加
+    # 9-5. 会話ログへの追加
     # ==========================================
     # 表示用の会話ログにユーザーメッセージを追加
     st.session_state.messages.append({"role": "user", "content": chat_message})
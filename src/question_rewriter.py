@@ -0,0 +1,111 @@
+"""
+このファイルは、会話履歴をもとにユーザー入力を独立した質問文に書き換える処理（書き換えの要否判定とキャッシュ）が記述されたファイルです。
+"""
+
+############################################################
+# ライブラリの読み込み
+############################################################
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import constants as ct
+
+
+############################################################
+# 関数定義
+############################################################
+def needs_rewrite(question, chat_history):
+    """
+    質問文を書き換える（LLMを呼ぶ）必要があるかを簡易的に判定
+
+    - 会話履歴がなければ書き換えない
+    - 前の会話を指す表現（「それ」「その」「先ほど」など）を含む、または極端に短い入力は書き換える
+    - それ以外は、質問文単独で意味が通るとみなして書き換えない
+
+    Args:
+        question: ユーザー入力値
+        chat_history: 会話履歴
+
+    Returns:
+        書き換えが必要な場合はTrue
+    """
+    if not chat_history:
+        return False
+
+    text = unicodedata.normalize("NFKC", question).strip()
+    if len(text) <= ct.QUESTION_REWRITE_SHORT_INPUT_CHARS:
+        return True
+    return any(word in text for word in ct.QUESTION_REWRITE_REFERENCE_WORDS)
+
+
+def hash_chat_history(chat_history):
+    """
+    会話履歴の内容からハッシュ値を計算（書き換え結果のキャッシュキー用）
+
+    Args:
+        chat_history: 会話履歴（メッセージまたは文字列のリスト）
+
+    Returns:
+        ハッシュ値（16進文字列）
+    """
+    digest = hashlib.sha1()
+    for message in chat_history:
+        role = getattr(message, "type", "text")
+        content = getattr(message, "content", message)
+        digest.update(f"{role}\x00{content}\x01".encode("utf-8"))
+    return digest.hexdigest()
+
+
+############################################################
+# クラス定義
+############################################################
+class QuestionRewriter:
+    """
+    書き換えが必要な場合のみLLMで質問文を書き換え、結果を「会話履歴のハッシュ値」と「質問文」の組ごとにキャッシュするクラス
+    """
+
+    def __init__(self, rewrite_chain, max_entries=None):
+        """
+        Args:
+            rewrite_chain: 「input」「chat_history」を受け取り、書き換え後の質問文を返すChain
+            max_entries: キャッシュする件数の上限（省略時は設定値）
+        """
+        self.rewrite_chain = rewrite_chain
+        self.max_entries = max_entries or ct.QUESTION_REWRITE_CACHE_MAX_ENTRIES
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.stats = {"skipped": 0, "hits": 0, "rewritten": 0}
+
+    def rewrite(self, question, chat_history):
+        """
+        質問文を、会話履歴なしでも理解できる独立した質問文に書き換える
+
+        Args:
+            question: ユーザー入力値
+            chat_history: 会話履歴
+
+        Returns:
+            書き換え後の質問文（書き換え不要と判定した場合は入力値のまま）
+        """
+        if not needs_rewrite(question, chat_history):
+            with self._lock:
+                self.stats["skipped"] += 1
+            return question
+
+        key = (hash_chat_history(chat_history), question.strip())
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._entries[key]
+
+        rewritten = self.rewrite_chain.invoke({"input": question, "chat_history": chat_history})
+
+        with self._lock:
+            self.stats["rewritten"] += 1
+            self._entries[key] = rewritten
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return rewritten
@@ -1,9 +1,10 @@
 import os
 import shutil
+import constants as ct
 
 def reset_vectorstore():
-    """ベクターストアを削除して再作成を促す"""
-    chroma_path = "./chroma_db"
+    """ベクターストア（差分取り込み用のマニフェストを含む）を削除して再作成を促す"""
+    chroma_path = ct.VECTORSTORE_DIR_PATH
     
     if os.path.exists(chroma_path):
         try:
@@ -0,0 +1,303 @@
+# src/retriever_modules/hybrid_retriever.py
+"""
+このファイルは、キーワード検索（BM25）とベクトル検索の結果を組み合わせるハイブリッド検索が記述されたファイルです。
+"""
+
+############################################################
+# ライブラリの読み込み
+############################################################
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+
+############################################################
+# 関数定義
+############################################################
+# 英数字（製品名・社員IDなど）の連続と、それ以外の文字（日本語など）の連続に分ける
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[\-_.][a-z0-9]+)*|[^\sa-z0-9]+")
+# 日本語の文字列から取り除く記号
+_SYMBOL_PATTERN = re.compile(r"[\s、。・「」『』（）()【】\[\]！？!?,.:：;；\"'“”’/／]+")
+
+
+def normalize_for_search(text: str) -> str:
+    """
+    キーワード検索用にテキストを正規化（全角・半角の統一と小文字化）
+
+    Args:
+        text: 正規化するテキスト
+
+    Returns:
+        正規化後のテキスト
+    """
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    日本語を含むテキストを、キーワード検索用のトークンに分割
+
+    形態素解析器を使わずに済むよう、英数字は単語単位、それ以外の文字は2文字ずつ（文字バイグラム）に分割する
+
+    Args:
+        text: 分割するテキスト
+
+    Returns:
+        トークンのリスト
+    """
+    tokens = []
+    for part in _TOKEN_PATTERN.findall(normalize_for_search(text)):
+        if part[0].isascii() and part[0].isalnum():
+            tokens.append(part)
+            continue
+        for run in _SYMBOL_PATTERN.split(part):
+            if len(run) == 1:
+                tokens.append(run)
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def document_key(doc: Document) -> Tuple[str, str]:
+    """
+    検索結果を突き合わせるためのドキュメントの識別キーを取得
+
+    Args:
+        doc: ドキュメント
+
+    Returns:
+        「参照元」と「本文」のタプル
+    """
+    return str(doc.metadata.get("source", "")), doc.page_content
+
+
+def reciprocal_rank_fusion(result_lists: Iterable[List[Document]], rrf_k: int = 60) -> List[Document]:
+    """
+    複数の検索結果を、順位の逆数の和（Reciprocal Rank Fusion）で1つのランキングにまとめる
+
+    Args:
+        result_lists: 検索結果（順位順のドキュメントのリスト）の並び
+        rrf_k: 順位の影響を緩める定数（大きいほど下位の結果も重視される）
+
+    Returns:
+        スコアの高い順に並べたドキュメントのリスト
+    """
+    scores: Dict[Tuple[str, str], float] = defaultdict(float)
+    docs: Dict[Tuple[str, str], Document] = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = document_key(doc)
+            scores[key] += 1.0 / (rrf_k + rank)
+            docs.setdefault(key, doc)
+    return [docs[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+
+############################################################
+# クラス定義
+############################################################
+class KeywordIndex:
+    """
+    チャンクの転置インデックスをメモリ上に持ち、BM25でキーワード検索を行うクラス
+
+    ベクターストアと同じチャンクを登録しておくことで、埋め込みAPIを呼ばずに製品名・社員IDなどの完全一致に強い検索ができる。
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._docs: Dict[str, Document] = {}
+        self._texts: Dict[str, str] = {}
+        self._lengths: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._total_length = 0
+
+    @classmethod
+    def from_vectorstore(cls, vectordb) -> "KeywordIndex":
+        """
+        ベクターストアに登録済みのチャンクから転置インデックスを作成（埋め込みは行わない）
+
+        Args:
+            vectordb: チャンクを取得するベクターストア（Chroma）
+
+        Returns:
+            作成した転置インデックス
+        """
+        index = cls()
+        stored = vectordb.get(include=["documents", "metadatas"])
+        for doc_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+            index.add(doc_id, Document(page_content=text or "", metadata=metadata or {}))
+        return index
+
+    def refresh(self, vectordb, ids: Iterable[str]):
+        """
+        指定したIDのチャンクのみを、ベクターストアの現在の内容に合わせて登録し直す（差分での更新）
+
+        ベクターストアに存在するチャンクは登録（または置き換え）、存在しないチャンクは削除する
+
+        Args:
+            vectordb: チャンクを取得するベクターストア
+            ids: 登録・削除・更新のあったチャンクID
+        """
+        ids = list(ids)
+        if not ids:
+            return
+        stored = vectordb.get(ids=ids, include=["documents", "metadatas"])
+        with self._lock:
+            for doc_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+                self.add(doc_id, Document(page_content=text or "", metadata=metadata or {}))
+            for doc_id in set(ids).difference(stored["ids"]):
+                self.remove(doc_id)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, doc_id: str, doc: Document):
+        """
+        チャンクを登録（同じIDのチャンクがあれば置き換え）
+
+        Args:
+            doc_id: チャンクID
+            doc: チャンク
+        """
+        tokens = Counter(tokenize(doc.page_content))
+        with self._lock:
+            self.remove(doc_id)
+            self._docs[doc_id] = doc
+            self._texts[doc_id] = normalize_for_search(doc.page_content)
+            self._lengths[doc_id] = sum(tokens.values())
+            self._total_length += self._lengths[doc_id]
+            for token, count in tokens.items():
+                self._postings[token][doc_id] = count
+
+    def remove(self, doc_id: str):
+        """
+        チャンクを削除（未登録の場合は何もしない）
+
+        Args:
+            doc_id: チャンクID
+        """
+        with self._lock:
+            doc = self._docs.pop(doc_id, None)
+            if doc is None:
+                return
+            del self._texts[doc_id]
+            self._total_length -= self._lengths.pop(doc_id)
+            for token in set(tokenize(doc.page_content)):
+                postings = self._postings.get(token)
+                if postings is not None:
+                    postings.pop(doc_id, None)
+                    if not postings:
+                        del self._postings[token]
+
+    def rank_ids(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """
+        BM25のスコアが高い順にチャンクIDを取得
+
+        Args:
+            query: 検索文字列
+            k: 取得件数
+
+        Returns:
+            「チャンクID」と「スコア」のタプルのリスト（スコアが0のチャンクは含まない）
+        """
+        query_tokens = set(tokenize(query))
+        with self._lock:
+            n = len(self._docs)
+            if not n or not query_tokens:
+                return []
+            average_length = self._total_length / n
+
+            scores: Dict[str, float] = defaultdict(float)
+            for token in query_tokens:
+                postings = self._postings.get(token)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / average_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+            return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def search(self, query: str, k: int) -> List[Tuple[Document, float]]:
+        """
+        BM25のスコアが高い順にチャンクを取得
+
+        Args:
+            query: 検索文字列
+            k: 取得件数
+
+        Returns:
+            「チャンク」と「スコア」のタプルのリスト
+        """
+        with self._lock:
+            return [(self._docs[doc_id], score) for doc_id, score in self.rank_ids(query, k)]
+
+    def lookup(self, term: str, k: int) -> List[Document]:
+        """
+        検索文字列をそのまま含むチャンクを取得（BM25のスコアが高い順）
+
+        Args:
+            term: 検索文字列（製品名・社員IDなど）
+            k: 取得件数
+
+        Returns:
+            検索文字列を含むチャンクのリスト（該当がない場合は空のリスト）
+        """
+        needle = normalize_for_search(term).strip()
+        if not needle:
+            return []
+        with self._lock:
+            # 候補はBM25で絞り込み、本文に検索文字列がそのまま含まれるものだけを残す
+            candidates = self.rank_ids(needle, max(k * 10, 50))
+            return [self._docs[doc_id] for doc_id, _ in candidates if needle in self._texts[doc_id]][:k]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    ベクトル検索とキーワード検索（BM25）の結果をReciprocal Rank Fusionでまとめるretriever
+
+    検索文字列が短く、本文にそのまま含まれる場合（製品名・社員IDなどの単語での検索）は、
+    埋め込みAPIを呼ばずにキーワード検索の結果だけを返す。
+    """
+
+    vector_retriever: BaseRetriever
+    keyword_index: Any
+    k: int = 5
+    rrf_k: int = 60
+    keyword_lookup_max_chars: int = 30
+
+    @property
+    def vectorstore(self):
+        # ベクトル検索側のベクターストア（埋め込みモデルの参照などに使う）
+        return self.vector_retriever.vectorstore
+
+    def _keyword_lookup_term(self, query: str) -> Optional[str]:
+        """単語での検索とみなせる場合は、前後の括弧を除いた検索文字列を返す（文章での質問の場合はNone）"""
+        term = normalize_for_search(query).strip().strip("「」『』\"'“”")
+        if not term or len(term) > self.keyword_lookup_max_chars:
+            return None
+        if any(mark in term for mark in ("?", "。", "、", "\n")):
+            return None
+        return term
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        term = self._keyword_lookup_term(query)
+        if term:
+            matched = self.keyword_index.lookup(term, self.k)
+            if matched:
+                return matched
+
+        keyword_results = [doc for doc, _ in self.keyword_index.search(query, self.k)]
+        vector_results = self.vector_retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        return reciprocal_rank_fusion([vector_results, keyword_results], self.rrf_k)[:self.k]
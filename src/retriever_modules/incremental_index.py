@@ -0,0 +1,482 @@
+# src/retriever_modules/incremental_index.py
+"""
+このファイルは、永続化したベクターストアへの差分取り込み（インクリメンタルインデックス）が記述されたファイルです。
+"""
+
+############################################################
+# ライブラリの読み込み
+############################################################
+import hashlib
+import itertools
+import json
+import logging
+import os
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+import constants as ct
+from retriever_modules.ingestion_pipeline import BatchUpserter, iter_split_documents
+from retriever_modules.near_duplicate import NearDuplicateDetector, apply_source_changes
+from retriever_modules.numpy_vectorstore import NumpyVectorStore
+
+
+############################################################
+# 関数定義
+############################################################
+def compute_file_hash(file_path: str) -> str:
+    """
+    ファイル内容のハッシュ値（SHA-256）を計算
+
+    Args:
+        file_path: 対象ファイルのパス
+
+    Returns:
+        16進数表記のハッシュ値
+    """
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def compute_documents_hash(docs: List[Document]) -> str:
+    """
+    ドキュメント群の本文とメタデータから、内容のハッシュ値を計算（Webページなど、ファイル以外のデータソース用）
+
+    Args:
+        docs: 対象ドキュメントのリスト
+
+    Returns:
+        16進数表記のハッシュ値
+    """
+    sha = hashlib.sha256()
+    for doc in docs:
+        sha.update(doc.page_content.encode("utf-8"))
+        sha.update(json.dumps(doc.metadata, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+    return sha.hexdigest()
+
+
+def make_chunk_id(source: str, index: int) -> str:
+    """
+    データソースごとに決定的なチャンクIDを採番
+
+    同じデータソースを取り込み直した場合は同じIDが振られるため、ベクターストア側では上書き（upsert）になる
+
+    Args:
+        source: データソース（ファイルパスやURL）
+        index: データソース内でのチャンクの通し番号
+
+    Returns:
+        チャンクID
+    """
+    prefix = hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+    return f"{prefix}-{index:05d}"
+
+
+############################################################
+# クラス定義
+############################################################
+class IncrementalIndexer:
+    """
+    永続化したベクターストアに対し、前回の取り込み以降に変更のあったデータソースのみを反映するクラス
+
+    データソースごとの「更新日時・サイズ・内容ハッシュ・登録したチャンクID」をマニフェスト（JSON）に記録しておき、
+    - 内容が変わっていないデータソースはスキップ（埋め込みAPIを呼ばない）
+    - 変更・追加されたデータソースは読み込み → 分割 → 埋め込み → 登録
+    - 削除されたデータソースは登録済みのチャンクを削除
+    を行う。マニフェストは処理の最後に保存するため、途中で異常終了しても次回起動時に同じ差分が再処理される。
+
+    重複検出（deduplicator）を指定した場合、登録済みのチャンクとほぼ同じ内容のチャンクは埋め込み・登録せず、
+    既存のチャンク（正規チャンク）の「sources」メタデータに参照元を追加する。正規チャンクを持つデータソースが
+    変更・削除された場合は、そのチャンクを参照していたデータソースも取り込み直す。
+    """
+
+    def __init__(
+        self,
+        vectordb: VectorStore,
+        manifest_path: str,
+        split_documents: Optional[Callable[[List[Document]], List[Document]]] = None,
+        pipeline_signature: Optional[str] = None,
+        deduplicator: Optional[NearDuplicateDetector] = None,
+        on_flush: Optional[Callable[[int], None]] = None
+    ):
+        """
+        Args:
+            vectordb: 取り込み先のベクターストア
+            manifest_path: マニフェストファイルのパス
+            split_documents: チャンク分割を行う関数（省略時は分割しない）
+            pipeline_signature: 読み込み・分割方法を表す文字列（前回の取り込み時と異なる場合は、全データソースを取り込み直す）
+            deduplicator: ほぼ同じ内容のチャンクを検出する検出器（省略時は重複検出を行わない）
+            on_flush: 1回分の登録が終わるたびに、それまでの登録済みチャンク数を受け取る関数（省略時は通知しない）
+        """
+        self.vectordb = vectordb
+        self.manifest_path = manifest_path
+        self.split_documents = split_documents
+        self.logger = logging.getLogger(ct.LOGGER_NAME)
+
+        self._manifest = self._load_manifest()
+        if pipeline_signature is not None and self._manifest.get("pipeline") != pipeline_signature:
+            if self._manifest["sources"]:
+                self.logger.info(f"分割方法が変わったため、全データソースを取り込み直します: {pipeline_signature}")
+            # 変更検知に使う値を消しておくと、次の同期で全データソースが「変更あり」として処理される
+            for entry in self._manifest["sources"].values():
+                for key in ("mtime", "size", "hash"):
+                    entry.pop(key, None)
+            self._manifest["pipeline"] = pipeline_signature
+        self._upserter = BatchUpserter(vectordb, on_flush=on_flush)
+        self._seen_sources = set()
+        self.stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "deduplicated": 0, "failed": 0}
+
+        self.deduplicator = deduplicator
+        self._deduplicator_loaded = False
+        # 正規チャンクの「sources」メタデータへの反映待ち（正規チャンクが登録待ちの場合があるため、保存時にまとめて反映する）
+        self._pending_added_sources: Dict[str, Set[str]] = defaultdict(set)
+        self._pending_removed_sources: Dict[str, Set[str]] = defaultdict(set)
+        # 参照していた正規チャンクが削除され、取り込み直しが必要なデータソース
+        self._stale_sources: Set[str] = set()
+        self._load_files = None
+        # 前回の「pop_changed_ids」以降に登録・削除・メタデータを更新したチャンクID
+        self._changed_ids: Set[str] = set()
+
+    @property
+    def version(self) -> int:
+        """取り込み内容に変更があるたびに増えるインデックスのバージョン番号"""
+        return self._manifest["version"]
+
+    def _load_manifest(self) -> Dict:
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, encoding="utf-8") as f:
+                    return json.load(f)
+            except Exception as e:
+                self.logger.warning(f"マニフェストの読み込みに失敗したため、全件を取り込み直します: {self.manifest_path}, エラー: {e}")
+        return {"version": 0, "sources": {}}
+
+    def save(self):
+        """
+        マニフェストを保存（一時ファイルに書き出してから置き換えることで、書き込み途中の破損を防ぐ）
+
+        登録待ちのチャンクを先にすべて登録してから保存するため、マニフェストに記録済みの内容は必ずベクターストアにも反映済みとなる
+        """
+        self._upserter.flush()
+        if self._pending_added_sources or self._pending_removed_sources:
+            self._changed_ids.update(self._pending_added_sources, self._pending_removed_sources)
+            apply_source_changes(self.vectordb, self._pending_added_sources, self._pending_removed_sources)
+            self._pending_added_sources.clear()
+            self._pending_removed_sources.clear()
+        if isinstance(self.vectordb, NumpyVectorStore):
+            # Chromaは登録のたびにディスクへ書き込まれるが、NumPyのベクターストアは明示的に保存する
+            self.vectordb.persist()
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+    def is_empty(self) -> bool:
+        return not self._manifest["sources"]
+
+    def pop_changed_ids(self) -> Set[str]:
+        """
+        前回の呼び出し以降に登録・削除・メタデータを更新したチャンクIDを取得し、記録をリセット
+
+        キーワード検索用のインデックスなど、ベクターストアと同じチャンクを持つ索引を差分で更新するために使う
+        （「save」の後に呼ぶと、ベクターストアへの反映が済んだ状態のIDが得られる）
+
+        Returns:
+            チャンクIDの集合（ベクターストアに存在しないIDは削除されたチャンク）
+        """
+        changed_ids, self._changed_ids = self._changed_ids, set()
+        return changed_ids
+
+    def sync_files(
+        self,
+        file_paths: Iterable[str],
+        load_files: Callable[[List[str]], Iterable[Tuple[str, Optional[List[Document]]]]]
+    ):
+        """
+        ファイル群をベクターストアに差分反映
+
+        Args:
+            file_paths: 取り込み対象のファイルパス
+            load_files: ファイルパスのリストを受け取り、「ファイルパス」と「ドキュメントのリストまたはイテレーター（読み込み失敗時はNone）」の
+                タプルを入力順に返す関数（変更のあったファイルのみをまとめて渡すため、並列読み込みにも対応できる）
+        """
+        changed = {}
+        for file_path in file_paths:
+            self._seen_sources.add(file_path)
+            stat = os.stat(file_path)
+            entry = self._manifest["sources"].get(file_path)
+
+            # 更新日時とサイズが前回と同じなら、ハッシュ計算も省略して変更なしとみなす
+            if entry and entry.get("mtime") == stat.st_mtime and entry.get("size") == stat.st_size:
+                self.stats["unchanged"] += 1
+                continue
+
+            content_hash = compute_file_hash(file_path)
+            if entry and entry.get("hash") == content_hash:
+                # 内容は同じでタイムスタンプのみ変わった場合（コピーやチェックアウトなど）
+                entry.update(mtime=stat.st_mtime, size=stat.st_size)
+                self.stats["unchanged"] += 1
+                continue
+
+            changed[file_path] = {
+                "mtime": stat.st_mtime,
+                "size": stat.st_size,
+                "hash": content_hash
+            }
+
+        self._load_files = load_files
+        self._load_changed_files(changed)
+        self._reload_stale_files()
+
+    def sync_paths(
+        self,
+        paths: Iterable[str],
+        load_files: Callable[[List[str]], Iterable[Tuple[str, Optional[List[Document]]]]],
+        list_files: Callable[[str], List[str]]
+    ):
+        """
+        指定したパスのみをベクターストアに差分反映（ファイル監視で検知した変更の反映用）
+
+        指定外のデータソースは削除しない（prune不要）。存在しないパスは削除されたものとみなし、
+        そのファイル（フォルダの場合は配下のファイル）の登録済みのチャンクを削除する。
+
+        Args:
+            paths: 変更のあったファイルまたはフォルダのパス
+            load_files: 「sync_files」と同じ、ファイルを読み込む関数
+            list_files: フォルダのパスを受け取り、配下の取り込み対象のファイルパスを返す関数
+        """
+        file_paths = []
+        for path in dict.fromkeys(paths):
+            if os.path.isdir(path):
+                file_paths.extend(list_files(path))
+            elif os.path.isfile(path):
+                file_paths.append(path)
+            else:
+                prefix = os.path.join(path, "")
+                for source in [s for s in self._manifest["sources"] if s == path or s.startswith(prefix)]:
+                    entry = self._manifest["sources"].pop(source)
+                    self._release_chunks(source, entry)
+                    self._manifest["version"] += 1
+                    self.stats["removed"] += 1
+                    self.logger.info(f"削除されたデータソースのチャンクを削除: {source} ({len(entry.get('ids', []))}件)")
+
+        # 指定外の登録済みデータソースも今回の同期対象として扱い、参照先のチャンクが削除された場合はこの場で取り込み直す
+        self._seen_sources.update(self._manifest["sources"])
+        self.sync_files(dict.fromkeys(file_paths), load_files)
+
+    def _load_changed_files(self, changed: Dict[str, Dict]):
+        if not changed:
+            return
+        for file_path, docs in self._load_files(list(changed)):
+            if docs is None:
+                # 読み込みに失敗した場合は、前回登録した内容を残しておく
+                continue
+            self._replace_source(file_path, docs, changed[file_path])
+
+    def _reload_stale_files(self):
+        """参照先の正規チャンクが削除された、内容に変更のないファイルを取り込み直す"""
+        while self._load_files is not None:
+            stale_files = [s for s in sorted(self._stale_sources) if os.path.isfile(s) and s in self._seen_sources]
+            if not stale_files:
+                return
+            changed = {}
+            for file_path in stale_files:
+                self._stale_sources.discard(file_path)
+                stat = os.stat(file_path)
+                changed[file_path] = {"mtime": stat.st_mtime, "size": stat.st_size, "hash": compute_file_hash(file_path)}
+            self._load_changed_files(changed)
+
+    def sync_documents(self, source: str, docs: List[Document]):
+        """
+        読み込み済みのドキュメント（Webページなど）をベクターストアに差分反映
+
+        Args:
+            source: データソース（URLなど）
+            docs: データソースから読み込んだドキュメント
+        """
+        self._seen_sources.add(source)
+        content_hash = compute_documents_hash(docs)
+        entry = self._manifest["sources"].get(source)
+        if entry and entry.get("hash") == content_hash:
+            self.stats["unchanged"] += 1
+            return
+
+        self._replace_source(source, docs, {"hash": content_hash})
+
+    def keep_source(self, source: str):
+        """
+        今回は読み込めなかったが、登録済みの内容を削除せずに残すデータソースを指定（一時的な通信エラー時など）
+
+        Args:
+            source: データソース（URLなど）
+        """
+        self._seen_sources.add(source)
+
+    def prune(self):
+        """
+        今回の同期対象に含まれなかった（削除された）データソースのチャンクをベクターストアから削除
+        """
+        removed_sources = [s for s in self._manifest["sources"] if s not in self._seen_sources]
+        for source in removed_sources:
+            entry = self._manifest["sources"].pop(source)
+            self._release_chunks(source, entry)
+            self.stats["removed"] += 1
+            self.logger.info(f"削除されたデータソースのチャンクを削除: {source} ({len(entry.get('ids', []))}件)")
+
+        if removed_sources:
+            self._manifest["version"] += 1
+            # 削除したデータソースのチャンクを参照していたファイルは、この場で取り込み直す
+            self._reload_stale_files()
+
+    def _ensure_deduplicator(self):
+        """登録済みのチャンクの署名を、重複検出器に読み込む（初回のみ。埋め込みは行わない）"""
+        if self._deduplicator_loaded:
+            return
+        self._deduplicator_loaded = True
+        stored = self.vectordb.get(include=["documents"])
+        for chunk_id, text in zip(stored["ids"], stored["documents"]):
+            self.deduplicator.add(chunk_id, self.deduplicator.signature(text or ""))
+
+    def _release_chunks(self, source: str, entry: Dict, delete_chunks: bool = True):
+        """
+        データソースの登録内容（チャンクと、ほかのデータソースの正規チャンクへの参照）を取り除く
+
+        Args:
+            source: データソース
+            entry: データソースのマニフェストの項目
+            delete_chunks: Falseの場合、ベクターストアのチャンクは削除せずに残す（取り込み直しの完了後に削除する場合）
+        """
+        ids = entry.get("ids", [])
+        if ids:
+            # 同じ同期の中で登録したばかりのチャンクは、まだバッファに残っている場合があるため両方から取り除く
+            self._upserter.discard(ids)
+            if delete_chunks:
+                self._delete_chunks(ids)
+        if self.deduplicator is None:
+            return
+
+        for chunk_id in ids:
+            self.deduplicator.remove(chunk_id)
+        for canonical_id, alias_source in entry.get("aliases", {}).items():
+            self._pending_added_sources[canonical_id].discard(alias_source)
+            self._pending_removed_sources[canonical_id].add(alias_source)
+
+        # 削除したチャンクを正規チャンクとして参照していたデータソースは、内容を失うため取り込み直しが必要
+        removed_ids = set(ids)
+        for other_source, other_entry in self._manifest["sources"].items():
+            if other_source == source or not removed_ids.intersection(other_entry.get("aliases", [])):
+                continue
+            self._stale_sources.add(other_source)
+            # 今回の実行中に取り込み直せなかった場合でも、次回起動時に取り込み直されるようにする
+            for key in ("mtime", "size", "hash"):
+                other_entry.pop(key, None)
+            self.logger.info(f"参照先のチャンクが削除されたため、取り込み直します: {other_source}")
+
+    def _delete_chunks(self, ids: List[str]):
+        self.vectordb.delete(ids=ids)
+        self._changed_ids.update(ids)
+
+    def _replace_source(self, source: str, docs: Iterable[Document], entry: Dict):
+        """
+        データソースの登録済みのチャンクを、読み込んだドキュメントのチャンクに置き換える
+
+        ドキュメントは順次読み込まれる（イテレーターの）場合があるため、読み込みの失敗は次のように扱う
+        - 最初のチャンクまでに失敗した場合は、読み込み失敗として前回登録した内容をそのまま残す
+        - 途中で失敗した場合は、上書きされなかった前回のチャンクを残し、次回の同期で取り込み直す
+
+        Args:
+            source: データソース
+            docs: データソースから読み込んだドキュメント
+            entry: マニフェストに記録する項目（更新日時・サイズ・ハッシュ値）
+        """
+        chunks = iter_split_documents(docs, self.split_documents)
+        try:
+            first_chunks = list(itertools.islice(chunks, 1))
+        except Exception as e:
+            self.stats["failed"] += 1
+            self.logger.error(f"読み込みに失敗したため、前回登録した内容を残します: {source}, エラー: {e}")
+            return
+
+        old_entry = self._manifest["sources"].get(source)
+        old_ids = []
+        if old_entry:
+            old_ids = old_entry.get("ids", [])
+            # 前回のチャンクは、同じIDのチャンクで上書きされなかったものを最後に削除する
+            self._release_chunks(source, old_entry, delete_chunks=False)
+        if self.deduplicator is not None:
+            self._ensure_deduplicator()
+
+        # チャンクは一定件数ごとにまとめて埋め込み・登録されるため、大きなファイルでもメモリ上に全チャンクを持たない
+        ids = []
+        # 統合先の正規チャンクIDと、正規チャンクの「sources」メタデータに追加した参照元
+        aliases = {}
+        merged = 0
+        error = None
+        try:
+            for position, chunk in enumerate(itertools.chain(first_chunks, chunks)):
+                merged += self._add_chunk(source, chunk, make_chunk_id(source, position), ids, aliases)
+        except Exception as e:
+            error = e
+
+        new_ids = set(ids)
+        leftover_ids = [chunk_id for chunk_id in old_ids if chunk_id not in new_ids]
+        if error is None:
+            if leftover_ids:
+                self._upserter.discard(leftover_ids)
+                self._delete_chunks(leftover_ids)
+        else:
+            # 残した前回のチャンクも記録しておき、次回の取り込み直しで削除されるようにする
+            ids.extend(leftover_ids)
+            for key in ("mtime", "size", "hash"):
+                entry.pop(key, None)
+            self.stats["failed"] += 1
+            self.logger.error(
+                f"読み込みの途中で失敗したため、次回の同期で取り込み直します: {source} "
+                f"({len(new_ids)}チャンクを反映済み), エラー: {error}"
+            )
+
+        entry["ids"] = ids
+        self._changed_ids.update(new_ids)
+        if aliases:
+            entry["aliases"] = aliases
+        else:
+            entry.pop("aliases", None)
+        self._manifest["sources"][source] = entry
+        self._stale_sources.discard(source)
+        self._manifest["version"] += 1
+        if error is not None:
+            return
+        self.stats["updated" if old_entry else "added"] += 1
+        self.stats["deduplicated"] += merged
+        message = f"インデックスに反映: {source} ({len(ids)}チャンク"
+        if merged:
+            message += f"、重複{merged}チャンクは既存のチャンクに統合"
+        self.logger.info(message + ")")
+
+    def _add_chunk(self, source: str, chunk: Document, chunk_id: str, ids: List[str], aliases: Dict[str, str]) -> int:
+        """
+        チャンクを1件登録（ほぼ同じ内容のチャンクが登録済みの場合は、参照元のみを追加）
+
+        Returns:
+            既存のチャンクに統合した場合は1、登録した場合は0
+        """
+        if self.deduplicator is not None:
+            signature = self.deduplicator.signature(chunk.page_content)
+            canonical_id = self.deduplicator.find(signature)
+            if canonical_id is not None:
+                # ほぼ同じ内容のチャンクが登録済みのため、埋め込まずに参照元のみを追加する
+                alias_source = str(chunk.metadata.get("source", source))
+                aliases[canonical_id] = alias_source
+                self._pending_added_sources[canonical_id].add(alias_source)
+                self._pending_removed_sources[canonical_id].discard(alias_source)
+                return 1
+            self.deduplicator.add(chunk_id, signature)
+        self._upserter.add(chunk, chunk_id)
+        ids.append(chunk_id)
+        return 0
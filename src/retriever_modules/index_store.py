@@ -0,0 +1,295 @@
+# src/retriever_modules/index_store.py
+"""
+このファイルは、事前に構築したインデックスをバージョンごとのフォルダで管理し、「現在のバージョン」を切り替える処理が記述されたファイルです。
+"""
+
+############################################################
+# ライブラリの読み込み
+############################################################
+import json
+import logging
+import os
+import shutil
+import socket
+import time
+from typing import Dict, List, Optional
+
+import constants as ct
+
+
+############################################################
+# クラス定義
+############################################################
+class IndexStore:
+    """
+    インデックス（ベクターストアとマニフェスト）をバージョンごとのフォルダに保存し、
+    「CURRENT」ファイルに現在のバージョン名を記録するクラス
+
+    - 新しいバージョンは別フォルダに構築し、完了後に「CURRENT」を置き換える（os.replace）ことで一度に切り替える
+    - 構築に失敗した場合は「CURRENT」を変更しないため、アプリは前回のバージョンを使い続ける
+    - シンボリックリンクではなくファイルで切り替えるため、Windowsでも同じように動作する
+    - 実行中のアプリは開いているバージョンのフォルダにリースファイルを置き、定期的に更新する。
+      古いバージョンの削除（prune）では、リースが有効な（更新が途絶えていない）バージョンは削除しない
+    """
+
+    POINTER_FILE_NAME = "CURRENT"
+    LOCK_FILE_NAME = "build.lock"
+    LEASE_FILE_SUFFIX = ".lease"
+    METADATA_FILE_NAME = "index_metadata.json"
+    VERSION_PREFIX = "v"
+
+    def __init__(self, root_path: str):
+        """
+        Args:
+            root_path: バージョンごとのフォルダを置く親フォルダ
+        """
+        self.root_path = root_path
+        self.logger = logging.getLogger(ct.LOGGER_NAME)
+
+    @property
+    def _pointer_path(self) -> str:
+        return os.path.join(self.root_path, self.POINTER_FILE_NAME)
+
+    def current_version(self) -> Optional[str]:
+        """
+        現在のバージョン名を取得
+
+        Returns:
+            バージョン名（まだ1度も切り替えていない、またはフォルダが存在しない場合はNone）
+        """
+        try:
+            with open(self._pointer_path, encoding="utf-8") as f:
+                version = f.read().strip()
+        except OSError:
+            return None
+        if not version or not os.path.isdir(self.version_path(version)):
+            return None
+        return version
+
+    def current_path(self) -> Optional[str]:
+        """
+        現在のバージョンのフォルダのパスを取得
+
+        Returns:
+            フォルダのパス（現在のバージョンがない場合はNone）
+        """
+        version = self.current_version()
+        return self.version_path(version) if version else None
+
+    def version_path(self, version: str) -> str:
+        return os.path.join(self.root_path, version)
+
+    def list_versions(self) -> List[str]:
+        """
+        保存済みのバージョン名を古い順に取得
+
+        Returns:
+            バージョン名のリスト
+        """
+        if not os.path.isdir(self.root_path):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root_path)
+            if name.startswith(self.VERSION_PREFIX) and os.path.isdir(self.version_path(name))
+        )
+
+    def create_version(self, base_on_current: bool = True) -> str:
+        """
+        新しいバージョンのフォルダを作成
+
+        Args:
+            base_on_current: Trueの場合、現在のバージョンの内容をコピーして作成する（差分のみ取り込めばよくなる）
+
+        Returns:
+            作成したバージョン名
+        """
+        os.makedirs(self.root_path, exist_ok=True)
+        version = f"{self.VERSION_PREFIX}{time.strftime('%Y%m%d-%H%M%S')}"
+        suffix = 1
+        while os.path.exists(self.version_path(version)):
+            suffix += 1
+            version = f"{self.VERSION_PREFIX}{time.strftime('%Y%m%d-%H%M%S')}-{suffix}"
+
+        current_path = self.current_path() if base_on_current else None
+        if current_path:
+            # 現在のバージョンを開いているアプリのリースは、新しいバージョンには引き継がない
+            shutil.copytree(
+                current_path,
+                self.version_path(version),
+                ignore=shutil.ignore_patterns(f"*{self.LEASE_FILE_SUFFIX}")
+            )
+        else:
+            os.makedirs(self.version_path(version))
+        return version
+
+    def write_metadata(self, version: str, metadata: Dict):
+        """
+        バージョンの構築に使った設定（分割方法・ベクターストアの種類など）を記録
+
+        Args:
+            version: バージョン名
+            metadata: 記録する設定
+        """
+        with open(os.path.join(self.version_path(version), self.METADATA_FILE_NAME), "w", encoding="utf-8") as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=1)
+
+    def read_metadata(self, version: str) -> Optional[Dict]:
+        """
+        バージョンの構築に使った設定を取得
+
+        Returns:
+            記録された設定（記録がない、または読み込めない場合はNone）
+        """
+        try:
+            with open(os.path.join(self.version_path(version), self.METADATA_FILE_NAME), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def find_mismatch(self, version: str, expected: Dict) -> Optional[str]:
+        """
+        バージョンの構築に使った設定と、指定した設定との違いを確認
+
+        Args:
+            version: バージョン名
+            expected: 一致している必要のある設定
+
+        Returns:
+            一致しない場合はその内容を表す文字列（すべて一致する場合はNone）
+        """
+        metadata = self.read_metadata(version)
+        if metadata is None:
+            return "構築時の設定が記録されていません"
+        differences = [
+            f"{key}: {metadata.get(key)} → {value}" for key, value in expected.items() if metadata.get(key) != value
+        ]
+        return ", ".join(differences) or None
+
+    def publish(self, version: str):
+        """
+        指定したバージョンを現在のバージョンに切り替える（一時ファイルに書き出してから置き換えるため、途中の状態は見えない）
+
+        Args:
+            version: 切り替え先のバージョン名
+        """
+        if not os.path.isdir(self.version_path(version)):
+            raise FileNotFoundError(f"バージョンのフォルダが見つかりません: {self.version_path(version)}")
+        tmp_path = f"{self._pointer_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(tmp_path, self._pointer_path)
+        self.logger.info(f"インデックスのバージョンを切り替えました: {version}")
+
+    def discard(self, version: str):
+        """
+        構築に失敗したバージョンのフォルダを削除（現在のバージョンは削除しない）
+
+        Args:
+            version: 削除するバージョン名
+        """
+        if version != self.current_version():
+            shutil.rmtree(self.version_path(version), ignore_errors=True)
+
+    def prune(self, keep: int, lease_seconds: float = 0.0):
+        """
+        現在のバージョンを除き、新しいものから「keep」個を残して古いバージョンを削除
+
+        削除の対象でも、実行中のアプリが開いている（リースが有効な）バージョンは削除せずに残す
+
+        Args:
+            keep: 残すバージョン数（現在のバージョンを含む）
+            lease_seconds: リースの有効期間の秒数（最後の更新からこの秒数を過ぎたリースは、終了したアプリのものとみなす）
+
+        Returns:
+            削除したバージョン名のリスト
+        """
+        current = self.current_version()
+        others = [version for version in self.list_versions() if version != current]
+        removed = []
+        for version in others[:max(len(others) - max(keep - 1, 0), 0)]:
+            if self.is_leased(version, lease_seconds):
+                self.logger.info(f"実行中のアプリが使用しているため、古いバージョンを残します: {version}")
+                continue
+            shutil.rmtree(self.version_path(version), ignore_errors=True)
+            removed.append(version)
+        return removed
+
+    def acquire_lease(self, version: str) -> str:
+        """
+        指定したバージョンを使用中であることを示すリースファイルを作成（プロセスごとに1つ）
+
+        Args:
+            version: 使用するバージョン名
+
+        Returns:
+            リースファイルのパス（「renew_lease」で更新し、「release_lease」で削除する）
+        """
+        lease_path = os.path.join(
+            self.version_path(version),
+            f"{socket.gethostname()}-{os.getpid()}{self.LEASE_FILE_SUFFIX}"
+        )
+        with open(lease_path, "w", encoding="utf-8") as f:
+            f.write(str(os.getpid()))
+        return lease_path
+
+    def renew_lease(self, lease_path: str):
+        """
+        リースファイルの更新日時を現在の時刻にする（フォルダごと削除されていた場合は何もしない）
+        """
+        try:
+            os.utime(lease_path)
+        except FileNotFoundError:
+            self.logger.warning(f"使用中のインデックスのリースが見つかりません: {lease_path}")
+
+    def release_lease(self, lease_path: str):
+        try:
+            os.remove(lease_path)
+        except FileNotFoundError:
+            pass
+
+    def is_leased(self, version: str, lease_seconds: float) -> bool:
+        """
+        指定したバージョンに、有効期間内に更新されたリースファイルがあるかを確認
+
+        Args:
+            version: バージョン名
+            lease_seconds: リースの有効期間の秒数
+
+        Returns:
+            実行中のアプリが使用している場合はTrue
+        """
+        version_path = self.version_path(version)
+        if not os.path.isdir(version_path):
+            return False
+        now = time.time()
+        for name in os.listdir(version_path):
+            if not name.endswith(self.LEASE_FILE_SUFFIX):
+                continue
+            try:
+                if now - os.path.getmtime(os.path.join(version_path, name)) < lease_seconds:
+                    return True
+            except FileNotFoundError:
+                continue
+        return False
+
+    def acquire_build_lock(self) -> bool:
+        """
+        インデックスの構築を同時に1つだけ実行するためのロックを取得
+
+        Returns:
+            取得できた場合はTrue（ほかの構築処理が実行中の場合はFalse）
+        """
+        os.makedirs(self.root_path, exist_ok=True)
+        try:
+            fd = os.open(os.path.join(self.root_path, self.LOCK_FILE_NAME), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w") as f:
+            f.write(str(os.getpid()))
+        return True
+
+    def release_build_lock(self):
+        try:
+            os.remove(os.path.join(self.root_path, self.LOCK_FILE_NAME))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,170 @@
+# src/retriever_modules/ingestion_pipeline.py
+"""
+このファイルは、ドキュメントを「分割 → 埋め込み → ベクターストアへの登録」と逐次流していく取り込み処理が記述されたファイルです。
+"""
+
+############################################################
+# ライブラリの読み込み
+############################################################
+import logging
+import uuid
+from collections import defaultdict
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+import constants as ct
+from retriever_modules.near_duplicate import apply_source_changes
+
+
+############################################################
+# 関数定義
+############################################################
+def iter_split_documents(
+    docs: Iterable[Document],
+    split_documents: Optional[Callable[[List[Document]], List[Document]]] = None
+) -> Iterator[Document]:
+    """
+    ドキュメントを1件ずつ分割し、チャンクを順次返す（全ドキュメント分のチャンクを一度にメモリ上に持たない）
+
+    Args:
+        docs: 分割対象のドキュメント
+        split_documents: チャンク分割を行う関数（省略時は分割しない）
+
+    Yields:
+        分割後のチャンク
+    """
+    for doc in docs:
+        if split_documents is None:
+            yield doc
+        else:
+            yield from split_documents([doc])
+
+
+def ingest_documents(
+    vectordb: VectorStore,
+    docs: Iterable[Document],
+    split_documents: Optional[Callable[[List[Document]], List[Document]]] = None,
+    batch_size: Optional[int] = None,
+    deduplicator=None,
+    on_flush: Optional[Callable[[int], None]] = None
+) -> int:
+    """
+    ドキュメントを分割しながら、一定件数ごとに埋め込み・登録する
+
+    Args:
+        vectordb: 登録先のベクターストア
+        docs: 登録するドキュメント（ジェネレーターを渡すと、読み込みと登録が並行して進む）
+        split_documents: チャンク分割を行う関数（省略時は分割しない）
+        batch_size: 1回の埋め込み・登録で扱うチャンク数（省略時は設定値）
+        deduplicator: ほぼ同じ内容のチャンクを検出する検出器（指定した場合、重複するチャンクは登録せず、
+            先に登録したチャンクの「sources」メタデータに参照元を追加する）
+        on_flush: 1回分の登録が終わるたびに、それまでの登録済みチャンク数を受け取る関数（省略時は通知しない）
+
+    Returns:
+        登録したチャンク数
+    """
+    upserter = BatchUpserter(vectordb, batch_size, on_flush)
+    added_sources = defaultdict(set)
+    merged = 0
+    for chunk in iter_split_documents(docs, split_documents):
+        if deduplicator is None:
+            upserter.add(chunk)
+            continue
+
+        signature = deduplicator.signature(chunk.page_content)
+        canonical_id = deduplicator.find(signature)
+        if canonical_id is not None:
+            added_sources[canonical_id].add(str(chunk.metadata.get("source", "")))
+            merged += 1
+            continue
+        # 後から参照元を追加できるよう、IDを振って登録する
+        chunk_id = str(uuid.uuid4())
+        deduplicator.add(chunk_id, signature)
+        upserter.add(chunk, chunk_id)
+    upserter.flush()
+
+    if added_sources:
+        apply_source_changes(vectordb, added_sources)
+        logging.getLogger(ct.LOGGER_NAME).info(
+            f"重複チャンクを統合: {merged}件を既存の{len(added_sources)}チャンクにまとめました"
+        )
+    return upserter.total
+
+
+############################################################
+# クラス定義
+############################################################
+class BatchUpserter:
+    """
+    チャンクを溜めておき、一定件数に達するたびにまとめて埋め込み・登録するクラス
+
+    呼び出し元は1件ずつ「add」するだけでよく、バッファが一杯になると登録が終わるまで次のチャンクを受け付けないため
+    （バックプレッシャー）、メモリ上に保持するチャンク数は常に「batch_size」件以下に抑えられる。
+    """
+
+    def __init__(
+        self,
+        vectordb: VectorStore,
+        batch_size: Optional[int] = None,
+        on_flush: Optional[Callable[[int], None]] = None
+    ):
+        """
+        Args:
+            vectordb: 登録先のベクターストア
+            batch_size: 1回の埋め込み・登録で扱うチャンク数（省略時は設定値）
+            on_flush: 1回分の登録が終わるたびに、それまでの登録済みチャンク数を受け取る関数（省略時は通知しない）
+        """
+        self.vectordb = vectordb
+        self.batch_size = batch_size or ct.INGEST_BATCH_SIZE
+        self.on_flush = on_flush
+        self.logger = logging.getLogger(ct.LOGGER_NAME)
+        self.total = 0
+        self._docs: List[Document] = []
+        self._ids: List[Optional[str]] = []
+
+    def add(self, doc: Document, doc_id: Optional[str] = None):
+        """
+        チャンクを1件追加し、バッファが一杯になったら登録を実行
+
+        Args:
+            doc: 登録するチャンク
+            doc_id: チャンクID（省略時はベクターストア側で採番）
+        """
+        self._docs.append(doc)
+        self._ids.append(doc_id)
+        if len(self._docs) >= self.batch_size:
+            self.flush()
+
+    def discard(self, doc_ids: Iterable[str]):
+        """
+        まだ登録していないチャンクのうち、指定したIDのものをバッファから取り除く（登録前に削除されたチャンク用）
+
+        Args:
+            doc_ids: 取り除くチャンクID
+        """
+        doc_ids = set(doc_ids)
+        kept = [(doc, doc_id) for doc, doc_id in zip(self._docs, self._ids) if doc_id not in doc_ids]
+        self._docs = [doc for doc, _ in kept]
+        self._ids = [doc_id for _, doc_id in kept]
+
+    def flush(self):
+        """
+        バッファに溜まっているチャンクをすべて埋め込み・登録
+        """
+        if not self._docs:
+            return
+
+        if all(doc_id is None for doc_id in self._ids):
+            self.vectordb.add_documents(self._docs)
+        else:
+            self.vectordb.add_documents(self._docs, ids=self._ids)
+
+        self.total += len(self._docs)
+        self.logger.info(f"チャンクを登録: {len(self._docs)}件（累計{self.total}件）")
+        self._docs = []
+        self._ids = []
+        if self.on_flush is not None:
+            # 登録済みのチャンクは、この時点で検索できる
+            self.on_flush(self.total)
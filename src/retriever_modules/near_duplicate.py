@@ -0,0 +1,229 @@
+# src/retriever_modules/near_duplicate.py
+"""
+このファイルは、取り込み時にほぼ同じ内容のチャンクを検出し、1つのチャンク（正規チャンク）にまとめる処理が記述されたファイルです。
+"""
+
+############################################################
+# ライブラリの読み込み
+############################################################
+import re
+import threading
+import unicodedata
+import zlib
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+import constants as ct
+
+
+############################################################
+# 関数定義
+############################################################
+# 「sources」メタデータで複数の参照元を区切る文字（Chromaのメタデータは文字列・数値などの単一の値しか持てないため）
+SOURCES_SEPARATOR = "\n"
+
+# MinHashのハッシュ関数 (a * x + b) mod p の法（31bitの素数にすることで、積がuint64に収まる）
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+def split_sources(value: Optional[str]) -> List[str]:
+    """
+    「sources」メタデータの値を、参照元のリストに戻す
+
+    Args:
+        value: 「sources」メタデータの値
+
+    Returns:
+        参照元のリスト
+    """
+    return [source for source in (value or "").split(SOURCES_SEPARATOR) if source]
+
+
+def join_sources(sources: Iterable[str]) -> str:
+    """
+    参照元のリストを「sources」メタデータの値にまとめる
+
+    Args:
+        sources: 参照元
+
+    Returns:
+        「sources」メタデータの値（重複を除いて並べ替え済み）
+    """
+    return SOURCES_SEPARATOR.join(sorted(set(sources)))
+
+
+def update_chunk_metadata(vectordb, ids: List[str], metadatas: List[Dict]):
+    """
+    登録済みチャンクのメタデータのみを更新（埋め込みは計算し直さない）
+
+    Args:
+        vectordb: ベクターストア
+        ids: 更新するチャンクのID
+        metadatas: 更新後のメタデータ
+    """
+    if hasattr(vectordb, "update_metadata"):
+        vectordb.update_metadata(ids, metadatas)
+    else:
+        # Chromaはメタデータのみを更新するAPIをラッパー側に持たないため、コレクションを直接更新する
+        vectordb._collection.update(ids=ids, metadatas=metadatas)
+
+
+def apply_source_changes(vectordb, added: Dict[str, Set[str]], removed: Optional[Dict[str, Set[str]]] = None):
+    """
+    正規チャンクの「sources」メタデータに、重複として統合した参照元を追加・削除
+
+    Args:
+        vectordb: ベクターストア
+        added: 「正規チャンクのID: 追加する参照元の集合」の辞書
+        removed: 「正規チャンクのID: 削除する参照元の集合」の辞書
+    """
+    removed = removed or {}
+    ids = sorted(set(added) | set(removed))
+    if not ids:
+        return
+
+    stored = vectordb.get(ids=ids, include=["metadatas"])
+    update_ids, update_metadatas = [], []
+    for chunk_id, metadata in zip(stored["ids"], stored["metadatas"]):
+        metadata = dict(metadata or {})
+        sources = set(split_sources(metadata.get("sources"))) or {metadata.get("source", "")}
+        sources |= added.get(chunk_id, set())
+        sources -= removed.get(chunk_id, set())
+        metadata["sources"] = join_sources(s for s in sources if s)
+        update_ids.append(chunk_id)
+        update_metadatas.append(metadata)
+
+    if update_ids:
+        update_chunk_metadata(vectordb, update_ids, update_metadatas)
+
+
+############################################################
+# クラス定義
+############################################################
+class NearDuplicateDetector:
+    """
+    MinHashとLSH（Locality Sensitive Hashing）で、登録済みのチャンクとほぼ同じ内容のチャンクを検出するクラス
+
+    - 本文を正規化（全角・半角の統一、空白・記号の除去）した文字n-gramの集合どうしのJaccard係数を、MinHashで推定する
+    - LSHのバンドごとのハッシュで候補を絞り込むため、登録済みのチャンク数が増えても検出のコストはほぼ一定
+    """
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        num_perm: Optional[int] = None,
+        bands: Optional[int] = None,
+        shingle_size: Optional[int] = None,
+        seed: int = 1
+    ):
+        """
+        Args:
+            threshold: 重複とみなすJaccard係数（推定値）の下限
+            num_perm: MinHashのハッシュ関数の数
+            bands: LSHのバンド数（num_permを割り切れる数）
+            shingle_size: 文字n-gramの文字数
+            seed: ハッシュ関数の乱数シード（同じ値であれば、プロセスをまたいでも同じ署名になる）
+        """
+        self.threshold = threshold or ct.DEDUP_SIMILARITY_THRESHOLD
+        self.num_perm = num_perm or ct.DEDUP_NUM_PERM
+        self.bands = bands or ct.DEDUP_LSH_BANDS
+        self.rows = self.num_perm // self.bands
+        self.shingle_size = shingle_size or ct.DEDUP_SHINGLE_SIZE
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MERSENNE_PRIME, size=self.num_perm).astype(np.uint64)
+        self._b = rng.randint(0, _MERSENNE_PRIME, size=self.num_perm).astype(np.uint64)
+
+        self._lock = threading.Lock()
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._buckets: Dict[Tuple[int, bytes], Set[str]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """
+        本文のMinHash署名を計算
+
+        Args:
+            text: チャンクの本文
+
+        Returns:
+            署名（短すぎて判定できない場合はNone）
+        """
+        normalized = re.sub(r"[\W_]+", "", unicodedata.normalize("NFKC", text).lower())
+        if len(normalized) < self.shingle_size * 4:
+            return None
+
+        shingles = {normalized[i:i + self.shingle_size] for i in range(len(normalized) - self.shingle_size + 1)}
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) % _MERSENNE_PRIME for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+        # ハッシュ関数ごとに (a * x + b) mod p で並べ替えた最小値を署名とする
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME
+        return permuted.min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def find(self, signature: Optional[np.ndarray]) -> Optional[str]:
+        """
+        登録済みのチャンクから、ほぼ同じ内容のものを検索
+
+        Args:
+            signature: 検索するチャンクの署名
+
+        Returns:
+            最も類似度の高いチャンクのID（しきい値以上のものがない場合はNone）
+        """
+        if signature is None:
+            return None
+        with self._lock:
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates |= self._buckets.get(key, set())
+
+            best_id, best_similarity = None, self.threshold
+            for chunk_id in candidates:
+                similarity = float(np.mean(self._signatures[chunk_id] == signature))
+                if similarity >= best_similarity:
+                    best_id, best_similarity = chunk_id, similarity
+            return best_id
+
+    def add(self, chunk_id: str, signature: Optional[np.ndarray]):
+        """
+        チャンクの署名を登録
+
+        Args:
+            chunk_id: チャンクID
+            signature: チャンクの署名（Noneの場合は登録しない）
+        """
+        if signature is None:
+            return
+        with self._lock:
+            self._signatures[chunk_id] = signature
+            for key in self._band_keys(signature):
+                self._buckets[key].add(chunk_id)
+
+    def remove(self, chunk_id: str):
+        """
+        チャンクの署名を削除（未登録の場合は何もしない）
+
+        Args:
+            chunk_id: チャンクID
+        """
+        with self._lock:
+            signature = self._signatures.pop(chunk_id, None)
+            if signature is None:
+                return
+            for key in self._band_keys(signature):
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(chunk_id)
+                    if not bucket:
+                        del self._buckets[key]
@@ -0,0 +1,547 @@
+# src/retriever_modules/numpy_vectorstore.py
+"""
+このファイルは、埋め込みベクトルをNumPyの行列として保持し、総当たり（行列とベクトルの積1回）で検索するベクターストアが記述されたファイルです。
+"""
+
+############################################################
+# ライブラリの読み込み
+############################################################
+import json
+import logging
+import os
+import threading
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+import constants as ct
+
+
+############################################################
+# 関数定義
+############################################################
+# int8量子化で、各行の絶対値の最大値を対応させる整数値
+_INT8_MAX = 127
+
+# int8の行列で検索する際に、1度にfloat32へ変換する行数（変換用の一時メモリを一定以下に抑える）
+_INT8_BLOCK_ROWS = 4096
+
+# メタデータの列で、そのチャンクに項目がないことを表すコード
+_MISSING_CODE = -1
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """各行をL2ノルム1に正規化（内積がそのままコサイン類似度になる）"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    正規化済みのベクトルを、行ごとのスケール付きでint8に量子化
+
+    Args:
+        vectors: float32の行列
+
+    Returns:
+        int8の行列と、行ごとのスケール（元の値 ≒ int8の値 × スケール）のタプル
+    """
+    scales = np.abs(vectors).max(axis=1) / _INT8_MAX
+    scales[scales == 0] = 1.0
+    quantized = np.clip(np.rint(vectors / scales[:, None]), -_INT8_MAX, _INT8_MAX).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+############################################################
+# クラス定義
+############################################################
+class _MetadataColumns:
+    """
+    メタデータの項目ごとに、全チャンク分の値を整数コードの配列として持つ列ストア
+
+    「部署 = 営業部」のような条件を、チャンクごとのループではなく配列の比較でまとめて判定する
+    """
+
+    def __init__(self, metadatas: List[Dict]):
+        self.size = len(metadatas)
+        self._codes: Dict[str, np.ndarray] = {}
+        self._vocab: Dict[str, Dict[Any, int]] = {}
+        for row, metadata in enumerate(metadatas):
+            for key, value in metadata.items():
+                try:
+                    hash(value)
+                except TypeError:
+                    continue
+                codes = self._codes.get(key)
+                if codes is None:
+                    codes = self._codes[key] = np.full(self.size, _MISSING_CODE, dtype=np.int32)
+                    self._vocab[key] = {}
+                vocab = self._vocab[key]
+                codes[row] = vocab.setdefault(value, len(vocab))
+
+    def _column(self, key: str) -> Tuple[np.ndarray, Dict[Any, int]]:
+        codes = self._codes.get(key)
+        if codes is None:
+            return np.full(self.size, _MISSING_CODE, dtype=np.int32), {}
+        return codes, self._vocab[key]
+
+    def mask(self, where: Dict) -> np.ndarray:
+        """
+        Chromaと同じ形式の条件（「{"項目": 値}」「$eq / $ne / $in / $nin」「$and / $or」）に一致する行の真偽値の配列を作成
+
+        Args:
+            where: 条件
+
+        Returns:
+            条件に一致する行がTrueの配列
+        """
+        result = np.ones(self.size, dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for clause in condition:
+                    result &= self.mask(clause)
+                continue
+            if key == "$or":
+                matched = np.zeros(self.size, dtype=bool)
+                for clause in condition:
+                    matched |= self.mask(clause)
+                result &= matched
+                continue
+
+            codes, vocab = self._column(key)
+            present = codes != _MISSING_CODE
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for operator, value in condition.items():
+                if operator == "$eq":
+                    result &= codes == vocab.get(value, -2)
+                elif operator == "$ne":
+                    result &= present & (codes != vocab.get(value, -2))
+                elif operator == "$in":
+                    result &= np.isin(codes, [vocab[v] for v in value if v in vocab])
+                elif operator == "$nin":
+                    result &= present & ~np.isin(codes, [vocab[v] for v in value if v in vocab])
+                else:
+                    raise ValueError(f"未対応のフィルタ条件です: {operator}")
+        return result
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    正規化した埋め込みベクトルを連続したNumPyの行列（float32、またはint8に量子化）で保持するベクターストア
+
+    - 検索は「行列 × 質問文のベクトル」の1回の積と「argpartition」による上位k件の抽出のみで行う
+      （数千チャンク程度であれば、近似最近傍探索の索引よりも速く、結果も厳密）
+    - メタデータは項目ごとの列（整数コードの配列）で持ち、フィルタ条件は配列の比較でまとめて判定する
+    - 保存先を指定した場合、行列はディスク上のファイルをメモリマップで開く（ファイルの読み込みを待たずに検索できる）
+
+    Chromaと同じ「add_documents」「get」「delete」「similarity_search（filter付き）」「as_retriever」に対応しており、
+    差分取り込み・重複検出・キーワード検索のインデックス作成からはChromaと同じように使える。
+    """
+
+    RECORDS_FILE_NAME = "records.json"
+
+    def __init__(
+        self,
+        collection_name: str = "langchain",
+        embedding_function: Optional[Embeddings] = None,
+        persist_directory: Optional[str] = None,
+        dtype: str = "float32"
+    ):
+        """
+        Args:
+            collection_name: コレクション名（保存先のフォルダ名に使う）
+            embedding_function: 埋め込みモデル
+            persist_directory: 保存先のフォルダ（省略時はメモリ上のみ）
+            dtype: 行列の型（「float32」または「int8」）
+        """
+        if dtype not in ("float32", "int8"):
+            raise ValueError(f"未対応の型です: {dtype}")
+        self.collection_name = collection_name
+        self._embedding_function = embedding_function
+        self.dtype = dtype
+        self.store_path = os.path.join(persist_directory, f"{collection_name}.npstore") if persist_directory else None
+        self.logger = logging.getLogger(ct.LOGGER_NAME)
+
+        # 検索中に登録・削除が行われても、検索側は取得した時点の配列をそのまま使えるよう、更新時は配列を作り直して差し替える
+        self._lock = threading.RLock()
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[Dict] = []
+        self._row_of: Dict[str, int] = {}
+        self._vectors: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._columns: Optional[_MetadataColumns] = None
+        self._generation = 0
+        self._dirty = False
+
+        if self.store_path:
+            self._load()
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self._embedding_function
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    ############################################################
+    # 保存・読み込み
+    ############################################################
+    def _load(self):
+        records_path = os.path.join(self.store_path, self.RECORDS_FILE_NAME)
+        if not os.path.exists(records_path):
+            return
+        with open(records_path, encoding="utf-8") as f:
+            records = json.load(f)
+
+        self._generation = records["generation"]
+        self._ids = records["ids"]
+        self._texts = records["documents"]
+        self._metadatas = records["metadatas"]
+        self._row_of = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        if not self._ids:
+            return
+
+        vectors = np.load(self._vector_path(records["dtype"]), mmap_mode="r")
+        scales = np.load(self._scale_path()) if records["dtype"] == "int8" else None
+        if records["dtype"] != self.dtype:
+            # 保存時と設定の型が異なる場合は変換し、次回の保存時に新しい型で書き出す
+            if self.dtype == "int8":
+                vectors, scales = _quantize(np.asarray(vectors, dtype=np.float32))
+            else:
+                vectors, scales = _normalize_rows(vectors.astype(np.float32) * scales[:, None]), None
+            self._dirty = True
+            self.logger.info(f"ベクトルの型を変換しました: {self.collection_name} ({records['dtype']} → {self.dtype})")
+        self._vectors, self._scales = vectors, scales
+
+    def _vector_path(self, dtype: str, generation: Optional[int] = None) -> str:
+        generation = self._generation if generation is None else generation
+        return os.path.join(self.store_path, f"vectors-{generation}-{dtype}.npy")
+
+    def _scale_path(self, generation: Optional[int] = None) -> str:
+        generation = self._generation if generation is None else generation
+        return os.path.join(self.store_path, f"scales-{generation}.npy")
+
+    def persist(self):
+        """
+        変更をディスクに保存（保存先を指定していない場合・変更がない場合は何もしない）
+
+        行列は世代番号付きの新しいファイルに書き出し、最後に「records.json」を置き換えて新しい世代に切り替える。
+        書き込みの途中で異常終了しても、前回保存した世代のファイルがそのまま読み込まれる。
+        """
+        if not self.store_path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(self.store_path, exist_ok=True)
+            generation = self._generation + 1
+            if self._vectors is not None:
+                np.save(self._vector_path(self.dtype, generation), np.asarray(self._vectors))
+                if self._scales is not None:
+                    np.save(self._scale_path(generation), self._scales)
+
+            records = {
+                "generation": generation,
+                "dtype": self.dtype,
+                "ids": self._ids,
+                "documents": self._texts,
+                "metadatas": self._metadatas
+            }
+            records_path = os.path.join(self.store_path, self.RECORDS_FILE_NAME)
+            tmp_path = f"{records_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(records, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, records_path)
+
+            self._generation = generation
+            self._dirty = False
+            if self._vectors is not None:
+                # 書き出したファイルをメモリマップで開き直し、メモリ上の行列を解放する
+                self._vectors = np.load(self._vector_path(self.dtype), mmap_mode="r")
+
+            for name in os.listdir(self.store_path):
+                if name.endswith(".npy") and not name.startswith((f"vectors-{generation}-", f"scales-{generation}.")):
+                    try:
+                        os.remove(os.path.join(self.store_path, name))
+                    except OSError:
+                        # ほかのプロセスが開いたままの場合（Windows）は、次回の保存時に削除する
+                        pass
+
+    ############################################################
+    # 登録・更新・削除
+    ############################################################
+    def _encode(self, embeddings: List[List[float]]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        vectors = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        if self.dtype == "int8":
+            return _quantize(vectors)
+        return vectors, None
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[Optional[str]]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        """
+        テキストを埋め込んで登録（同じIDのチャンクがあれば置き換え）
+
+        Args:
+            texts: 登録するテキスト
+            metadatas: テキストごとのメタデータ
+            ids: テキストごとのチャンクID（省略時・Noneの要素は新しく採番する）
+
+        Returns:
+            登録したチャンクのID
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = [dict(m or {}) for m in metadatas] if metadatas else [{} for _ in texts]
+        ids = [chunk_id or str(uuid.uuid4()) for chunk_id in ids] if ids else [str(uuid.uuid4()) for _ in texts]
+
+        # 埋め込みAPIの呼び出し中は、ほかのスレッドからの検索を妨げないようロックの外で行う
+        vectors, scales = self._encode(self._embedding_function.embed_documents(texts))
+
+        with self._lock:
+            # 同じ呼び出しの中で同じIDが複数回指定された場合は、最後のものを使う
+            latest = {chunk_id: i for i, chunk_id in enumerate(ids)}
+            replaced = [(self._row_of[chunk_id], i) for chunk_id, i in latest.items() if chunk_id in self._row_of]
+            appended = [i for chunk_id, i in latest.items() if chunk_id not in self._row_of]
+
+            if self._vectors is None:
+                new_vectors, new_scales = vectors[appended], (scales[appended] if scales is not None else None)
+            else:
+                new_vectors = np.concatenate([np.asarray(self._vectors), vectors[appended]])
+                new_scales = np.concatenate([self._scales, scales[appended]]) if scales is not None else None
+
+            new_ids, new_texts, new_metadatas = list(self._ids), list(self._texts), list(self._metadatas)
+            for row, i in replaced:
+                new_vectors[row] = vectors[i]
+                if new_scales is not None:
+                    new_scales[row] = scales[i]
+                new_texts[row], new_metadatas[row] = texts[i], metadatas[i]
+            for i in appended:
+                new_ids.append(ids[i])
+                new_texts.append(texts[i])
+                new_metadatas.append(metadatas[i])
+
+            self._replace_state(new_ids, new_texts, new_metadatas, new_vectors, new_scales)
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """
+        チャンクを削除（登録されていないIDは無視する）
+
+        Args:
+            ids: 削除するチャンクのID
+
+        Returns:
+            削除を実行した場合はTrue
+        """
+        if not ids:
+            return False
+        with self._lock:
+            removed = {self._row_of[chunk_id] for chunk_id in ids if chunk_id in self._row_of}
+            if not removed:
+                return True
+            keep = np.array([row not in removed for row in range(len(self._ids))], dtype=bool)
+            rows = np.flatnonzero(keep)
+            self._replace_state(
+                [self._ids[row] for row in rows],
+                [self._texts[row] for row in rows],
+                [self._metadatas[row] for row in rows],
+                np.asarray(self._vectors)[keep] if rows.size else None,
+                self._scales[keep] if self._scales is not None and rows.size else None
+            )
+        return True
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict]):
+        """
+        登録済みチャンクのメタデータのみを更新（埋め込みは計算し直さない）
+
+        Args:
+            ids: 更新するチャンクのID
+            metadatas: 更新後のメタデータ
+        """
+        with self._lock:
+            new_metadatas = list(self._metadatas)
+            for chunk_id, metadata in zip(ids, metadatas):
+                if chunk_id in self._row_of:
+                    new_metadatas[self._row_of[chunk_id]] = dict(metadata)
+            self._replace_state(self._ids, self._texts, new_metadatas, self._vectors, self._scales)
+
+    def _replace_state(self, ids, texts, metadatas, vectors, scales):
+        """登録内容をまとめて差し替える（ロック取得済みの状態で呼ぶ）"""
+        self._ids, self._texts, self._metadatas = ids, texts, metadatas
+        self._row_of = {chunk_id: row for row, chunk_id in enumerate(ids)}
+        self._vectors, self._scales = vectors, scales
+        self._columns = None
+        self._dirty = True
+
+    ############################################################
+    # 取得・検索
+    ############################################################
+    def _snapshot(self):
+        with self._lock:
+            if self._columns is None:
+                self._columns = _MetadataColumns(self._metadatas)
+            return self._ids, self._texts, self._metadatas, self._vectors, self._scales, self._columns
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict] = None,
+        include: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> Dict[str, Any]:
+        """
+        登録済みのチャンクを取得（Chromaの「get」と同じ形式で返す）
+
+        Args:
+            ids: 取得するチャンクのID（省略時はすべて）
+            where: メタデータの条件
+            include: 返す項目（「documents」「metadatas」「embeddings」。省略時は本文とメタデータ）
+
+        Returns:
+            「ids」と、includeで指定した項目をキーとする辞書
+        """
+        include = ["documents", "metadatas"] if include is None else include
+        all_ids, texts, metadatas, vectors, scales, columns = self._snapshot()
+        if ids is None:
+            rows = np.arange(len(all_ids))
+        else:
+            row_of = {chunk_id: row for row, chunk_id in enumerate(all_ids)}
+            rows = np.array([row_of[chunk_id] for chunk_id in ids if chunk_id in row_of], dtype=np.int64)
+        if where:
+            rows = rows[columns.mask(where)[rows]]
+
+        result = {"ids": [all_ids[row] for row in rows]}
+        if "documents" in include:
+            result["documents"] = [texts[row] for row in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [dict(metadatas[row]) for row in rows]
+        if "embeddings" in include:
+            selected = np.asarray(vectors[rows], dtype=np.float32) if rows.size else np.zeros((0, 0), np.float32)
+            if scales is not None and rows.size:
+                selected *= scales[rows][:, None]
+            result["embeddings"] = selected
+        return result
+
+    def _scores(self, vectors: np.ndarray, scales: Optional[np.ndarray], rows: Optional[np.ndarray], query: np.ndarray) -> np.ndarray:
+        """
+        質問文のベクトルとのコサイン類似度を、指定した行（省略時は全行）について計算
+
+        int8への量子化や浮動小数点の丸め誤差で-1〜1をわずかに超える場合があるため、範囲内に収める
+        """
+        matrix = vectors if rows is None else vectors[rows]
+        if scales is None:
+            return np.clip(np.asarray(matrix) @ query, -1.0, 1.0)
+
+        row_scales = scales if rows is None else scales[rows]
+        scores = np.empty(matrix.shape[0], dtype=np.float32)
+        for start in range(0, matrix.shape[0], _INT8_BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + _INT8_BLOCK_ROWS], dtype=np.float32)
+            scores[start:start + block.shape[0]] = block @ query
+        return np.clip(scores * row_scales, -1.0, 1.0)
+
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict] = None,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """
+        ベクトルに近いチャンクを検索
+
+        Args:
+            embedding: 検索に使うベクトル
+            k: 取得件数
+            filter: メタデータの条件
+
+        Returns:
+            チャンクと、コサイン類似度（大きいほど近い）のタプルのリスト（類似度の高い順）
+        """
+        ids, texts, metadatas, vectors, scales, columns = self._snapshot()
+        if vectors is None or k <= 0:
+            return []
+
+        query = _normalize_rows(np.asarray([embedding], dtype=np.float32))[0]
+        rows = np.flatnonzero(columns.mask(filter)) if filter else None
+        if rows is not None and rows.size == 0:
+            return []
+        scores = self._scores(vectors, scales, rows, query)
+
+        if scores.shape[0] > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(scores.shape[0])
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        results = []
+        for position in top:
+            row = int(rows[position]) if rows is not None else int(position)
+            doc = Document(id=ids[row], page_content=texts[row], metadata=dict(metadatas[row]))
+            results.append((doc, float(scores[position])))
+        return results
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict] = None,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding_function.embed_query(query), k, filter)
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # コサイン類似度（-1〜1）を、0〜1の関連度に変換
+        return lambda similarity: (similarity + 1.0) / 2.0
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+        collection_name: str = "langchain",
+        persist_directory: Optional[str] = None,
+        dtype: str = "float32",
+        **kwargs: Any
+    ) -> "NumpyVectorStore":
+        store = cls(
+            collection_name=collection_name,
+            embedding_function=embedding,
+            persist_directory=persist_directory,
+            dtype=dtype
+        )
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        store.persist()
+        return store
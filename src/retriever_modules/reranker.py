@@ -0,0 +1,137 @@
+# src/retriever_modules/reranker.py
+"""
+このファイルは、検索で多めに取得した候補を並べ替え（リランキング）、上位のみをLLMに渡す処理が記述されたファイルです。
+"""
+
+############################################################
+# ライブラリの読み込み
+############################################################
+import logging
+from typing import Any, List
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+import constants as ct
+from retriever_modules.hybrid_retriever import KeywordIndex
+
+
+############################################################
+# 関数定義
+############################################################
+def create_reranker():
+    """
+    設定に応じたリランカーを作成
+
+    クロスエンコーダーのモデルが指定され、sentence-transformersがインストールされている場合はクロスエンコーダーを、
+    それ以外の場合は軽量な語彙ベースのリランカーを使う
+
+    Returns:
+        リランカー
+    """
+    if ct.RERANK_CROSS_ENCODER_MODEL:
+        try:
+            return CrossEncoderReranker(ct.RERANK_CROSS_ENCODER_MODEL)
+        except Exception as e:
+            logging.getLogger(ct.LOGGER_NAME).warning(
+                f"クロスエンコーダーを読み込めないため、語彙ベースのリランカーを使います: {e}"
+            )
+    return LexicalReranker(ct.RERANK_LEXICAL_WEIGHT)
+
+
+############################################################
+# クラス定義
+############################################################
+class LexicalReranker:
+    """
+    候補内でのBM25スコア（質問文との語彙の重なり）と、元の検索順位を組み合わせて並べ替えるリランカー
+
+    モデルを使わないためCPUのみで高速に動作し、追加のインストールも不要
+    """
+
+    def __init__(self, lexical_weight: float = 0.5):
+        """
+        Args:
+            lexical_weight: BM25スコアの重み（0〜1。残りは元の検索順位の重み）
+        """
+        self.lexical_weight = lexical_weight
+
+    def rerank(self, query: str, docs: List[Document], top_n: int) -> List[Document]:
+        """
+        候補を質問文との関連度順に並べ替え、上位のみを返す
+
+        Args:
+            query: 質問文
+            docs: 候補のドキュメント（元の検索順位順）
+            top_n: 返す件数
+
+        Returns:
+            並べ替え後の上位のドキュメント
+        """
+        if len(docs) <= 1:
+            return docs[:top_n]
+
+        index = KeywordIndex()
+        for i, doc in enumerate(docs):
+            index.add(str(i), doc)
+        lexical_scores = [0.0] * len(docs)
+        for doc_id, score in index.rank_ids(query, len(docs)):
+            lexical_scores[int(doc_id)] = score
+
+        max_score = max(lexical_scores) or 1.0
+        scores = [
+            self.lexical_weight * lexical / max_score + (1 - self.lexical_weight) / (rank + 1)
+            for rank, lexical in enumerate(lexical_scores)
+        ]
+        order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)
+        return [docs[i] for i in order[:top_n]]
+
+
+class CrossEncoderReranker:
+    """
+    ローカルのクロスエンコーダー（sentence-transformers）で質問文と候補の関連度を採点するリランカー
+    """
+
+    def __init__(self, model_name: str):
+        """
+        Args:
+            model_name: クロスエンコーダーのモデル名
+        """
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name, device="cpu")
+
+    def rerank(self, query: str, docs: List[Document], top_n: int) -> List[Document]:
+        """
+        候補を質問文との関連度順に並べ替え、上位のみを返す（採点に失敗した場合は元の検索順位のまま上位を返す）
+        """
+        if len(docs) <= 1:
+            return docs[:top_n]
+        try:
+            scores = self.model.predict([(query, doc.page_content) for doc in docs])
+        except Exception as e:
+            logging.getLogger(ct.LOGGER_NAME).warning(f"リランキングに失敗したため、元の検索順位を使います: {e}")
+            return docs[:top_n]
+        order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)
+        return [docs[i] for i in order[:top_n]]
+
+
+class RerankingRetriever(BaseRetriever):
+    """
+    元のretrieverで多めに取得した候補をリランカーで並べ替え、上位「top_n」件のみを返すretriever
+    """
+
+    base_retriever: BaseRetriever
+    reranker: Any
+    top_n: int = 5
+
+    @property
+    def vectorstore(self):
+        # 元のretrieverのベクターストア（埋め込みモデルの参照などに使う）
+        return self.base_retriever.vectorstore
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        candidates = self.base_retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        return self.reranker.rerank(query, candidates, self.top_n)
@@ -1,10 +1,115 @@
 # src/components/retriever_factory.py
 
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict
 from langchain.vectorstores import Chroma
 from langchain.embeddings import OpenAIEmbeddings
-from langchain.vectorstores.base import VectorStoreRetriever
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
 from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+from embedding_cache import create_embeddings
+import constants as ct
+from retriever_modules.numpy_vectorstore import NumpyVectorStore
+
+
+def create_vectorstore(
+    collection_name: str,
+    embeddings: Optional[OpenAIEmbeddings] = None,
+    persist_directory: Optional[str] = None,
+    collection_metadata: Optional[Dict] = None
+):
+    """
+    設定（VECTORSTORE_BACKEND）に応じたベクターストアのコレクションを作成（保存先を省略した場合はメモリ上のみ）
+    """
+    if embeddings is None:
+        embeddings = create_embeddings()
+
+    if ct.VECTORSTORE_BACKEND == "numpy":
+        return NumpyVectorStore(
+            collection_name=collection_name,
+            embedding_function=embeddings,
+            persist_directory=persist_directory,
+            dtype=ct.NUMPY_VECTOR_DTYPE
+        )
+    return Chroma(
+        collection_name=collection_name,
+        persist_directory=persist_directory,
+        embedding_function=embeddings,
+        collection_metadata=collection_metadata
+    )
+
+
+def open_persisted_vectorstore(
+    db_path: str,
+    collection_name: str,
+    embeddings: Optional[OpenAIEmbeddings] = None,
+    collection_metadata: Optional[Dict] = None
+):
+    """
+    ディスクに永続化されたベクターストアのコレクションを開く（存在しない場合は空のコレクションを作成）
+    """
+    return create_vectorstore(
+        collection_name,
+        embeddings=embeddings,
+        persist_directory=db_path,
+        collection_metadata=collection_metadata
+    )
+
+
+def combine_filters(*conditions: Optional[Dict]) -> Optional[Dict]:
+    """
+    複数のメタデータの条件を、Chromaのフィルタ形式（すべて満たす）にまとめる
+
+    Args:
+        conditions: 「メタデータ名: 値」の辞書（Noneや空の辞書は無視する）
+
+    Returns:
+        Chromaに渡すフィルタ（条件がない場合はNone）
+    """
+    clauses = [{key: value} for condition in conditions if condition for key, value in condition.items()]
+    if not clauses:
+        return None
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$and": clauses}
+
+
+class FilteredRetriever(BaseRetriever):
+    """
+    メタデータのフィルタ条件付きで検索するretriever（作成後は変更できない）
+
+    リクエストごとの条件は「with_filters」で新しいretrieverを作って指定するため、
+    1つのretrieverを複数のセッション・スレッドで共有しても、ほかのリクエストの条件が混ざることはない
+    """
+
+    model_config = ConfigDict(frozen=True, arbitrary_types_allowed=True)
+
+    vectorstore: Any
+    k: int = 5
+    base_filter: Optional[Dict] = None
+    filters: Optional[Dict] = None
+
+    def with_filters(self, filters: Optional[Dict]) -> "FilteredRetriever":
+        """
+        基本の条件にリクエストごとの条件を加えたretrieverを作成（元のretrieverは変更しない）
+
+        Args:
+            filters: 「メタデータ名: 値」の辞書
+
+        Returns:
+            条件を加えたretriever
+        """
+        return self.model_copy(update={"filters": dict(filters) if filters else None})
+
+    @property
+    def search_filter(self) -> Optional[Dict]:
+        # Chromaに渡すフィルタ
+        return combine_filters(self.base_filter, self.filters)
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self.vectorstore.similarity_search(query, k=self.k, filter=self.search_filter)
 
 
 def build_employee_retriever(
@@ -12,31 +117,32 @@ def build_employee_retriever(
     filter_conditions: Optional[Dict] = None,
     k: int = 5,
     docs: Optional[List[Document]] = None,
-    embeddings: Optional[OpenAIEmbeddings] = None
-) -> VectorStoreRetriever:
+    embeddings: Optional[OpenAIEmbeddings] = None,
+    collection_name: str = "employee"
+) -> FilteredRetriever:
     """
     社員名簿ベースのretrieverを構築（from_documents or from_persisted_db 両対応）
+
+    リクエストごとのフィルタ条件は、返されたretrieverの「with_filters」で指定する
     """
     if embeddings is None:
-        embeddings = OpenAIEmbeddings()
+        embeddings = create_embeddings()
 
     if docs:
-        vectordb = Chroma.from_documents(
-            documents=docs,
-            embedding=embeddings,
+        vectordb = create_vectorstore(
+            collection_name,
+            embeddings=embeddings,
             collection_metadata={"category": "employee"}
         )
+        vectordb.add_documents(docs)
     elif db_path:
-        vectordb = Chroma(
-            persist_directory=db_path,
-            embedding_function=embeddings
+        vectordb = open_persisted_vectorstore(
+            db_path,
+            collection_name,
+            embeddings=embeddings,
+            collection_metadata={"category": "employee"}
         )
     else:
         raise ValueError("docs も db_path も指定されていません")
 
-    retriever = vectordb.as_retriever(search_kwargs={"k": k})
-    
-    if filter_conditions:
-        retriever.search_kwargs["filter"] = filter_conditions
-
-    return retriever
\ No newline at end of file
+    return FilteredRetriever(vectorstore=vectordb, k=k, base_filter=filter_conditions)
@@ -0,0 +1,150 @@
+# src/retriever_modules/retriever_registry.py
+"""
+このファイルは、プロセス全体で共有するretrieverの登録先（レジストリ）が記述されたファイルです。
+"""
+
+############################################################
+# ライブラリの読み込み
+############################################################
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+
+############################################################
+# クラス定義
+############################################################
+class RetrieverRegistry:
+    """
+    全セッションから読み取り専用で参照されるretrieverの保管場所
+
+    セッションごとにretrieverを構築すると、データの読み込み・分割・埋め込みが
+    ブラウザタブの数だけ繰り返されるため、サーバープロセス内で1つだけ保持して使い回す。
+
+    retrieverの構築をバックグラウンドで行う場合は、構築の進み具合（report_progress）と失敗（mark_failed）も記録し、
+    画面側はそれを参照して準備状況を表示する。
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._retrievers: Dict[str, Any] = {}
+        # retrieverが差し替えられるたびに増える番号（キャッシュの無効化判定に使用）
+        self._version = 0
+        self._ready = threading.Event()
+        # 取り込みの途中で、取り込み済みのチャンクのみを検索できるretrieverを登録している間はFalse
+        self._complete = False
+        self._progress: Tuple[float, str] = (0.0, "")
+        self._error: Optional[BaseException] = None
+
+    @property
+    def is_ready(self) -> bool:
+        """retrieverが1度以上登録され、検索できる状態かどうか"""
+        return self._ready.is_set()
+
+    @property
+    def is_complete(self) -> bool:
+        """すべてのデータソースの取り込みが終わったretrieverが登録されているかどうか"""
+        with self._lock:
+            return self._complete
+
+    @property
+    def error(self) -> Optional[BaseException]:
+        """retrieverの構築に失敗した場合の例外（失敗していない場合はNone）"""
+        with self._lock:
+            return self._error
+
+    @property
+    def progress(self) -> Tuple[float, str]:
+        """retrieverの構築の進み具合（「0〜1の割合」と「処理中の内容」のタプル）"""
+        with self._lock:
+            return self._progress
+
+    def report_progress(self, fraction: float, message: str):
+        """
+        retrieverの構築の進み具合を記録
+
+        Args:
+            fraction: 進み具合（0〜1）
+            message: 処理中の内容
+        """
+        with self._lock:
+            self._progress = (min(max(fraction, 0.0), 1.0), message)
+
+    def mark_failed(self, error: BaseException):
+        """
+        retrieverの構築に失敗したことを記録
+
+        Args:
+            error: 発生した例外
+        """
+        with self._lock:
+            self._error = error
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        retrieverが登録されるまで待機
+
+        Args:
+            timeout: 待機する秒数の上限（省略時は無制限）
+
+        Returns:
+            登録済みの場合はTrue（時間内に登録されなかった場合はFalse）
+        """
+        return self._ready.wait(timeout)
+
+    @property
+    def version(self) -> int:
+        with self._lock:
+            return self._version
+
+    def publish(self, **retrievers: Any) -> int:
+        """
+        retrieverを登録（または差し替え）し、新しいバージョン番号を返す
+
+        Args:
+            retrievers: 「名前=retriever」の形式で指定する登録対象
+
+        Returns:
+            登録後のバージョン番号
+        """
+        with self._lock:
+            self._retrievers.update(retrievers)
+            self._version += 1
+            self._progress = (1.0, "")
+            self._complete = True
+            self._ready.set()
+            return self._version
+
+    def publish_partial(self, **retrievers: Any) -> int:
+        """
+        取り込みの途中で、取り込み済みのチャンクのみを検索できるretrieverを仮に登録し、新しいバージョン番号を返す
+
+        進み具合はそのまま残し、「is_complete」はFalseのまま（取り込みの完了時に「publish」で差し替える）
+
+        Args:
+            retrievers: 「名前=retriever」の形式で指定する登録対象
+
+        Returns:
+            登録後のバージョン番号
+        """
+        with self._lock:
+            self._retrievers.update(retrievers)
+            self._version += 1
+            self._ready.set()
+            return self._version
+
+    def get(self, name: str) -> Optional[Any]:
+        """
+        登録済みのretrieverを取得
+
+        Args:
+            name: retrieverの登録名
+
+        Returns:
+            登録済みのretriever（未登録の場合はNone）
+        """
+        with self._lock:
+            return self._retrievers.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        with self._lock:
+            return name in self._retrievers
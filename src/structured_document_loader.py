@@ -0,0 +1,316 @@
+"""
+このファイルは、PDF・Wordファイルを見出しなどの文書構造に沿って読み込み、セクション単位でチャンク分割する処理が記述されたファイルです。
+"""
+
+############################################################
+# ライブラリの読み込み
+############################################################
+import math
+import re
+import unicodedata
+from collections import Counter
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+
+############################################################
+# 関数定義
+############################################################
+def _normalize_block(text):
+    """ヘッダー・フッターや重複セクションの判定用に、空白を除いて正規化する"""
+    return re.sub(r"\s+", "", unicodedata.normalize("NFKC", text))
+
+
+# 文末とみなす文字と、改行を残す行頭（発言の時刻・箇条書き・番号）のパターン
+_SENTENCE_END_PATTERN = re.compile(r"[。．！？!?：:」』）)]$")
+_LINE_START_PATTERN = re.compile(r"^(?:\d{1,2}:\d{2}|[●○■□◆◇・※\-–]|\(?\d+[.)．）]|[（(][0-9０-９]+[）)])")
+
+
+def _join_wrapped_lines(lines):
+    """
+    PDFのレイアウト上の折り返しで分かれた行を、1つの文につなぎ直す
+
+    Args:
+        lines: PDFから取得した行のリスト
+
+    Returns:
+        折り返しをつなげた行のリスト
+    """
+    joined = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if joined and not _SENTENCE_END_PATTERN.search(joined[-1]) and not _LINE_START_PATTERN.match(line):
+            joined[-1] += line
+        else:
+            joined.append(line)
+    return joined
+
+
+def _split_long_line(text, max_chars):
+    """上限を超える1行（段落）を、文の区切りで上限以下に分ける"""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=max_chars, chunk_overlap=0, separators=["。", "、", ""])
+    return splitter.split_text(text)
+
+
+def _pack_section(source, heading_path, lines, chunk_size):
+    """
+    1つのセクションの行を、見出しを先頭に付けたチャンクに詰める（行の途中とページの境目では区切る）
+
+    Args:
+        source: 参照元のファイルパス
+        heading_path: 上位から順に並べた見出しのリスト
+        lines: 「テキスト」と「ページ番号（不明な場合はNone）」のタプルのリスト
+        chunk_size: 1チャンクの最大文字数
+
+    Returns:
+        チャンクのドキュメントのリスト（1つのチャンクには同じページの行のみを含める）
+    """
+    heading = " > ".join(heading_path)
+    budget = max(chunk_size - len(heading) - 1, chunk_size // 2)
+
+    pieces = []
+    for text, page in lines:
+        if len(text) > budget:
+            pieces.extend((part, page) for part in _split_long_line(text, budget))
+        else:
+            pieces.append((text, page))
+
+    chunks = []
+    current, current_page, current_length = [], None, 0
+    for text, page in pieces:
+        # ページをまたぐチャンクは、参照元として表示するページ番号が一部の行としか合わなくなるため区切る
+        if current and (current_length + len(text) + 1 > budget or page != current_page):
+            chunks.append((current, current_page))
+            current, current_length = [], 0
+        if not current:
+            current_page = page
+        current.append(text)
+        current_length += len(text) + 1
+    if current:
+        chunks.append((current, current_page))
+
+    documents = []
+    for chunk_lines, page in chunks:
+        body = "\n".join(chunk_lines)
+        metadata = {"source": source, "heading": heading}
+        if page is not None:
+            metadata["page"] = page
+        documents.append(Document(page_content=f"{heading}\n{body}" if heading else body, metadata=metadata))
+    return documents
+
+
+def _merge_and_deduplicate(chunks, chunk_size):
+    """
+    短いチャンクを、見出し・ページが同じ直後のチャンクとまとめ、本文が重複するチャンク（定型文など）を取り除く
+
+    見出しやページが異なるチャンクをまとめると、メタデータの見出し・ページ番号が先頭のチャンクのものしか残らないため、まとめない
+
+    Args:
+        chunks: チャンクのドキュメントのリスト
+        chunk_size: 1チャンクの最大文字数
+
+    Returns:
+        整理後のチャンクのリスト
+    """
+    seen = set()
+    merged = []
+    for chunk in chunks:
+        key = _normalize_block(chunk.page_content)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+
+        previous = merged[-1] if merged else None
+        if (
+            previous is not None
+            and previous.metadata.get("heading") == chunk.metadata.get("heading")
+            and previous.metadata.get("page") == chunk.metadata.get("page")
+            and len(previous.page_content) + len(chunk.page_content) + 1 <= chunk_size
+        ):
+            previous.page_content = f"{previous.page_content}\n{chunk.page_content}"
+            continue
+        merged.append(chunk)
+    return merged
+
+
+############################################################
+# クラス定義
+############################################################
+class StructuredPDFLoader:
+    """
+    PyMuPDFで取得したテキストブロックの文字サイズから見出しを判定し、見出しごとのセクションとして読み込むローダー
+
+    - セクションはページをまたがないよう区切り、すべてのセクションに「page」（0始まり）を付与する
+    - 多くのページに同じ内容で現れるブロック（ヘッダー・フッターなどの定型文）は取り除く
+    """
+
+    # 本文の文字サイズに対し、この倍率以上の大きさのブロックを見出しとみなす
+    HEADING_SIZE_RATIO = 1.15
+    HEADING_MAX_CHARS = 60
+
+    def __init__(self, file_path, chunk_size=500):
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+
+    def _read_blocks(self):
+        import fitz
+
+        pages = []
+        with fitz.open(self.file_path) as pdf:
+            for page in pdf:
+                blocks = []
+                for block in page.get_text("dict")["blocks"]:
+                    if block["type"] != 0:
+                        continue
+                    spans = [span for line in block["lines"] for span in line["spans"] if span["text"].strip()]
+                    if not spans:
+                        continue
+                    text = "\n".join(
+                        "".join(span["text"] for span in line["spans"]) for line in block["lines"]
+                    ).strip()
+                    blocks.append({"text": text, "size": round(max(span["size"] for span in spans), 1)})
+                pages.append(blocks)
+        return pages
+
+    def load(self):
+        pages = self._read_blocks()
+
+        # 本文の文字サイズ（文字数で重み付けした最頻値）
+        size_counts = Counter()
+        for blocks in pages:
+            for block in blocks:
+                size_counts[block["size"]] += len(block["text"])
+        if not size_counts:
+            return []
+        body_size = size_counts.most_common(1)[0][0]
+
+        # 半数以上のページに現れるブロックは定型文とみなす（3ページ以上の場合のみ）
+        boilerplate = set()
+        if len(pages) >= 3:
+            block_pages = Counter(
+                key for blocks in pages for key in {_normalize_block(block["text"]) for block in blocks}
+            )
+            boilerplate = {key for key, count in block_pages.items() if count >= math.ceil(len(pages) / 2)}
+
+        chunks = []
+        heading_stack = []
+        lines = []
+        for page_number, blocks in enumerate(pages):
+            for block in blocks:
+                if _normalize_block(block["text"]) in boilerplate:
+                    continue
+
+                is_heading = (
+                    block["size"] >= body_size * self.HEADING_SIZE_RATIO
+                    and len(block["text"]) <= self.HEADING_MAX_CHARS
+                )
+                if not is_heading:
+                    lines.extend((line, page_number) for line in block["text"].split("\n"))
+                    continue
+
+                chunks.extend(self._pack(heading_stack, lines))
+                lines = []
+                # 同じ大きさ以下の見出しは、新しい見出しに置き換える
+                while heading_stack and heading_stack[-1][0] <= block["size"]:
+                    heading_stack.pop()
+                heading_stack.append((block["size"], block["text"].replace("\n", "")))
+
+        chunks.extend(self._pack(heading_stack, lines))
+        return _merge_and_deduplicate(chunks, self.chunk_size)
+
+    def _pack(self, heading_stack, lines):
+        # 折り返しで分かれた行はページ内でつなぎ直してから、チャンクに詰める
+        joined = []
+        for page_number in dict.fromkeys(page for _, page in lines):
+            page_lines = [text for text, page in lines if page == page_number]
+            joined.extend((text, page_number) for text in _join_wrapped_lines(page_lines))
+        return _pack_section(self.file_path, [text for _, text in heading_stack], joined, self.chunk_size)
+
+
+class StructuredDocxLoader:
+    """
+    Wordファイルの段落スタイル（見出し1〜9、表題）から見出しを判定し、見出しごとのセクションとして読み込むローダー
+
+    表は行ごとに「 | 」区切りのテキストとして、本文と同じ順序で取り込む
+    """
+
+    HEADING_STYLE_PATTERN = re.compile(r"^(?:heading|見出し)\s*(\d+)$", re.IGNORECASE)
+
+    def __init__(self, file_path, chunk_size=500):
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+
+    def _iter_blocks(self):
+        """本文中の段落と表を出現順に「(見出しレベル or None, テキスト)」として返す"""
+        import docx
+        from docx.table import Table
+        from docx.text.paragraph import Paragraph
+
+        document = docx.Document(self.file_path)
+        for element in document.element.body.iterchildren():
+            tag = element.tag.rsplit("}", 1)[-1]
+            if tag == "p":
+                paragraph = Paragraph(element, document)
+                style_name = paragraph.style.name if paragraph.style is not None else ""
+                match = self.HEADING_STYLE_PATTERN.match(style_name)
+                if match:
+                    level = int(match.group(1))
+                elif style_name.lower() == "title":
+                    level = 0
+                else:
+                    level = None
+                yield level, paragraph.text.strip()
+            elif tag == "tbl":
+                for row in Table(element, document).rows:
+                    yield None, " | ".join(cell.text.strip() for cell in row.cells)
+
+    def load(self):
+        chunks = []
+        heading_stack = []
+        lines = []
+        for level, text in self._iter_blocks():
+            if not text:
+                continue
+            if level is None:
+                lines.append((text, None))
+                continue
+
+            chunks.extend(_pack_section(self.file_path, [t for _, t in heading_stack], lines, self.chunk_size))
+            lines = []
+            while heading_stack and heading_stack[-1][0] >= level:
+                heading_stack.pop()
+            heading_stack.append((level, text))
+
+        chunks.extend(_pack_section(self.file_path, [t for _, t in heading_stack], lines, self.chunk_size))
+        return _merge_and_deduplicate(chunks, self.chunk_size)
+
+
+class StructureAwareSplitter:
+    """
+    文書構造に沿って読み込んだチャンクはそのまま使い、それ以外のドキュメントのみを分割するスプリッター
+
+    PDF・Wordファイルは、ローダー側で見出し単位のチャンク（「heading」メタデータ付き）に分割済みのため再分割しない。
+    テキストファイル・Webページなどは、従来のスプリッターで分割する。
+    """
+
+    # ローダー側のチャンクの区切り方を変えた場合に上げる（差分取り込みで、取り込み済みのPDF・Wordファイルを分割し直す）
+    REVISION = 2
+
+    def __init__(self, fallback_splitter):
+        """
+        Args:
+            fallback_splitter: 文書構造のないドキュメントの分割に使うスプリッター
+        """
+        self.fallback_splitter = fallback_splitter
+
+    def split_documents(self, docs):
+        chunks = []
+        for doc in docs:
+            if "heading" in doc.metadata:
+                chunks.append(doc)
+            else:
+                chunks.extend(self.fallback_splitter.split_documents([doc]))
+        return chunks
@@ -0,0 +1,52 @@
+from answer_cache import SemanticAnswerCache
+
+
+def make_cache(**kwargs):
+    options = {"similarity_threshold": 0.95, "ttl_seconds": 3600, "max_entries": 10}
+    options.update(kwargs)
+    return SemanticAnswerCache(**options)
+
+
+def test_similar_question_hits_cache():
+    """同じモード・同じ固有の語で、類似度がしきい値以上の質問には保存済みの回答を返す"""
+    cache = make_cache()
+    cache.store("問い合わせ", [1.0, 0.0], 1, "回答", ["doc"], entities=("営業部",))
+
+    cached = cache.lookup("問い合わせ", [0.99, 0.05], 1, entities=("営業部",))
+
+    assert cached["answer"] == "回答" and cached["context"] == ["doc"]
+    assert cache.hits == 1
+
+
+def test_different_entities_do_not_collide():
+    """埋め込みがほぼ同じでも、部署名などの固有の語が異なる質問には保存済みの回答を返さない"""
+    cache = make_cache()
+    cache.store("問い合わせ", [1.0, 0.0], 1, "営業部の回答", [], entities=("営業部",))
+
+    assert cache.lookup("問い合わせ", [1.0, 0.0], 1, entities=("人事部",)) is None
+    assert cache.lookup("問い合わせ", [1.0, 0.0], 1) is None
+    assert cache.misses == 2
+
+
+def test_mode_and_index_version_must_match():
+    """モードが異なる場合と、インデックスのバージョンが変わった場合は保存済みの回答を返さない"""
+    cache = make_cache()
+    cache.store("検索", [1.0, 0.0], 1, "回答", [])
+
+    assert cache.lookup("問い合わせ", [1.0, 0.0], 1) is None
+    assert cache.lookup("検索", [1.0, 0.0], 2) is None
+    # バージョンが変わった時点で古いエントリーは破棄されている
+    assert cache.lookup("検索", [1.0, 0.0], 1) is None
+
+
+def test_evicts_least_recently_used_entry():
+    """件数の上限を超えると、最も使われていないエントリーから破棄する"""
+    cache = make_cache(max_entries=2)
+    cache.store("検索", [1.0, 0.0, 0.0], 1, "a", [])
+    cache.store("検索", [0.0, 1.0, 0.0], 1, "b", [])
+    assert cache.lookup("検索", [1.0, 0.0, 0.0], 1)["answer"] == "a"
+
+    cache.store("検索", [0.0, 0.0, 1.0], 1, "c", [])
+
+    assert cache.lookup("検索", [0.0, 1.0, 0.0], 1) is None
+    assert cache.lookup("検索", [1.0, 0.0, 0.0], 1)["answer"] == "a"
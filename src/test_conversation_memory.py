@@ -0,0 +1,132 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from conversation_memory import ConversationMemory
+
+
+class DeferredExecutor:
+    """submitされた処理を、テスト側で「run_all」を呼ぶまで実行しないスタブ"""
+
+    def __init__(self):
+        self.pending = []
+
+    def submit(self, fn):
+        self.pending.append(fn)
+
+    def run_all(self):
+        while self.pending:
+            self.pending.pop(0)()
+
+
+def make_memory(max_tokens=1000, recent_turns=2):
+    memory = ConversationMemory(max_tokens=max_tokens, recent_turns=recent_turns)
+    # tiktokenのエンコーディングの取得に左右されないよう、文字数をトークン数とする
+    memory.count_tokens = len
+    return memory
+
+
+def contents(messages):
+    return [message.content for message in messages]
+
+
+def test_messages_keep_only_recent_turns():
+    """プロンプトに含めるのは直近のやりとりのみで、件数はこれまでのやりとりをすべて数える"""
+    memory = make_memory(recent_turns=2)
+    for i in range(4):
+        memory.add_turn(f"q{i}", f"a{i}")
+
+    assert contents(memory.messages()) == ["q2", "a2", "q3", "a3"]
+    assert isinstance(memory.messages()[0], HumanMessage) and isinstance(memory.messages()[1], AIMessage)
+    assert len(memory) == 4
+
+
+def test_messages_respect_token_budget_but_always_keep_latest_turn():
+    """トークン数の目安を超える古いやりとりは含めないが、最新のやりとりは目安を超えても含める"""
+    memory = make_memory(max_tokens=10, recent_turns=5)
+    memory.add_turn("q0", "a0")
+    memory.add_turn("q1", "a1")
+    memory.add_turn("長い質問" * 5, "長い回答" * 5)
+
+    assert contents(memory.messages()) == ["長い質問" * 5, "長い回答" * 5]
+
+
+def test_compact_folds_old_turns_into_summary():
+    """直近から外れたやりとりを要約に取り込み、要約をプロンプトの先頭に含める"""
+    memory = make_memory(recent_turns=1)
+    memory.add_turn("q0", "a0")
+    memory.add_turn("q1", "a1")
+    calls = []
+
+    def summarize(summary, messages):
+        calls.append((summary, contents(messages)))
+        return "q0について回答済み"
+
+    memory.compact(summarize)
+
+    assert calls == [("", ["q0", "a0"])]
+    messages = memory.messages()
+    assert isinstance(messages[0], SystemMessage) and "q0について回答済み" in messages[0].content
+    assert contents(messages[1:]) == ["q1", "a1"]
+    assert len(memory) == 2
+
+
+def test_compact_passes_previous_summary():
+    """2回目以降の要約では、それまでの要約と新たに外れたやりとりを渡す"""
+    memory = make_memory(recent_turns=1)
+    memory.add_turn("q0", "a0")
+    memory.add_turn("q1", "a1")
+    memory.compact(lambda summary, messages: "要約1")
+    memory.add_turn("q2", "a2")
+    calls = []
+
+    memory.compact(lambda summary, messages: calls.append((summary, contents(messages))) or "要約2")
+
+    assert calls == [("要約1", ["q1", "a1"])]
+    assert memory.summary == "要約2"
+
+
+def test_turns_added_during_background_compaction_are_kept():
+    """バックグラウンドで要約している間に追加されたやりとりは、要約の完了後も失われない"""
+    memory = make_memory(recent_turns=1)
+    memory.add_turn("q0", "a0")
+    memory.add_turn("q1", "a1")
+    executor = DeferredExecutor()
+
+    memory.compact(lambda summary, messages: "要約", executor=executor)
+    memory.add_turn("q2", "a2")
+    # 要約が終わるまでは、要約中の処理を重ねて実行しない
+    memory.compact(lambda summary, messages: "別の要約", executor=executor)
+    assert len(executor.pending) == 1
+    executor.run_all()
+
+    assert memory.summary == "要約"
+    assert contents(memory.messages()[1:]) == ["q2", "a2"]
+    assert contents(m for turn in memory._turns for m in turn) == ["q1", "a1", "q2", "a2"]
+
+
+def test_failed_summary_keeps_turns():
+    """要約に失敗した場合は、やりとりを取り除かずに次の機会に取り込み直す"""
+    memory = make_memory(recent_turns=1)
+    memory.add_turn("q0", "a0")
+    memory.add_turn("q1", "a1")
+
+    def fail(summary, messages):
+        raise RuntimeError("LLM unavailable")
+
+    memory.compact(fail)
+
+    assert memory.summary == ""
+    assert len(memory._turns) == 2
+    memory.compact(lambda summary, messages: "要約")
+    assert memory.summary == "要約"
+
+
+def test_compact_does_nothing_when_everything_fits():
+    """すべてのやりとりが直近に収まっている場合は要約しない"""
+    memory = make_memory(recent_turns=3)
+    memory.add_turn("q0", "a0")
+    calls = []
+
+    memory.compact(lambda summary, messages: calls.append(messages) or "要約")
+
+    assert calls == []
+    assert contents(memory.messages()) == ["q0", "a0"]
@@ -1,42 +1,89 @@
+import pytest
+from pandas.errors import ParserError
+
 from csv_employee_loader import EmployeeCSVLoader
-import os
-
-def test_csv_loading():
-    """CSVローダーの動作テスト"""
-    csv_files = []
-    
-    # パスを修正: ./data → ../data
-    data_path = "../data"  # 修正箇所
-    
-    # dataフォルダ内のCSVファイルを検索
-    for root, dirs, files in os.walk(data_path):
-        for file in files:
-            if file.endswith(".csv"):
-                csv_files.append(os.path.join(root, file))
-    
-    print(f"発見されたCSVファイル: {len(csv_files)}個")
-    for csv_file in csv_files:
-        print(f"  - {csv_file}")
-    
-    # CSVローダーのテスト
-    for csv_file in csv_files:
-        try:
-            loader = EmployeeCSVLoader(csv_file)
-            docs = loader.load()
-            print(f"\n✅ {csv_file}: {len(docs)}個のドキュメント読み込み成功")
-            
-            # 人事部のデータを確認
-            hr_docs = [doc for doc in docs if "人事部" in doc.page_content]
-            print(f"   人事部のドキュメント: {len(hr_docs)}個")
-            
-            for i, doc in enumerate(hr_docs[:3]):
-                print(f"   人事部{i+1}: {doc.page_content[:100]}...")
-                print(f"   メタデータ: {doc.metadata}")
-                
-        except Exception as e:
-            print(f"❌ {csv_file}: エラー - {e}")
-            import traceback
-            traceback.print_exc()
-
-if __name__ == "__main__":
-    test_csv_loading()
\ No newline at end of file
+
+ROSTER = (
+    "社員ID,氏名,従業員区分,部署,役職,スキルセット\n"
+    "EMP0001,山田 太郎,正社員,営業部,主任,\"Python, データ分析\"\n"
+    "EMP0002,佐藤 花子,契約社員,人事部,スタッフ,Excel\n"
+    "EMP0003,鈴木 一郎,正社員,営業部,マネージャー,\n"
+)
+
+
+def write_roster(tmp_path, text=ROSTER, name="社員名簿.csv"):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8-sig")
+    return str(path)
+
+
+def test_row_documents_have_column_text_and_metadata(tmp_path):
+    """社員ごとの本文は「列名: 値」を並べたもので、メタデータに部署・従業員区分・行番号を持つ"""
+    docs = list(EmployeeCSVLoader(write_roster(tmp_path)).lazy_load())
+
+    assert docs[0].page_content == (
+        "社員ID: EMP0001, 氏名: 山田 太郎, 従業員区分: 正社員, 部署: 営業部, 役職: 主任, スキルセット: Python, データ分析"
+    )
+    assert docs[0].metadata == {
+        "source": "社員名簿.csv",
+        "type": "employee",
+        "department": "営業部",
+        "employee_id": 0,
+        "employment_type": "正社員",
+    }
+    assert [doc.metadata["employee_id"] for doc in docs[:3]] == [0, 1, 2]
+
+
+def test_summary_document_is_yielded_last_with_counts_across_chunks(tmp_path):
+    """一定行数ずつ読み込んでも部署別の人数は全行で集計し、サマリーは社員のドキュメントの後に返す"""
+    loader = EmployeeCSVLoader(write_roster(tmp_path))
+
+    docs = list(loader.lazy_load(chunksize=2))
+
+    assert [doc.metadata["type"] for doc in docs] == ["employee", "employee", "employee", "summary"]
+    assert [doc.metadata["employee_id"] for doc in docs[:3]] == [0, 1, 2]
+    assert docs[-1].page_content == "社員数の部署別内訳は以下の通りです：\n- 営業部: 2名\n- 人事部: 1名\n"
+    assert loader.department_counts == {"営業部": 2, "人事部": 1}
+
+
+def test_load_returns_summary_first_and_all_rows(tmp_path):
+    """一括読み込みでは、サマリーに続けて全社員のドキュメントを返す"""
+    docs = EmployeeCSVLoader(write_roster(tmp_path)).load()
+
+    assert [doc.metadata["type"] for doc in docs] == ["summary", "employee", "employee", "employee"]
+    assert "- 営業部: 2名" in docs[0].page_content
+
+
+def test_department_column_is_detected_from_values(tmp_path):
+    """部署の列名が候補にない場合は、「◯◯部」という値を含む列を部署の列とみなす"""
+    path = write_roster(tmp_path, "社員ID,所属\nEMP0001,営業部\nEMP0002,人事部\n")
+
+    docs = list(EmployeeCSVLoader(path).lazy_load())
+
+    assert [doc.metadata["department"] for doc in docs[:2]] == ["営業部", "人事部"]
+    assert "employment_type" not in docs[0].metadata
+
+
+def test_load_failure_raises(tmp_path):
+    """部署の列が見つからない・ファイルがない場合は、空のリストを返さずに例外を送出する"""
+    path = write_roster(tmp_path, "社員ID,氏名\nEMP0001,山田 太郎\n")
+
+    with pytest.raises(ValueError):
+        EmployeeCSVLoader(path).load()
+    with pytest.raises(ValueError):
+        list(EmployeeCSVLoader(path).lazy_load())
+    with pytest.raises(FileNotFoundError):
+        EmployeeCSVLoader(str(tmp_path / "missing.csv")).load()
+
+
+def test_lazy_load_raises_after_partial_rows(tmp_path):
+    """途中の行で読み込みに失敗した場合は、それまでの行を返した後に例外を送出し、サマリーは返さない"""
+    text = ROSTER + "EMP0004,田中 次郎,正社員,総務部,スタッフ,Excel,余分な列\n"
+    docs = []
+
+    with pytest.raises(ParserError):
+        for doc in EmployeeCSVLoader(write_roster(tmp_path, text)).lazy_load(chunksize=2):
+            docs.append(doc)
+
+    assert len(docs) == 2
+    assert all(doc.metadata["type"] == "employee" for doc in docs)
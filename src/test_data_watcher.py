@@ -0,0 +1,186 @@
+import os
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from watchdog.events import (
+    DirDeletedEvent,
+    DirModifiedEvent,
+    FileCreatedEvent,
+    FileDeletedEvent,
+    FileModifiedEvent,
+    FileMovedEvent,
+)
+
+import initialize
+from data_watcher import DataFolderWatcher
+from retriever_modules.hybrid_retriever import KeywordIndex
+from retriever_modules.incremental_index import IncrementalIndexer
+from retriever_modules.numpy_vectorstore import NumpyVectorStore
+from retriever_modules.retriever_registry import RetrieverRegistry
+
+ROOT = "/data"
+
+
+class FakeClock:
+    """「advance」で時刻を進めた分だけ、期限を過ぎたタイマーを実行する時計（threading.Timerの代わり）"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.timers = []
+
+    def timer(self, interval, function):
+        timer = FakeTimer(self.now + interval, function)
+        self.timers.append(timer)
+        return timer
+
+    def advance(self, seconds):
+        self.now += seconds
+        for timer in list(self.timers):
+            if timer.started and not timer.cancelled and timer.deadline <= self.now:
+                self.timers.remove(timer)
+                timer.function()
+
+
+class FakeTimer:
+    def __init__(self, deadline, function):
+        self.deadline = deadline
+        self.function = function
+        self.daemon = False
+        self.started = False
+        self.cancelled = False
+
+    def start(self):
+        self.started = True
+
+    def cancel(self):
+        self.cancelled = True
+
+
+def make_watcher(on_change):
+    clock = FakeClock()
+    watcher = DataFolderWatcher(ROOT, on_change, debounce_seconds=2.0, timer_factory=clock.timer)
+    return watcher, clock
+
+
+def test_events_are_coalesced_until_changes_settle():
+    """最後の変更から待機秒数が経過するまでは通知せず、その間の変更をまとめて1回だけ通知する"""
+    notified = []
+    watcher, clock = make_watcher(notified.append)
+
+    watcher.dispatch(FileCreatedEvent(f"{ROOT}/規程.docx"))
+    clock.advance(1.5)
+    watcher.dispatch(FileModifiedEvent(f"{ROOT}/規程.docx"))
+    watcher.dispatch(FileModifiedEvent(f"{ROOT}/議事録/会議.pdf"))
+    clock.advance(1.5)
+    assert notified == []
+
+    clock.advance(0.5)
+    assert notified == [[f"{ROOT}/規程.docx", f"{ROOT}/議事録/会議.pdf"]]
+
+    # 通知済みの変更は、次の通知に含めない
+    watcher.dispatch(FileDeletedEvent(f"{ROOT}/手順.txt"))
+    clock.advance(2.0)
+    assert notified[1:] == [[f"{ROOT}/手順.txt"]]
+
+
+def test_temporary_and_unsupported_files_are_ignored():
+    """Officeの一時ファイル・ロックファイル・エディタのスワップファイルや、対象外の拡張子のファイルは通知しない"""
+    notified = []
+    watcher, clock = make_watcher(notified.append)
+
+    for name in ["~$規程.docx", ".~lock.規程.docx#", ".#手順.txt", "手順.txt~", ".手順.txt.swp", "規程.docx.tmp", "写真.png"]:
+        watcher.dispatch(FileModifiedEvent(f"{ROOT}/{name}"))
+    watcher.dispatch(DirModifiedEvent(f"{ROOT}/議事録"))
+    clock.advance(5.0)
+    assert notified == []
+
+    # 一時ファイルから名前を変更して保存した場合は、変更後のファイルのみを通知する
+    watcher.dispatch(FileMovedEvent(f"{ROOT}/規程.docx.tmp", f"{ROOT}/規程.docx"))
+    watcher.dispatch(DirDeletedEvent(f"{ROOT}/議事録"))
+    clock.advance(2.0)
+    assert notified == [[f"{ROOT}/規程.docx", f"{ROOT}/議事録"]]
+
+
+def test_failed_callback_does_not_stop_later_notifications():
+    """変更の反映に失敗しても例外を送出せず、次の変更も通知する"""
+    notified = []
+
+    def on_change(paths):
+        notified.append(paths)
+        raise RuntimeError("取り込みに失敗")
+
+    watcher, clock = make_watcher(on_change)
+    watcher.dispatch(FileModifiedEvent(f"{ROOT}/a.txt"))
+    clock.advance(2.0)
+    watcher.dispatch(FileModifiedEvent(f"{ROOT}/b.txt"))
+    clock.advance(2.0)
+
+    assert notified == [[f"{ROOT}/a.txt"], [f"{ROOT}/b.txt"]]
+
+
+def load_text_files(file_paths):
+    """ファイルを1ドキュメントとして読み込む「iter_loaded_files」のスタブ（プロセスプールを使わない）"""
+    for file_path in file_paths:
+        with open(file_path, encoding="utf-8") as f:
+            yield file_path, [Document(page_content=f.read(), metadata={"source": file_path})]
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def make_registry(tmp_path, monkeypatch, file_paths):
+    monkeypatch.setattr(initialize, "iter_loaded_files", load_text_files)
+    monkeypatch.setattr(initialize, "find_employee_csv_path", lambda: str(tmp_path / "data" / "社員名簿.csv"))
+    vectordb = NumpyVectorStore("full", DeterministicFakeEmbedding(size=16))
+    full_indexer = IncrementalIndexer(vectordb, str(tmp_path / "manifest.json"))
+    full_indexer.sync_files(file_paths, load_text_files)
+    full_indexer.save()
+    full_indexer.pop_changed_ids()
+
+    registry = RetrieverRegistry()
+    keyword_index = KeywordIndex.from_vectorstore(vectordb)
+    full_retriever = initialize.build_full_retriever(vectordb, keyword_index=keyword_index)
+    registry.publish(full_indexer=full_indexer, keyword_index=keyword_index, full_retriever=full_retriever)
+    return registry
+
+
+def test_reindex_refreshes_keyword_index_incrementally(tmp_path, monkeypatch):
+    """変更のあったファイルのチャンクのみでキーワード検索用インデックスを更新し、同じretrieverを新しいバージョンで登録する"""
+    a, b = str(tmp_path / "data" / "a.txt"), str(tmp_path / "data" / "b.txt")
+    write(a, "経費精算の手順")
+    write(b, "休暇申請の手順")
+    registry = make_registry(tmp_path, monkeypatch, [a, b])
+    keyword_index = registry.get("keyword_index")
+    full_retriever = registry.get("full_retriever")
+    version = registry.version
+
+    write(a, "出張旅費の精算手順")
+    os.remove(b)
+    c = str(tmp_path / "data" / "c.txt")
+    write(c, "在宅勤務の申請方法")
+    initialize.reindex_changed_paths(registry, [a, b, c])
+
+    assert registry.version == version + 1
+    assert registry.get("keyword_index") is keyword_index
+    assert registry.get("full_retriever") is full_retriever
+    assert len(keyword_index) == 2
+    assert [doc.page_content for doc in keyword_index.lookup("出張旅費", k=5)] == ["出張旅費の精算手順"]
+    assert [doc.page_content for doc in keyword_index.lookup("在宅勤務", k=5)] == ["在宅勤務の申請方法"]
+    assert keyword_index.search("休暇", k=5) == []
+    assert keyword_index.search("経費", k=5) == []
+
+
+def test_reindex_without_changes_keeps_version(tmp_path, monkeypatch):
+    """内容の変わっていないファイルのみが通知された場合は、レジストリのバージョンを上げない"""
+    a = str(tmp_path / "data" / "a.txt")
+    write(a, "経費精算の手順")
+    registry = make_registry(tmp_path, monkeypatch, [a])
+    version = registry.version
+
+    initialize.reindex_changed_paths(registry, [a])
+
+    assert registry.version == version
+    assert len(registry.get("keyword_index")) == 1
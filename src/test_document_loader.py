@@ -0,0 +1,134 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import constants as ct
+import document_loader
+
+FILE_PATHS = [f"data/file{i:02}.txt" for i in range(12)]
+
+
+class RecordingExecutor:
+    """ProcessPoolExecutorの代わりにスレッドで実行し、投入したファイル数を記録するExecutor"""
+
+    def __init__(self, max_workers, mp_context=None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.submitted = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.executor.shutdown()
+
+    def submit(self, fn, file_path):
+        self.submitted.append(file_path)
+        return self.executor.submit(fn, file_path)
+
+
+class BrokenExecutor:
+    """指定した番目に投入したファイルで、ワーカープロセスの異常終了（BrokenProcessPool）を起こすExecutor"""
+
+    def __init__(self, broken_index):
+        self.broken_index = broken_index
+        self.submitted = []
+
+    def __call__(self, max_workers, mp_context=None):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def submit(self, fn, file_path):
+        future = Future()
+        if len(self.submitted) >= self.broken_index:
+            future.set_exception(BrokenProcessPool("ワーカープロセスが異常終了しました"))
+        else:
+            future.set_result(fn(file_path))
+        self.submitted.append(file_path)
+        return future
+
+
+@pytest.fixture
+def parsed(monkeypatch):
+    """ファイルを読まずにファイルパスを本文とする「_parse_file」に置き換え、解析したファイルパスを記録する"""
+    calls = []
+
+    def parse_file(file_path):
+        calls.append((file_path, threading.current_thread() is threading.main_thread()))
+        return [file_path], None
+
+    monkeypatch.setattr(document_loader, "_parse_file", parse_file)
+    monkeypatch.setattr(ct, "LOADER_MAX_WORKERS", 4)
+    monkeypatch.setattr(ct, "LOADER_MAX_IN_FLIGHT", 5)
+    return calls
+
+
+def test_results_are_yielded_in_input_order(monkeypatch, parsed):
+    """解析の完了順によらず、結果は入力したファイルの順に返す"""
+    monkeypatch.setattr(document_loader, "ProcessPoolExecutor", RecordingExecutor)
+    second_parsed = threading.Event()
+    parse_file = document_loader._parse_file
+
+    def parse_file_out_of_order(file_path):
+        # 先頭のファイルは2番目のファイルの解析が終わるまで完了させない
+        if file_path == FILE_PATHS[0]:
+            second_parsed.wait(timeout=5)
+        result = parse_file(file_path)
+        if file_path == FILE_PATHS[1]:
+            second_parsed.set()
+        return result
+
+    monkeypatch.setattr(document_loader, "_parse_file", parse_file_out_of_order)
+
+    results = list(document_loader.iter_loaded_files(FILE_PATHS))
+
+    assert results == [(file_path, [file_path]) for file_path in FILE_PATHS]
+    assert parsed.index((FILE_PATHS[1], False)) < parsed.index((FILE_PATHS[0], False))
+
+
+def test_files_in_flight_are_limited(monkeypatch, parsed):
+    """結果を回収していないファイルの数は「LOADER_MAX_IN_FLIGHT」を超えない"""
+    executors = []
+
+    def make_executor(max_workers, mp_context=None):
+        executors.append(RecordingExecutor(max_workers, mp_context))
+        return executors[-1]
+
+    monkeypatch.setattr(document_loader, "ProcessPoolExecutor", make_executor)
+
+    in_flight = []
+    for yielded, _ in enumerate(document_loader.iter_loaded_files(FILE_PATHS), start=1):
+        in_flight.append(len(executors[0].submitted) - yielded)
+
+    assert max(in_flight) + 1 == ct.LOADER_MAX_IN_FLIGHT
+    assert executors[0].submitted == FILE_PATHS
+
+
+def test_broken_process_pool_falls_back_to_sequential_loading(monkeypatch, parsed):
+    """プロセスプールが異常終了した場合は、結果を返していないファイル（投入済み・未投入とも）を順次読み込む"""
+    executor = BrokenExecutor(broken_index=3)
+    monkeypatch.setattr(document_loader, "ProcessPoolExecutor", executor)
+
+    results = list(document_loader.iter_loaded_files(FILE_PATHS))
+
+    assert results == [(file_path, [file_path]) for file_path in FILE_PATHS]
+    # 投入済み（結果未回収）のファイルと未投入のファイルの両方を、異常終了したファイルから順に読み込み直す
+    assert executor.submitted == FILE_PATHS[:3 + ct.LOADER_MAX_IN_FLIGHT]
+    assert [file_path for file_path, _ in parsed[3:]] == FILE_PATHS[3:]
+
+
+def test_single_worker_loads_without_process_pool(monkeypatch, parsed):
+    """並列数が1以下の場合はプロセスプールを起動せず、順に読み込む"""
+    monkeypatch.setattr(ct, "LOADER_MAX_WORKERS", 1)
+    monkeypatch.setattr(document_loader, "ProcessPoolExecutor", None)
+
+    results = list(document_loader.iter_loaded_files(FILE_PATHS[:3]))
+
+    assert results == [(file_path, [file_path]) for file_path in FILE_PATHS[:3]]
+    assert parsed == [(file_path, True) for file_path in FILE_PATHS[:3]]
@@ -0,0 +1,109 @@
+import itertools
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+import embedding_cache
+from embedding_cache import CachedEmbeddings, EmbeddingCacheStore, make_cache_key
+
+
+class CountingEmbeddings(Embeddings):
+    """テキストの長さと先頭の文字コードからベクトルを作り、呼び出されたテキストを記録するスタブ"""
+
+    model = "stub-model"
+
+    def __init__(self):
+        self.document_calls = []
+        self.query_calls = []
+
+    def _vector(self, text):
+        return [float(len(text)), float(ord(text[0])) if text else 0.0, 0.5]
+
+    def embed_documents(self, texts):
+        self.document_calls.append(list(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self.query_calls.append(text)
+        return self._vector(text)
+
+
+@pytest.fixture
+def fake_clock(monkeypatch):
+    """最終参照日時が呼び出しごとに必ず進むようにする（同じ時刻による並び順の揺れを防ぐ）"""
+    ticks = itertools.count(1)
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: float(next(ticks)))
+
+
+def test_store_round_trip_keeps_float32_values(tmp_path):
+    """保存したベクトルがそのまま（float32の精度で）取り出せる"""
+    store = EmbeddingCacheStore(str(tmp_path / "cache.sqlite3"), max_entries=10)
+    store.put_many({"a": [0.25, -1.5, 3.0], "b": [1.0, 2.0, 4.0]})
+
+    assert store.get_many(["a", "b", "missing"]) == {"a": [0.25, -1.5, 3.0], "b": [1.0, 2.0, 4.0]}
+
+
+def test_store_evicts_least_recently_used(tmp_path, fake_clock):
+    """上限を超えると、最後に参照されてから最も時間の経ったものから削除される"""
+    store = EmbeddingCacheStore(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    store.put_many({"a": [1.0]})
+    store.put_many({"b": [2.0]})
+    # 「a」を参照すると、「b」の方が古くなる
+    assert store.get_many(["a"]) == {"a": [1.0]}
+
+    store.put_many({"c": [3.0]})
+
+    assert set(store.get_many(["a", "b", "c"])) == {"a", "c"}
+
+
+def test_store_does_not_count_duplicate_inserts(tmp_path, fake_clock):
+    """同じキーを保存し直しても件数に数えず、ほかのエントリーを追い出さない"""
+    store = EmbeddingCacheStore(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    store.put_many({"a": [1.0], "b": [2.0]})
+    store.put_many({"a": [1.0]})
+
+    assert set(store.get_many(["a", "b"])) == {"a", "b"}
+
+
+def test_store_count_survives_reopen(tmp_path, fake_clock):
+    """開き直した後も既存の件数を引き継ぎ、上限を守る"""
+    path = str(tmp_path / "cache.sqlite3")
+    EmbeddingCacheStore(path, max_entries=2).put_many({"a": [1.0], "b": [2.0]})
+
+    store = EmbeddingCacheStore(path, max_entries=2)
+    store.put_many({"c": [3.0]})
+
+    assert len(store.get_many(["a", "b", "c"])) == 2
+
+
+def test_cached_embeddings_only_embeds_missing_unique_texts(tmp_path):
+    """キャッシュにないテキストのみを、重複を除いて埋め込みモデルに渡し、結果は入力順で返す"""
+    underlying = CountingEmbeddings()
+    cached = CachedEmbeddings(underlying, str(tmp_path / "cache.sqlite3"), max_entries=100)
+
+    first = cached.embed_documents(["あ", "いい", "あ"])
+    second = cached.embed_documents(["いい", "ううう"])
+
+    assert underlying.document_calls == [["あ", "いい"], ["ううう"]]
+    assert first == [underlying._vector("あ"), underlying._vector("いい"), underlying._vector("あ")]
+    assert second == [underlying._vector("いい"), underlying._vector("ううう")]
+    assert cached.stats == {"hits": 2, "misses": 3, "hit_rate": 0.4}
+
+
+def test_cached_embeddings_share_cache_between_documents_and_queries(tmp_path):
+    """ドキュメントとして埋め込んだテキストは、質問文としても（正規化後に同じなら）キャッシュから返す"""
+    underlying = CountingEmbeddings()
+    cached = CachedEmbeddings(underlying, str(tmp_path / "cache.sqlite3"), max_entries=100)
+    cached.embed_documents(["ガイド"])
+
+    # 結合文字の「ガ」（NFD）と前後の空白の違いは、正規化で同じキーになる
+    vector = cached.embed_query("  ガイド ")
+
+    assert underlying.query_calls == []
+    assert vector == underlying._vector("ガイド")
+
+
+def test_cache_key_depends_on_model():
+    """モデルが異なれば、同じテキストでも別のキーになる"""
+    assert make_cache_key("model-a", "テキスト") != make_cache_key("model-b", "テキスト")
+    assert make_cache_key("model-a", "テキスト") == make_cache_key("model-a", " テキスト\n")
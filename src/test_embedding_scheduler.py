@@ -0,0 +1,202 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from embedding_scheduler import RateLimitWindow, ScheduledEmbeddings
+
+
+class StubEmbeddingHandler(BaseHTTPRequestHandler):
+    """OpenAI互換の埋め込みAPIのスタブ（テキストの文字数をベクトルの先頭に入れ、dataは逆順で返す）"""
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.requests.append((time.monotonic(), body["input"]))
+            status = server.statuses.pop(0) if server.statuses else 200
+            if status == 200:
+                server.active += 1
+                server.max_active = max(server.max_active, server.active)
+
+        if status != 200:
+            self._send_json(status, {"error": {"message": "rate limited", "type": "rate_limit"}}, {"Retry-After": server.retry_after})
+            return
+
+        time.sleep(server.delay)
+        with server.lock:
+            server.active -= 1
+        data = [
+            {"object": "embedding", "index": i, "embedding": [float(len(text)), float(i)]}
+            for i, text in enumerate(body["input"])
+        ]
+        self._send_json(200, {
+            "object": "list",
+            "data": list(reversed(data)),
+            "model": body["model"],
+            "usage": {"prompt_tokens": 1, "total_tokens": 1}
+        })
+
+    def _send_json(self, status, payload, headers=None):
+        content = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    """ローカルで埋め込みAPIのスタブを起動（「statuses」に入れたステータスコードを、先頭のリクエストから順に返す）"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubEmbeddingHandler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.statuses = []
+    server.retry_after = "0.3"
+    server.delay = 0.0
+    server.active = 0
+    server.max_active = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_embeddings(server, **kwargs):
+    embeddings = ScheduledEmbeddings(
+        model="stub-model",
+        base_url=server.base_url,
+        api_key="test",
+        requests_per_minute=0,
+        tokens_per_minute=0,
+        **kwargs
+    )
+    # tiktokenのエンコーディングの取得に左右されないよう、文字数をトークン数とする
+    embeddings.count_tokens = len
+    return embeddings
+
+
+def test_make_batches_respects_token_and_size_limits():
+    """トークン数・件数のどちらかの上限に達したら、次のバッチに分ける"""
+    embeddings = ScheduledEmbeddings(model="stub-model", api_key="test", max_batch_tokens=10, max_batch_size=3)
+    embeddings.count_tokens = len
+
+    batches = embeddings.make_batches(["aaaa", "bbbb", "cc", "d", "e", "f", "gggggggggggg", "h"])
+
+    # 10トークンちょうど／3件で区切り、単独で上限を超えるテキストは1件だけのバッチにする
+    assert batches == [[0, 1, 2], [3, 4, 5], [6], [7]]
+
+
+def test_results_follow_input_order_across_batches(stub_server):
+    """複数バッチを並行送信し、APIが逆順で返しても、結果は入力の順に並ぶ"""
+    embeddings = make_embeddings(stub_server, max_batch_size=4, max_concurrency=3)
+    texts = ["x" * (i % 7 + 1) for i in range(30)]
+
+    vectors = embeddings.embed_documents(texts)
+
+    assert [vector[0] for vector in vectors] == [float(len(text)) for text in texts]
+    assert len(stub_server.requests) == 8
+    assert embeddings.stats["texts"] == 30 and embeddings.stats["requests"] == 8
+
+
+def test_concurrency_is_capped(stub_server):
+    """同時に送信するリクエスト数が上限を超えない"""
+    stub_server.delay = 0.1
+    embeddings = make_embeddings(stub_server, max_batch_size=1, max_concurrency=2)
+
+    embeddings.embed_documents([f"text{i}" for i in range(6)])
+
+    assert stub_server.max_active == 2
+
+
+def test_rate_limited_request_waits_retry_after_and_halves_concurrency(stub_server):
+    """429を受けたらRetry-Afterの秒数だけ待って再送し、同時送信数を半分に減らす（成功するたびに1ずつ戻す）"""
+    stub_server.statuses = [429]
+    embeddings = make_embeddings(stub_server, max_batch_size=10, max_concurrency=4)
+
+    vectors = embeddings.embed_documents(["abc"])
+
+    (first_at, _), (retried_at, _) = stub_server.requests
+    assert retried_at - first_at >= 0.3
+    assert vectors == [[3.0, 0.0]]
+    assert embeddings.stats["rate_limited"] == 1 and embeddings.stats["retries"] == 1
+    # 429で4→2に減り、再送の成功で3に戻る
+    assert embeddings._concurrency == 3
+
+
+def test_rate_limit_cool_down_pauses_every_request(stub_server):
+    """1つのリクエストが429を受けると、ほかのバッチの送信もクールダウンが終わるまで止まる"""
+    stub_server.statuses = [429]
+    stub_server.delay = 0.05
+    embeddings = make_embeddings(stub_server, max_batch_size=1, max_concurrency=4)
+
+    embeddings.embed_documents(["a", "b", "c", "d", "e", "f"])
+
+    # 最初の4件は同時に送信され、残りの2件と429を受けた1件の再送は、Retry-Afterの秒数が過ぎるまで送信されない
+    sent_at = sorted(sent for sent, _ in stub_server.requests)
+    assert len(sent_at) == 7
+    assert sent_at[3] - sent_at[0] < 0.3
+    assert all(later - sent_at[0] >= 0.3 for later in sent_at[4:])
+
+
+def test_gives_up_after_max_retries(stub_server):
+    """再試行回数の上限を超えて429が続いた場合は、例外を送出する"""
+    stub_server.statuses = [429, 429]
+    stub_server.retry_after = "0"
+    embeddings = make_embeddings(stub_server, max_retries=1)
+
+    with pytest.raises(Exception):
+        embeddings.embed_documents(["abc"])
+    assert len(stub_server.requests) == 2
+
+
+def test_rate_limit_window_enforces_requests_per_minute(monkeypatch):
+    """1分あたりのリクエスト数の上限に達すると、最も古い送信から60秒経つまで待たせる"""
+    now = [1000.0]
+    monkeypatch.setattr("embedding_scheduler.time.monotonic", lambda: now[0])
+    window = RateLimitWindow(requests_per_minute=2, tokens_per_minute=0)
+
+    assert window._reserve(1) == 0.0
+    now[0] += 10
+    assert window._reserve(1) == 0.0
+    assert window._reserve(1) == pytest.approx(50.0)
+
+    now[0] += 50
+    assert window._reserve(1) == 0.0
+
+
+def test_rate_limit_window_enforces_tokens_per_minute(monkeypatch):
+    """トークン数の上限を超える場合は待たせるが、窓が空なら上限を超える1件も送信できる"""
+    now = [1000.0]
+    monkeypatch.setattr("embedding_scheduler.time.monotonic", lambda: now[0])
+    window = RateLimitWindow(requests_per_minute=0, tokens_per_minute=100)
+
+    assert window._reserve(150) == 0.0
+    assert window._reserve(1) > 0
+
+    now[0] += RateLimitWindow.WINDOW_SECONDS
+    assert window._reserve(60) == 0.0
+    assert window._reserve(50) > 0
+
+
+def test_rate_limit_window_cool_down(monkeypatch):
+    """クールダウン中は、送信枠が空いていても再開時刻まで待たせる"""
+    now = [1000.0]
+    monkeypatch.setattr("embedding_scheduler.time.monotonic", lambda: now[0])
+    window = RateLimitWindow(requests_per_minute=0, tokens_per_minute=0)
+
+    window.cool_down(5.0)
+
+    assert window._reserve(1) == pytest.approx(5.0)
+    now[0] += 5.0
+    assert window._reserve(1) == 0.0
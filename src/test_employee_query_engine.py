@@ -0,0 +1,74 @@
+import pytest
+
+from csv_employee_loader import EmployeeCSVLoader
+from employee_query_engine import EmployeeQueryEngine
+
+ROSTER_CSV = """社員ID,氏名（フルネーム）,従業員区分,入社日,部署,役職,スキルセット
+EMP0001,山下 涼平,正社員,2019-02-20,営業部,主任,"Python, データ分析"
+EMP0002,林 真綾,契約社員,2015-06-05,総務部,マネージャー,"簿記, Excel"
+EMP0003,佐藤 健,正社員,2019-10-01,営業部,課長,"Excel, 営業スキル"
+EMP0004,鈴木 花子,正社員,2021-04-01,人事部,主任,"Python, 人事管理"
+EMP0005,田中 一郎,アルバイト,2019-07-15,営業部,,Excel
+"""
+
+
+@pytest.fixture
+def engine(tmp_path):
+    path = tmp_path / "社員名簿.csv"
+    path.write_text(ROSTER_CSV, encoding="utf-8-sig")
+    return EmployeeQueryEngine(EmployeeCSVLoader(str(path)))
+
+
+def names(engine, positions):
+    return [doc.page_content.split("氏名（フルネーム）: ")[1].split(",")[0] for doc in engine.to_documents(positions)]
+
+
+def test_query_returns_every_matching_employee_in_roster_order(engine):
+    """条件に一致する社員を、件数で打ち切らずに名簿の並び順ですべて返す"""
+    positions = engine.query({"department": "営業部"})
+
+    assert names(engine, positions) == ["山下 涼平", "佐藤 健", "田中 一郎"]
+
+
+def test_query_combines_conditions(engine):
+    """複数の条件はすべて満たす社員のみに絞り込み、空の条件は無視する"""
+    assert names(engine, engine.query({"department": "営業部", "employment_type": "正社員", "role": ""})) == ["山下 涼平", "佐藤 健"]
+    assert names(engine, engine.query({"department": ["営業部", "人事部"], "role": "主任"})) == ["山下 涼平", "鈴木 花子"]
+
+
+def test_query_by_skill_and_join_year(engine):
+    """スキルは「, 」区切りの値に含まれるか、入社年は入社日の年で判定する"""
+    assert names(engine, engine.query({"skill": "Python"})) == ["山下 涼平", "鈴木 花子"]
+    assert names(engine, engine.query({"skill": ["Excel", "営業スキル"]})) == ["佐藤 健"]
+    assert names(engine, engine.query({"join_year": "2019年入社"})) == ["山下 涼平", "佐藤 健", "田中 一郎"]
+
+
+def test_supports_only_values_present_in_roster(engine):
+    """名簿にない値・列や、年を読み取れない入社年はベクトル検索に任せる"""
+    assert engine.supports({"department": "営業部", "employment_type": "正社員"})
+    assert not engine.supports({"department": "営業"})
+    assert not engine.supports({"hobby": "釣り"})
+    assert not engine.supports({"join_year": "最近"})
+    assert not engine.supports({"department": ""})
+
+
+def test_summary_states_exact_count_and_breakdown(engine):
+    """集計結果のドキュメントに、該当人数と部署・従業員区分別の内訳を明示する"""
+    positions = engine.query({"skill": "Excel"})
+
+    summary = engine.summarize(positions, {"skill": "Excel"})
+
+    assert "に一致する社員は 3 名です" in summary.page_content
+    assert "部署別の内訳: 営業部 2名、総務部 1名\n" in summary.page_content
+    assert "正社員 1名" in summary.page_content and "アルバイト 1名" in summary.page_content
+    assert summary.metadata == {"source": "社員名簿.csv", "type": "summary", "category": "employee"}
+
+
+def test_documents_carry_employee_metadata(engine):
+    """抽出した社員のドキュメントは、名簿の読み込み時と同じメタデータを持つ"""
+    docs = engine.to_documents(engine.query({"department": "人事部"}))
+
+    assert len(docs) == 1
+    assert docs[0].metadata["department"] == "人事部"
+    assert docs[0].metadata["employment_type"] == "正社員"
+    assert docs[0].metadata["category"] == "employee"
@@ -0,0 +1,102 @@
+import json
+import os
+
+# モジュールの読み込み時にOpenAIクライアントが作成されるため、APIキーがない環境でも読み込めるようにする
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import filter_extraction_llm
+from filter_extraction_llm import FilterExtractionCache, extract_filters_from_text, match_roster_filters, normalize_question
+
+VOCABULARY = {
+    "departments": ["営業部", "人事部", "総務部"],
+    "employment_types": ["正社員", "契約社員", "派遣"],
+    "roles": ["主任", "マネージャー", "一般社員"],
+    "skills": ["Python", "データ分析"],
+}
+
+
+def test_entries_written_in_batches(tmp_path):
+    """追加のたびには書き出さず、一定件数に達した時点でまとめて書き出す"""
+    path = tmp_path / "filters.json"
+    cache = FilterExtractionCache(10, str(path), signature="v1", flush_every=3, flush_interval=3600)
+
+    cache.put("a", {"department": "営業部"})
+    cache.put("b", {"department": "人事部"})
+    assert not path.exists()
+
+    cache.put("c", {"department": "総務部"})
+    assert set(json.loads(path.read_text(encoding="utf-8"))["entries"]) == {"a", "b", "c"}
+
+
+def test_flush_writes_pending_entries_and_reload_keeps_them(tmp_path):
+    """未保存の抽出結果は「flush」で書き出され、同じプロンプトであれば開き直しても使える"""
+    path = str(tmp_path / "filters.json")
+    cache = FilterExtractionCache(10, path, signature="v1", flush_every=100, flush_interval=3600)
+    cache.put("a", {"department": "営業部"})
+    cache.flush()
+
+    reopened = FilterExtractionCache(10, path, signature="v1")
+
+    assert reopened.get("a") == {"department": "営業部"}
+
+
+def test_entries_for_other_prompt_are_ignored(tmp_path):
+    """抽出に使ったプロンプトのハッシュ値が異なるファイルの内容は使わない"""
+    path = str(tmp_path / "filters.json")
+    cache = FilterExtractionCache(10, path, signature="old-prompt")
+    cache.put("a", {"department": "営業部"})
+
+    reopened = FilterExtractionCache(10, path, signature="new-prompt")
+
+    assert reopened.get("a") is None
+
+
+def test_evicts_least_recently_used_entry():
+    """件数の上限を超えると、最も使われていない質問文の抽出結果から破棄する"""
+    cache = FilterExtractionCache(2)
+    cache.put("a", {"department": "営業部"})
+    cache.put("b", {"department": "人事部"})
+    cache.get("a")
+
+    cache.put("c", {"department": "総務部"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"department": "営業部"}
+
+
+def test_normalize_question_ignores_width_spaces_and_trailing_marks():
+    """全角・半角、空白、文末の記号の違いは同じキーになる"""
+    assert normalize_question("営業部の 社員は？") == normalize_question("営業部の社員は?")
+    assert normalize_question("ＡＷＳ担当") == "AWS担当"
+
+
+def test_roster_terms_skip_llm():
+    """部署名と従業員区分のみの質問は、LLMを使わずに名簿の語からフィルタを作成する"""
+    assert match_roster_filters("営業部の正社員を一覧にして", **VOCABULARY) == {
+        "department": "営業部", "employment_type": "正社員"
+    }
+
+
+def test_mixed_role_or_join_year_question_uses_llm(monkeypatch, tmp_path):
+    """役職・スキル・入社年の条件も含む質問は、条件を落とさないよう高速判定を使わずLLMで抽出する"""
+    calls = []
+
+    def extract_with_llm(question):
+        calls.append(question)
+        return {"部署": "営業部", "従業員区分": "正社員", "役職": "主任"}
+
+    monkeypatch.setattr(filter_extraction_llm, "_extract_filters_with_llm", extract_with_llm)
+    monkeypatch.setattr(filter_extraction_llm, "_cache", FilterExtractionCache(10))
+
+    for question in (
+        "営業部の正社員で役職が主任の人を一覧にして",
+        "営業部の正社員でPythonができる人は？",
+        "営業部の正社員で２０２０年入社の人は？",
+        "2020年に入社した営業部の正社員を教えて",
+    ):
+        assert match_roster_filters(question, **VOCABULARY) == {}
+
+    filters = extract_filters_from_text("営業部の正社員で役職が主任の人を一覧にして", **VOCABULARY)
+
+    assert filters["役職"] == "主任"
+    assert calls == ["営業部の正社員で役職が主任の人を一覧にして"]
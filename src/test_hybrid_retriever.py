@@ -0,0 +1,107 @@
+from typing import List
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from retriever_modules.hybrid_retriever import HybridRetriever, KeywordIndex, reciprocal_rank_fusion, tokenize
+
+
+class FixedRetriever(BaseRetriever):
+    """決まったドキュメントを返し、呼び出された回数を数えるベクトル検索のスタブ"""
+
+    docs: List[Document]
+    calls: int = 0
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        self.calls += 1
+        return list(self.docs)
+
+
+def doc(text, source="a.txt"):
+    return Document(page_content=text, metadata={"source": source})
+
+
+def make_index():
+    index = KeywordIndex()
+    index.add("1", doc("製品ＸＹＺ-100の保守手順について説明します", "manual.pdf"))
+    index.add("2", doc("営業部の議事録：新商品の販売戦略", "mtg.txt"))
+    index.add("3", doc("人事部の研修計画と評価制度", "hr.docx"))
+    return index
+
+
+def test_tokenize_splits_ascii_words_and_japanese_bigrams():
+    """英数字は単語単位、日本語は2文字ずつに分割し、全角英数字は半角・小文字にそろえる"""
+    assert tokenize("ＸＹＺ-100の保守") == ["xyz-100", "の保", "保守"]
+    assert tokenize("研修、計画") == ["研修", "計画"]
+
+
+def test_search_ranks_documents_by_bm25():
+    """質問文のトークンを多く含むチャンクほど上位になり、一致しないチャンクは返さない"""
+    index = make_index()
+
+    results = index.search("営業部の販売戦略", k=3)
+
+    assert results[0][0].metadata["source"] == "mtg.txt"
+    assert all(score > 0 for _, score in results)
+    assert index.search("存在しない語句ｑｑｑ", k=3) == []
+
+
+def test_add_replaces_and_remove_deletes_postings():
+    """同じIDで登録し直すと内容が置き換わり、削除したチャンクは検索されない"""
+    index = make_index()
+
+    index.add("2", doc("総務部の備品管理", "mtg.txt"))
+    assert index.lookup("販売戦略", k=5) == []
+    assert [d.page_content for d in index.lookup("備品", k=5)] == ["総務部の備品管理"]
+
+    index.remove("2")
+    index.remove("missing")
+    assert len(index) == 2
+    assert index.search("備品管理", k=5) == []
+
+
+def test_lookup_requires_exact_substring_after_normalization():
+    """単語での検索は、正規化後の本文にそのまま含まれるチャンクのみを返す"""
+    index = make_index()
+
+    assert [d.metadata["source"] for d in index.lookup("xyz-100", k=5)] == ["manual.pdf"]
+    # バイグラムは共通するが、文字列としては含まれない
+    assert index.lookup("研修制度", k=5) == []
+
+
+def test_reciprocal_rank_fusion_rewards_documents_found_by_both():
+    """両方の検索結果に含まれるドキュメントほど上位になり、同じドキュメントは1件にまとめる"""
+    a, b, c = doc("A"), doc("B"), doc("C")
+
+    fused = reciprocal_rank_fusion([[a, b], [c, b]], rrf_k=60)
+
+    assert [d.page_content for d in fused] == ["B", "A", "C"]
+
+
+def test_reciprocal_rank_fusion_distinguishes_sources():
+    """本文が同じでも参照元が異なれば別のドキュメントとして扱う"""
+    fused = reciprocal_rank_fusion([[doc("同じ本文", "x.txt")], [doc("同じ本文", "y.txt")]])
+
+    assert [d.metadata["source"] for d in fused] == ["x.txt", "y.txt"]
+
+
+def test_hybrid_retriever_uses_keyword_lookup_for_short_terms():
+    """本文にそのまま含まれる単語での検索は、ベクトル検索を呼ばずにキーワード検索の結果を返す"""
+    vector = FixedRetriever(docs=[doc("無関係", "other.txt")])
+    retriever = HybridRetriever(vector_retriever=vector, keyword_index=make_index(), k=2)
+
+    results = retriever.invoke("「XYZ-100」")
+
+    assert [d.metadata["source"] for d in results] == ["manual.pdf"]
+    assert vector.calls == 0
+
+
+def test_hybrid_retriever_fuses_vector_and_keyword_results_for_questions():
+    """文章での質問は、ベクトル検索とキーワード検索の結果をまとめ、上位k件を返す"""
+    vector = FixedRetriever(docs=[doc("人事部の研修計画と評価制度", "hr.docx"), doc("無関係", "other.txt")])
+    retriever = HybridRetriever(vector_retriever=vector, keyword_index=make_index(), k=2)
+
+    results = retriever.invoke("人事部の研修について教えてください。")
+
+    assert vector.calls == 1
+    assert [d.metadata["source"] for d in results] == ["hr.docx", "other.txt"]
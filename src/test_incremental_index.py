@@ -0,0 +1,207 @@
+import os
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from retriever_modules.hybrid_retriever import KeywordIndex
+from retriever_modules.incremental_index import IncrementalIndexer, make_chunk_id
+from retriever_modules.numpy_vectorstore import NumpyVectorStore
+
+
+class FileLoader:
+    """ファイルを1ドキュメントとして読み込み、読み込んだファイルを記録する「load_files」のスタブ"""
+
+    def __init__(self):
+        self.loaded = []
+
+    def __call__(self, file_paths):
+        for file_path in file_paths:
+            self.loaded.append(os.path.basename(file_path))
+            with open(file_path, encoding="utf-8") as f:
+                yield file_path, [Document(page_content=f.read(), metadata={"source": file_path})]
+
+
+def list_files(folder_path):
+    return sorted(
+        os.path.join(root, name) for root, _, names in os.walk(folder_path) for name in names
+    )
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def make_indexer(tmp_path):
+    """保存した内容を開き直せるよう、ベクターストアとマニフェストをtmp_pathに保存する差分取り込み"""
+    vectordb = NumpyVectorStore("test", DeterministicFakeEmbedding(size=16), persist_directory=str(tmp_path / "db"))
+    return IncrementalIndexer(vectordb, str(tmp_path / "manifest.json"))
+
+
+def stored_sources(indexer):
+    return sorted(metadata["source"] for metadata in indexer.vectordb.get(include=["metadatas"])["metadatas"])
+
+
+def test_sync_files_skips_unchanged_files_and_prune_removes_missing(tmp_path):
+    """変更のないファイルは読み込まず、同期の対象外になったファイルのチャンクは「prune」で削除する"""
+    a, b = str(tmp_path / "data" / "a.txt"), str(tmp_path / "data" / "b.txt")
+    write(a, "経費精算の手順")
+    write(b, "休暇申請の手順")
+    indexer = make_indexer(tmp_path)
+    indexer.sync_files([a, b], FileLoader())
+    indexer.save()
+
+    # 次回の起動時にはbが削除されている
+    loader = FileLoader()
+    indexer = make_indexer(tmp_path)
+    indexer.sync_files([a], loader)
+    indexer.prune()
+
+    assert loader.loaded == []
+    assert indexer.stats["unchanged"] == 1 and indexer.stats["removed"] == 1
+    assert stored_sources(indexer) == [a]
+
+
+def test_sync_paths_updates_only_given_paths(tmp_path):
+    """指定したファイルのみを取り込み直し、指定外の登録済みファイルは削除しない"""
+    a, b = str(tmp_path / "data" / "a.txt"), str(tmp_path / "data" / "b.txt")
+    write(a, "経費精算の手順")
+    write(b, "休暇申請の手順")
+    indexer = make_indexer(tmp_path)
+    indexer.sync_files([a, b], FileLoader())
+    version = indexer.version
+
+    write(a, "経費精算の新しい手順")
+    loader = FileLoader()
+    indexer.sync_paths([a], loader, list_files)
+    indexer.save()
+
+    assert loader.loaded == ["a.txt"]
+    assert indexer.version == version + 1
+    assert stored_sources(indexer) == [a, b]
+    stored = indexer.vectordb.get(ids=[make_chunk_id(a, 0)], include=["documents"])
+    assert stored["documents"] == ["経費精算の新しい手順"]
+
+
+def test_sync_paths_removes_chunks_of_deleted_file_and_folder(tmp_path):
+    """存在しないパスは削除されたものとみなし、ファイル（フォルダの場合は配下のファイル）のチャンクを削除する"""
+    a = str(tmp_path / "data" / "a.txt")
+    folder = str(tmp_path / "data" / "議事録")
+    b, c = os.path.join(folder, "b.txt"), os.path.join(folder, "c.txt")
+    for path, text in ((a, "経費精算の手順"), (b, "営業会議の議事録"), (c, "開発会議の議事録")):
+        write(path, text)
+    indexer = make_indexer(tmp_path)
+    indexer.sync_files([a, b, c], FileLoader())
+
+    for path in (b, c):
+        os.remove(path)
+    os.rmdir(folder)
+    # 登録待ち（バッファ内）のチャンクも、削除されたファイルのものは登録しない
+    indexer.sync_paths([folder], FileLoader(), list_files)
+    indexer.save()
+
+    assert stored_sources(indexer) == [a]
+    assert indexer.stats["removed"] == 2
+
+
+def test_sync_paths_adds_files_in_new_folder(tmp_path):
+    """新しく作成されたフォルダを指定した場合は、配下のファイルをすべて取り込む"""
+    indexer = make_indexer(tmp_path)
+    folder = str(tmp_path / "data" / "新規")
+    write(os.path.join(folder, "x.txt"), "新しい規程")
+    write(os.path.join(folder, "y.txt"), "新しい手順")
+
+    loader = FileLoader()
+    indexer.sync_paths([folder], loader, list_files)
+
+    assert loader.loaded == ["x.txt", "y.txt"]
+    assert indexer.stats["added"] == 2
+
+
+def test_pop_changed_ids_reports_added_updated_and_removed_chunks(tmp_path):
+    """登録・削除したチャンクIDを記録し、キーワード検索用インデックスを差分で同じ内容に更新できる"""
+    a, b = str(tmp_path / "data" / "a.txt"), str(tmp_path / "data" / "b.txt")
+    write(a, "経費精算の手順")
+    write(b, "休暇申請の手順")
+    indexer = make_indexer(tmp_path)
+    indexer.sync_files([a, b], FileLoader())
+    indexer.save()
+    keyword_index = KeywordIndex.from_vectorstore(indexer.vectordb)
+    assert indexer.pop_changed_ids() == {make_chunk_id(a, 0), make_chunk_id(b, 0)}
+
+    write(a, "出張旅費の精算手順")
+    os.remove(b)
+    indexer.sync_paths([a, b], FileLoader(), list_files)
+    indexer.save()
+    changed_ids = indexer.pop_changed_ids()
+    keyword_index.refresh(indexer.vectordb, changed_ids)
+
+    assert changed_ids == {make_chunk_id(a, 0), make_chunk_id(b, 0)}
+    assert indexer.pop_changed_ids() == set()
+    assert len(keyword_index) == 1
+    assert [doc.page_content for doc in keyword_index.lookup("出張旅費", k=5)] == ["出張旅費の精算手順"]
+    assert keyword_index.search("休暇申請", k=5) == []
+
+
+def failing_loader(rows_before_error):
+    """指定した件数のドキュメントを返した後に失敗する、順次読み込みの「load_files」のスタブ"""
+    def load_files(file_paths):
+        for file_path in file_paths:
+            yield file_path, iter_rows(file_path, rows_before_error)
+    return load_files
+
+
+def iter_rows(file_path, rows_before_error):
+    for i in range(rows_before_error):
+        yield Document(page_content=f"新しい行{i}", metadata={"source": file_path})
+    raise ValueError("CSVの解析に失敗")
+
+
+def load_rows(file_paths):
+    for file_path in file_paths:
+        with open(file_path, encoding="utf-8") as f:
+            yield file_path, [Document(page_content=line, metadata={"source": file_path}) for line in f.read().splitlines()]
+
+
+def test_failed_load_keeps_previous_chunks_and_retries(tmp_path):
+    """最初のチャンクまでに読み込みに失敗した場合は、前回登録した内容を残し、次回の同期で取り込み直す"""
+    roster = str(tmp_path / "data" / "roster.csv")
+    write(roster, "行0\n行1\n行2")
+    indexer = make_indexer(tmp_path)
+    indexer.sync_files([roster], load_rows)
+    indexer.save()
+
+    write(roster, "行0\n行1\n行2\n行3")
+    indexer = make_indexer(tmp_path)
+    indexer.sync_files([roster], failing_loader(0))
+    indexer.save()
+
+    assert indexer.stats["failed"] == 1
+    assert sorted(indexer.vectordb.get(include=["documents"])["documents"]) == ["行0", "行1", "行2"]
+    loader = FileLoader()
+    make_indexer(tmp_path).sync_files([roster], loader)
+    assert loader.loaded == ["roster.csv"]
+
+
+def test_partially_failed_load_keeps_remaining_previous_chunks(tmp_path):
+    """途中で読み込みに失敗した場合は、読み込めた分のみ上書きして残りは前回のチャンクを残し、次回の同期で取り込み直す"""
+    roster = str(tmp_path / "data" / "roster.csv")
+    write(roster, "行0\n行1\n行2")
+    indexer = make_indexer(tmp_path)
+    indexer.sync_files([roster], load_rows)
+    indexer.save()
+
+    write(roster, "行0\n行1\n行2\n行3")
+    indexer = make_indexer(tmp_path)
+    indexer.sync_files([roster], failing_loader(2))
+    indexer.save()
+
+    assert sorted(indexer.vectordb.get(include=["documents"])["documents"]) == ["新しい行0", "新しい行1", "行2"]
+
+    # 取り込み直しに成功すると、前回のチャンクは残らない
+    write(roster, "行A\n行B")
+    indexer = make_indexer(tmp_path)
+    indexer.sync_files([roster], load_rows)
+    indexer.save()
+    assert sorted(indexer.vectordb.get(include=["documents"])["documents"]) == ["行A", "行B"]
@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+
+import constants as ct
+from index_builder import create_text_splitter, get_index_metadata
+
+
+def test_index_builder_does_not_import_streamlit():
+    """インデックス構築用のコマンドから使う処理は、Streamlit（画面の初期化処理）を読み込まない"""
+    code = "import sys, build_index; print('streamlit' in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)), env={"OPENAI_API_KEY": "test", "PATH": ""}
+    )
+
+    assert result.stdout.strip() == "False"
+
+
+def test_index_metadata_follows_chunking_and_backend_settings(monkeypatch):
+    """インデックスに記録する設定は、分割方法とベクターストアの種類の変更に追従する"""
+    monkeypatch.setattr(ct, "STRUCTURE_AWARE_CHUNKING", False)
+    monkeypatch.setattr(ct, "ENABLE_CHUNK_DEDUP", False)
+    _, signature = create_text_splitter()
+    monkeypatch.setattr(ct, "CHUNK_SIZE", ct.CHUNK_SIZE + 100)
+    _, resized_signature = create_text_splitter()
+
+    assert signature != resized_signature
+    assert get_index_metadata(signature)["chunking_signature"] == signature
+    monkeypatch.setattr(ct, "VECTORSTORE_BACKEND", "numpy")
+    assert get_index_metadata(signature)["vectorstore_backend"] == "numpy"
@@ -0,0 +1,114 @@
+import os
+import time
+
+import pytest
+
+from retriever_modules.index_store import IndexStore
+
+
+def make_versions(store, count):
+    """バージョンのフォルダを作成し、作成した順（古い順）のバージョン名を返す"""
+    versions = [f"v2025010{i}-000000" for i in range(1, count + 1)]
+    for version in versions:
+        os.makedirs(store.version_path(version))
+    return versions
+
+
+def test_publish_switches_current_version(tmp_path):
+    """切り替えたバージョンが現在のバージョンになり、存在しないバージョンには切り替えない"""
+    store = IndexStore(str(tmp_path))
+    assert store.current_version() is None
+
+    v1, v2 = make_versions(store, 2)
+    store.publish(v1)
+    store.publish(v2)
+
+    assert store.current_version() == v2
+    assert store.current_path() == store.version_path(v2)
+    with pytest.raises(FileNotFoundError):
+        store.publish("v-missing")
+    assert store.current_version() == v2
+
+
+def test_prune_keeps_current_and_newest_versions(tmp_path):
+    """現在のバージョンを含めて「keep」個を残し、それより古いバージョンを削除する"""
+    store = IndexStore(str(tmp_path))
+    versions = make_versions(store, 4)
+    store.publish(versions[1])
+
+    removed = store.prune(keep=2)
+
+    assert removed == versions[:1] + versions[2:3]
+    assert store.list_versions() == [versions[1], versions[3]]
+
+
+def test_prune_skips_versions_leased_by_running_app(tmp_path):
+    """実行中のアプリがリースを置いているバージョンは、削除の対象でも残す"""
+    store = IndexStore(str(tmp_path))
+    v1, v2, v3 = make_versions(store, 3)
+    store.publish(v3)
+    lease_path = store.acquire_lease(v1)
+
+    removed = store.prune(keep=1, lease_seconds=60)
+
+    assert removed == [v2]
+    assert store.list_versions() == [v1, v3]
+
+    # アプリの終了時にリースを外すと、次の削除の対象になる
+    store.release_lease(lease_path)
+    assert store.prune(keep=1, lease_seconds=60) == [v1]
+
+
+def test_expired_lease_does_not_block_prune(tmp_path):
+    """更新が途絶えた（終了したアプリの）リースは無視して削除し、更新すれば再び有効になる"""
+    store = IndexStore(str(tmp_path))
+    v1, v2 = make_versions(store, 2)
+    store.publish(v2)
+    lease_path = store.acquire_lease(v1)
+    expired = time.time() - 120
+    os.utime(lease_path, (expired, expired))
+
+    assert not store.is_leased(v1, lease_seconds=60)
+    store.renew_lease(lease_path)
+    assert store.is_leased(v1, lease_seconds=60)
+
+    os.utime(lease_path, (expired, expired))
+    assert store.prune(keep=1, lease_seconds=60) == [v1]
+
+
+def test_new_version_does_not_inherit_leases(tmp_path):
+    """現在のバージョンをコピーして作る新しいバージョンには、アプリのリースを引き継がない"""
+    store = IndexStore(str(tmp_path))
+    (v1,) = make_versions(store, 1)
+    with open(os.path.join(store.version_path(v1), "data.bin"), "w") as f:
+        f.write("index")
+    store.publish(v1)
+    store.acquire_lease(v1)
+
+    v2 = store.create_version(base_on_current=True)
+
+    assert os.listdir(store.version_path(v2)) == ["data.bin"]
+    assert store.is_leased(v1, lease_seconds=60)
+    assert not store.is_leased(v2, lease_seconds=60)
+
+
+def test_build_lock_is_exclusive(tmp_path):
+    """構築用のロックは同時に1つだけ取得でき、解放後は再び取得できる"""
+    store = IndexStore(str(tmp_path))
+
+    assert store.acquire_build_lock()
+    assert not store.acquire_build_lock()
+    store.release_build_lock()
+    assert store.acquire_build_lock()
+
+
+def test_find_mismatch_compares_build_settings(tmp_path):
+    """構築時の設定が記録と一致しない、または記録がないバージョンは、違いの内容を返す"""
+    store = IndexStore(str(tmp_path))
+    v1, v2 = make_versions(store, 2)
+    settings = {"chunking_signature": "CharacterTextSplitter:500:50", "vectorstore_backend": "chroma"}
+    store.write_metadata(v1, {**settings, "counts": {"employee": 3}})
+
+    assert store.find_mismatch(v1, settings) is None
+    assert store.find_mismatch(v1, {**settings, "vectorstore_backend": "numpy"}) == "vectorstore_backend: chroma → numpy"
+    assert store.find_mismatch(v2, settings) is not None
@@ -0,0 +1,102 @@
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from retriever_modules.ingestion_pipeline import ingest_documents
+from retriever_modules.near_duplicate import NearDuplicateDetector, apply_source_changes, join_sources, split_sources
+from retriever_modules.numpy_vectorstore import NumpyVectorStore
+
+BASE_TEXT = (
+    "情報セキュリティ規程：社外に持ち出すパソコンは必ずディスクを暗号化し、"
+    "パスワードは十二文字以上とする。紛失した場合は速やかに情報システム部へ報告すること。"
+)
+
+
+def make_detector():
+    return NearDuplicateDetector(threshold=0.8, num_perm=128, bands=32, shingle_size=5)
+
+
+def test_detects_near_duplicate_with_small_edits():
+    """空白・句読点の違いや末尾の小さな変更は、同じ内容として検出する"""
+    detector = make_detector()
+    detector.add("canonical", detector.signature(BASE_TEXT))
+
+    edited = BASE_TEXT.replace("、", " ").replace("。", "．\n") + "以上。"
+
+    assert detector.find(detector.signature(edited)) == "canonical"
+
+
+def test_does_not_match_different_content():
+    """内容の異なるチャンクは重複として扱わない"""
+    detector = make_detector()
+    detector.add("canonical", detector.signature(BASE_TEXT))
+
+    other = "営業部の議事録：来期の新商品の販売戦略について、地域ごとの目標と担当者を決定した。次回は来月に開催する。"
+
+    assert detector.find(detector.signature(other)) is None
+
+
+def test_short_text_is_not_deduplicated():
+    """短すぎて判定できないチャンクは署名を作らず、登録も検索も行わない"""
+    detector = make_detector()
+
+    assert detector.signature("短い本文") is None
+    detector.add("short", None)
+    assert len(detector) == 0
+    assert detector.find(None) is None
+
+
+def test_removed_chunk_is_no_longer_found():
+    """削除したチャンクは検出の対象から外れる"""
+    detector = make_detector()
+    signature = detector.signature(BASE_TEXT)
+    detector.add("canonical", signature)
+
+    detector.remove("canonical")
+    detector.remove("missing")
+
+    assert detector.find(signature) is None
+    assert len(detector) == 0
+
+
+def test_signature_is_stable_across_instances():
+    """同じシードであれば、プロセスをまたいでも（別のインスタンスでも）同じ署名になる"""
+    assert (make_detector().signature(BASE_TEXT) == make_detector().signature(BASE_TEXT)).all()
+
+
+def test_sources_round_trip():
+    """参照元は重複を除いて並べ替えた1つの文字列にまとめ、元のリストに戻せる"""
+    value = join_sources(["b.pdf", "a.txt", "b.pdf", ""])
+
+    assert split_sources(value) == ["a.txt", "b.pdf"]
+    assert split_sources(None) == []
+
+
+def test_ingest_merges_duplicates_into_canonical_sources():
+    """取り込み時に重複したチャンクは登録せず、正規チャンクの「sources」に参照元を追加する"""
+    vectordb = NumpyVectorStore("test", DeterministicFakeEmbedding(size=16))
+    docs = [
+        Document(page_content=BASE_TEXT, metadata={"source": "規程.pdf"}),
+        Document(page_content=BASE_TEXT + "以上。", metadata={"source": "規程_改訂版.docx"}),
+        Document(page_content="全く別の内容の文書です。" * 5, metadata={"source": "その他.txt"}),
+    ]
+
+    added = ingest_documents(vectordb, docs, deduplicator=make_detector())
+
+    assert added == 2
+    stored = vectordb.get(include=["metadatas"])
+    sources = {metadata["source"]: split_sources(metadata.get("sources")) for metadata in stored["metadatas"]}
+    assert sources["規程.pdf"] == ["規程.pdf", "規程_改訂版.docx"]
+    assert sources["その他.txt"] == []
+
+
+def test_apply_source_changes_adds_and_removes_sources():
+    """正規チャンクの「sources」への参照元の追加・削除を、埋め込みを計算し直さずに反映する"""
+    vectordb = NumpyVectorStore("test", DeterministicFakeEmbedding(size=16))
+    vectordb.add_texts([BASE_TEXT], metadatas=[{"source": "a.pdf"}], ids=["canonical"])
+
+    apply_source_changes(vectordb, {"canonical": {"b.docx", "c.txt"}})
+    apply_source_changes(vectordb, {}, {"canonical": {"c.txt"}})
+
+    metadata = vectordb.get(ids=["canonical"], include=["metadatas"])["metadatas"][0]
+    assert split_sources(metadata["sources"]) == ["a.pdf", "b.docx"]
+    assert metadata["source"] == "a.pdf"
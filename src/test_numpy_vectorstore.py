@@ -0,0 +1,164 @@
+import os
+import warnings
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from retriever_modules.numpy_vectorstore import NumpyVectorStore
+
+EMBEDDINGS = DeterministicFakeEmbedding(size=64)
+
+EMPLOYEES = [
+    ("e1", "営業部の山田", {"department": "営業部", "employment_type": "正社員"}),
+    ("e2", "営業部の佐藤", {"department": "営業部", "employment_type": "契約社員"}),
+    ("e3", "人事部の鈴木", {"department": "人事部", "employment_type": "正社員"}),
+    ("e4", "総務部の田中", {"department": "総務部"}),
+]
+
+
+def make_store(path=None, dtype="float32"):
+    return NumpyVectorStore("test", EMBEDDINGS, persist_directory=str(path) if path else None, dtype=dtype)
+
+
+def add_employees(store):
+    ids, texts, metadatas = zip(*EMPLOYEES)
+    store.add_texts(list(texts), list(metadatas), ids=list(ids))
+
+
+def test_add_replace_and_delete():
+    """同じIDで登録すると置き換え、削除したチャンクは取得・検索されない（未登録のIDの削除は無視）"""
+    store = make_store()
+    add_employees(store)
+
+    store.add_texts(["営業部の山田（異動）"], [{"department": "人事部"}], ids=["e1"])
+    assert len(store) == 4
+    assert store.get(ids=["e1"])["documents"] == ["営業部の山田（異動）"]
+    assert store.get(ids=["e1"])["metadatas"] == [{"department": "人事部"}]
+
+    store.delete(ids=["e2", "missing"])
+    assert store.get()["ids"] == ["e1", "e3", "e4"]
+    assert "e2" not in [doc.id for doc in store.similarity_search("営業部の佐藤", k=4)]
+
+
+def test_similarity_search_returns_exact_match_first():
+    """登録したテキストと同じ質問文では、そのチャンクが類似度1で最上位になる"""
+    store = make_store()
+    add_employees(store)
+
+    doc, score = store.similarity_search_with_score("人事部の鈴木", k=2)[0]
+
+    assert doc.id == "e3" and doc.metadata["department"] == "人事部"
+    assert score == pytest.approx(1.0, abs=1e-5)
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_scores_are_clipped_to_cosine_range(dtype):
+    """int8への量子化などで内積が1をわずかに超えても、類似度は-1〜1、関連度は0〜1に収まり警告も出ない"""
+    store = make_store(dtype=dtype)
+    texts = [f"文書{i}" for i in range(50)]
+    store.add_texts(texts)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        for text in texts:
+            (_, score), = store.similarity_search_with_score(text, k=1)
+            (_, relevance), = store.similarity_search_with_relevance_scores(text, k=1)
+            assert -1.0 <= score <= 1.0
+            assert 0.0 <= relevance <= 1.0
+
+
+@pytest.mark.parametrize("where, expected", [
+    ({"department": "営業部"}, ["e1", "e2"]),
+    ({"department": {"$ne": "営業部"}}, ["e3", "e4"]),
+    ({"department": {"$in": ["人事部", "総務部", "未登録部"]}}, ["e3", "e4"]),
+    ({"employment_type": {"$nin": ["正社員"]}}, ["e2"]),
+    ({"$and": [{"department": "営業部"}, {"employment_type": "正社員"}]}, ["e1"]),
+    ({"$or": [{"department": "総務部"}, {"employment_type": "契約社員"}]}, ["e2", "e4"]),
+    ({"department": "未登録部"}, []),
+])
+def test_where_conditions(where, expected):
+    """Chromaと同じ形式の条件で絞り込み、項目がないチャンクは「$ne」「$nin」にも一致しない"""
+    store = make_store()
+    add_employees(store)
+
+    assert store.get(where=where)["ids"] == expected
+    assert sorted(doc.id for doc in store.similarity_search("社員", k=4, filter=where)) == expected
+
+
+def test_unsupported_operator_raises():
+    """未対応の演算子はエラーにする"""
+    store = make_store()
+    add_employees(store)
+
+    with pytest.raises(ValueError):
+        store.get(where={"department": {"$gt": "営業部"}})
+
+
+def test_get_include_selects_fields():
+    """「include」で指定した項目のみを返し、空のリストではIDのみを返す"""
+    store = make_store()
+    add_employees(store)
+
+    assert store.get(include=[]) == {"ids": ["e1", "e2", "e3", "e4"]}
+    result = store.get(ids=["e3", "missing"], include=["embeddings"])
+    assert list(result) == ["ids", "embeddings"]
+    assert result["embeddings"].shape == (1, 64)
+    assert np.linalg.norm(result["embeddings"][0]) == pytest.approx(1.0, abs=1e-5)
+
+
+def test_persist_and_reload_across_generations(tmp_path):
+    """保存のたびに新しい世代のファイルに書き出し、開き直すと最後に保存した内容を読み込む（古い世代のファイルは削除）"""
+    store = make_store(tmp_path)
+    add_employees(store)
+    store.persist()
+    store.delete(ids=["e4"])
+    store.persist()
+
+    store_path = os.path.join(tmp_path, "test.npstore")
+    assert sorted(name for name in os.listdir(store_path) if name.endswith(".npy")) == ["vectors-2-float32.npy"]
+
+    reloaded = make_store(tmp_path)
+    assert reloaded.get()["ids"] == ["e1", "e2", "e3"]
+    assert reloaded.get(where={"department": "営業部"})["ids"] == ["e1", "e2"]
+    assert reloaded.similarity_search("人事部の鈴木", k=1)[0].id == "e3"
+
+
+def test_unsaved_changes_are_not_persisted(tmp_path):
+    """保存前の変更は、開き直したときには反映されていない（前回保存した世代を読み込む）"""
+    store = make_store(tmp_path)
+    add_employees(store)
+    store.persist()
+    store.delete(ids=["e1"])
+
+    assert make_store(tmp_path).get(include=[])["ids"] == ["e1", "e2", "e3", "e4"]
+
+
+def test_reload_converts_between_float32_and_int8(tmp_path):
+    """保存時と異なる型で開くとベクトルを変換し、次の保存で新しい型のファイルに書き出す"""
+    store = make_store(tmp_path)
+    add_employees(store)
+    store.persist()
+    original = store.get(include=["embeddings"])["embeddings"]
+
+    quantized = make_store(tmp_path, dtype="int8")
+    assert quantized.similarity_search("営業部の佐藤", k=1)[0].id == "e2"
+    np.testing.assert_allclose(quantized.get(include=["embeddings"])["embeddings"], original, atol=0.02)
+    quantized.persist()
+
+    store_path = os.path.join(tmp_path, "test.npstore")
+    assert sorted(name for name in os.listdir(store_path) if name.endswith(".npy")) == [
+        "scales-2.npy", "vectors-2-int8.npy"
+    ]
+
+    restored = make_store(tmp_path, dtype="float32")
+    embeddings = restored.get(include=["embeddings"])["embeddings"]
+    np.testing.assert_allclose(embeddings, original, atol=0.02)
+    np.testing.assert_allclose(np.linalg.norm(embeddings, axis=1), 1.0, atol=1e-5)
+    assert restored.similarity_search("人事部の鈴木", k=1)[0].id == "e3"
+
+
+def test_invalid_dtype_raises():
+    """未対応の型を指定した場合はエラーにする"""
+    with pytest.raises(ValueError):
+        make_store(dtype="float16")
@@ -0,0 +1,75 @@
+from langchain_core.messages import AIMessage, HumanMessage
+
+from question_rewriter import QuestionRewriter, needs_rewrite
+
+HISTORY = [
+    HumanMessage(content="営業部の社員を教えてください"),
+    AIMessage(content="営業部の社員は山田太郎さんと佐藤花子さんです。"),
+]
+
+
+class StubChain:
+    """受け取った入力を記録し、「（書き換え）」を付けた質問文を返す書き換え用Chainのスタブ"""
+
+    def __init__(self):
+        self.calls = []
+
+    def invoke(self, inputs):
+        self.calls.append(inputs)
+        return f"（書き換え）{inputs['input']}"
+
+
+def test_needs_rewrite_detects_follow_up_questions():
+    """前の会話を指す表現を含む入力や極端に短い入力のみ書き換えの対象とし、会話履歴がなければ対象としない"""
+    assert needs_rewrite("その人のスキルセットを教えて", HISTORY)
+    assert needs_rewrite("人事部は？", HISTORY)
+    assert not needs_rewrite("人事部に所属する正社員の一覧を教えてください", HISTORY)
+    assert not needs_rewrite("その人のスキルセットを教えて", [])
+
+
+def test_standalone_question_skips_llm():
+    """単独で意味が通る質問文は、LLMを呼ばずにそのまま返す"""
+    chain = StubChain()
+    rewriter = QuestionRewriter(chain)
+    question = "人事部に所属する正社員の一覧を教えてください"
+
+    assert rewriter.rewrite(question, HISTORY) == question
+    assert rewriter.rewrite("その人のスキルセットを教えて", []) == "その人のスキルセットを教えて"
+    assert chain.calls == []
+    assert rewriter.stats == {"skipped": 2, "hits": 0, "rewritten": 0}
+
+
+def test_follow_up_question_is_rewritten_with_history():
+    """前の会話を受けた質問は、会話履歴とともにLLMに渡して書き換える"""
+    chain = StubChain()
+    rewriter = QuestionRewriter(chain)
+
+    assert rewriter.rewrite("その人のスキルセットを教えて", HISTORY) == "（書き換え）その人のスキルセットを教えて"
+    assert chain.calls == [{"input": "その人のスキルセットを教えて", "chat_history": HISTORY}]
+    assert rewriter.stats["rewritten"] == 1
+
+
+def test_repeated_input_hits_cache():
+    """同じ会話履歴と質問文の組はキャッシュを使い、会話履歴が変わればLLMで書き換え直す"""
+    chain = StubChain()
+    rewriter = QuestionRewriter(chain)
+
+    rewriter.rewrite("その人のスキルセットを教えて", HISTORY)
+    assert rewriter.rewrite(" その人のスキルセットを教えて ", list(HISTORY)) == "（書き換え）その人のスキルセットを教えて"
+    assert len(chain.calls) == 1
+    assert rewriter.stats == {"skipped": 0, "hits": 1, "rewritten": 1}
+
+    rewriter.rewrite("その人のスキルセットを教えて", HISTORY + [HumanMessage(content="人事部の社員は？")])
+    assert len(chain.calls) == 2
+
+
+def test_cache_evicts_least_recently_used_entry():
+    """キャッシュが上限を超えた場合は、最も長く使われていない組から削除する"""
+    chain = StubChain()
+    rewriter = QuestionRewriter(chain, max_entries=2)
+
+    for question in ["その人の役職は？", "その人の部署は？", "その人の役職は？", "その人の入社年は？"]:
+        rewriter.rewrite(question, HISTORY)
+    rewriter.rewrite("その人の部署は？", HISTORY)
+
+    assert [call["input"] for call in chain.calls] == ["その人の役職は？", "その人の部署は？", "その人の入社年は？", "その人の部署は？"]
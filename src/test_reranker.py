@@ -0,0 +1,90 @@
+from typing import List
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from retriever_modules.reranker import CrossEncoderReranker, LexicalReranker, RerankingRetriever
+
+
+class FixedRetriever(BaseRetriever):
+    """決まった候補を元の検索順位の順に返すretrieverのスタブ"""
+
+    docs: List[Document]
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        return list(self.docs)
+
+
+class StubModel:
+    """クロスエンコーダーのスタブ（指定したスコアを返すか、採点に失敗する）"""
+
+    def __init__(self, scores=None):
+        self.scores = scores
+
+    def predict(self, pairs):
+        if self.scores is None:
+            raise RuntimeError("model unavailable")
+        return self.scores
+
+
+def docs(*texts):
+    return [Document(page_content=text, metadata={"source": f"{i}.txt"}) for i, text in enumerate(texts)]
+
+
+def contents(documents):
+    return [doc.page_content for doc in documents]
+
+
+def make_cross_encoder(scores=None):
+    # モデルを読み込まずに、採点のみをスタブに差し替える
+    reranker = CrossEncoderReranker.__new__(CrossEncoderReranker)
+    reranker.model = StubModel(scores)
+    return reranker
+
+
+def test_lexical_reranker_moves_matching_candidate_up():
+    """質問文の語を多く含む候補を、元の検索順位より上に並べ替える"""
+    candidates = docs("社内イベントのお知らせ", "福利厚生の概要", "経費精算の手順と申請期限")
+
+    assert contents(LexicalReranker(0.8).rerank("経費精算の申請期限", candidates, 3))[0] == "経費精算の手順と申請期限"
+
+
+def test_lexical_reranker_truncates_to_top_n():
+    """並べ替えた後、上位「top_n」件のみを返す"""
+    candidates = docs("営業部の山田", "営業部の佐藤", "人事部の鈴木", "営業部の田中")
+
+    reranked = LexicalReranker(0.5).rerank("営業部", candidates, 2)
+
+    assert len(reranked) == 2
+    assert all("営業部" in doc.page_content for doc in reranked)
+
+
+def test_lexical_reranker_keeps_order_without_matching_terms():
+    """質問文と語が重ならない候補や、候補が1件以下の場合は元の検索順位のまま返す"""
+    candidates = docs("社内イベント", "福利厚生", "研修制度")
+
+    assert contents(LexicalReranker(0.5).rerank("ｑｑｑ", candidates, 2)) == ["社内イベント", "福利厚生"]
+    assert LexicalReranker(0.5).rerank("研修", candidates[:1], 5) == candidates[:1]
+    assert LexicalReranker(0.5).rerank("研修", [], 5) == []
+
+
+def test_cross_encoder_orders_by_model_scores():
+    """クロスエンコーダーの採点の高い順に並べ替え、上位のみを返す"""
+    candidates = docs("A", "B", "C")
+
+    assert contents(make_cross_encoder([0.1, 0.9, 0.5]).rerank("質問", candidates, 2)) == ["B", "C"]
+
+
+def test_cross_encoder_failure_falls_back_to_original_order():
+    """採点に失敗した場合は、元の検索順位のまま上位のみを返す"""
+    candidates = docs("A", "B", "C")
+
+    assert contents(make_cross_encoder(None).rerank("質問", candidates, 2)) == ["A", "B"]
+
+
+def test_reranking_retriever_reranks_base_candidates():
+    """元のretrieverの候補を並べ替え、上位「top_n」件のみを返す"""
+    base = FixedRetriever(docs=docs("A", "B", "C", "D"))
+    retriever = RerankingRetriever(base_retriever=base, reranker=make_cross_encoder([0.2, 0.1, 0.8, 0.4]), top_n=2)
+
+    assert contents(retriever.invoke("質問")) == ["C", "D"]
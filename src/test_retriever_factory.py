@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from pydantic import ValidationError
+
+from retriever_modules.numpy_vectorstore import NumpyVectorStore
+from retriever_modules.retriever_factory import FilteredRetriever, combine_filters
+
+
+def make_retriever():
+    vectordb = NumpyVectorStore("employee", DeterministicFakeEmbedding(size=16))
+    vectordb.add_texts(
+        ["営業部の山田", "営業部の佐藤", "人事部の鈴木", "社員数の内訳"],
+        [
+            {"category": "employee", "department": "営業部", "employment_type": "正社員"},
+            {"category": "employee", "department": "営業部", "employment_type": "契約社員"},
+            {"category": "employee", "department": "人事部", "employment_type": "正社員"},
+            {"category": "summary"},
+        ],
+    )
+    return FilteredRetriever(vectorstore=vectordb, k=10, base_filter={"category": "employee"})
+
+
+def test_combine_filters_builds_where_clause():
+    """条件が1つの場合はそのまま、複数の場合は「$and」でまとめ、条件がなければNoneを返す"""
+    assert combine_filters(None, {}) is None
+    assert combine_filters({"category": "employee"}, None) == {"category": "employee"}
+    assert combine_filters({"category": "employee"}, {"department": "営業部", "employment_type": "正社員"}) == {
+        "$and": [{"category": "employee"}, {"department": "営業部"}, {"employment_type": "正社員"}]
+    }
+
+
+def test_with_filters_returns_new_retriever_and_keeps_shared_one_unchanged():
+    """リクエストごとの条件は新しいretrieverに設定し、共有のretrieverの条件は変わらない"""
+    shared = make_retriever()
+    filters = {"department": "営業部"}
+
+    filtered = shared.with_filters(filters)
+    filters["department"] = "人事部"
+
+    assert filtered is not shared
+    assert filtered.vectorstore is shared.vectorstore
+    assert shared.filters is None
+    assert shared.search_filter == {"category": "employee"}
+    assert filtered.search_filter == {"$and": [{"category": "employee"}, {"department": "営業部"}]}
+    assert shared.with_filters({}).search_filter == {"category": "employee"}
+
+
+def test_retriever_cannot_be_modified_in_place():
+    """共有のretrieverの条件は、属性への代入でも変更できない"""
+    shared = make_retriever()
+
+    with pytest.raises(ValidationError):
+        shared.filters = {"department": "営業部"}
+
+
+def test_filters_do_not_leak_between_concurrent_requests():
+    """同じretrieverから同時に作った条件付きのretrieverは、それぞれの条件でのみ検索する"""
+    shared = make_retriever()
+    departments = ["営業部", "人事部"] * 20
+
+    def search(department):
+        return {doc.metadata["department"] for doc in shared.with_filters({"department": department}).invoke("社員")}
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(search, departments))
+
+    assert results == [{department} for department in departments]
+    assert {doc.metadata["category"] for doc in shared.invoke("社員")} == {"employee"}
@@ -0,0 +1,28 @@
+from retriever_modules.retriever_registry import RetrieverRegistry
+
+
+def test_partial_publish_is_ready_but_not_complete():
+    """取り込み途中のretrieverを登録すると検索はできるが、完了扱いにはならず進み具合も残る"""
+    registry = RetrieverRegistry()
+    registry.report_progress(0.3, "取り込み中")
+
+    version = registry.publish_partial(full_retriever="partial")
+
+    assert registry.is_ready and not registry.is_complete
+    assert registry.get("full_retriever") == "partial"
+    assert registry.progress == (0.3, "取り込み中")
+    assert version == registry.version == 1
+
+
+def test_publish_after_partial_replaces_retriever_and_bumps_version():
+    """取り込みの完了時の登録で、取り込み途中のretrieverが差し替えられ、バージョンが変わる"""
+    registry = RetrieverRegistry()
+    registry.publish_partial(full_retriever="partial", employee_retriever="employee")
+
+    version = registry.publish(full_retriever="complete")
+
+    assert registry.is_complete
+    assert registry.get("full_retriever") == "complete"
+    assert registry.get("employee_retriever") == "employee"
+    assert version == 2
+    assert registry.progress == (1.0, "")
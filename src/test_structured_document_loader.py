@@ -0,0 +1,87 @@
+import docx
+import fitz
+
+from structured_document_loader import (
+    StructuredDocxLoader,
+    StructuredPDFLoader,
+    _merge_and_deduplicate,
+    _pack_section,
+)
+
+
+def test_pack_section_splits_chunks_at_page_boundaries():
+    """同じセクションでもページが変わったら別のチャンクにし、それぞれに自身のページ番号を付ける"""
+    lines = [("1ページ目の本文。", 0), ("続きの本文。", 0), ("2ページ目の本文。", 1)]
+
+    chunks = _pack_section("a.pdf", ["第1章", "概要"], lines, chunk_size=500)
+
+    assert [chunk.metadata["page"] for chunk in chunks] == [0, 1]
+    assert chunks[0].page_content == "第1章 > 概要\n1ページ目の本文。\n続きの本文。"
+    assert chunks[1].page_content == "第1章 > 概要\n2ページ目の本文。"
+    assert all(chunk.metadata["heading"] == "第1章 > 概要" for chunk in chunks)
+
+
+def test_merge_keeps_chunks_with_different_heading_or_page_apart():
+    """短いチャンクでも、見出しまたはページが異なる場合はまとめない"""
+    chunks = (
+        _pack_section("a.pdf", ["はじめに"], [("短い本文。", 0)], 500)
+        + _pack_section("a.pdf", ["目的"], [("別の見出しの本文。", 0)], 500)
+        + _pack_section("a.pdf", ["目的"], [("次のページの本文。", 1)], 500)
+    )
+
+    merged = _merge_and_deduplicate(chunks, chunk_size=500)
+
+    assert [(chunk.metadata["heading"], chunk.metadata["page"]) for chunk in merged] == [
+        ("はじめに", 0), ("目的", 0), ("目的", 1)
+    ]
+
+
+def test_merge_combines_short_chunks_of_same_section_and_drops_duplicates():
+    """見出し・ページが同じ短いチャンクはまとめ、本文が重複するチャンクは取り除く"""
+    first = _pack_section("a.pdf", ["手順"], [("手順1。", 2)], 500)
+    second = _pack_section("a.pdf", ["手順"], [("手順2。", 2)], 500)
+    duplicate = _pack_section("a.pdf", ["手順"], [("手順1。", 2)], 500)
+
+    merged = _merge_and_deduplicate(first + second + duplicate, chunk_size=500)
+
+    assert len(merged) == 1
+    assert merged[0].page_content == "手順\n手順1。\n手順\n手順2。"
+    assert merged[0].metadata == {"source": "a.pdf", "heading": "手順", "page": 2}
+
+
+def test_docx_sections_keep_their_own_heading(tmp_path):
+    """Wordの見出しごとにチャンクを分け、短いセクション同士もまとめずにそれぞれの見出しを残す"""
+    path = tmp_path / "規程.docx"
+    document = docx.Document()
+    document.add_heading("総則", level=1)
+    document.add_paragraph("この規程は社内の手続きを定める。")
+    document.add_heading("申請", level=2)
+    document.add_paragraph("申請は上長の承認を得て行う。")
+    document.add_heading("附則", level=1)
+    document.add_paragraph("この規程は2024年4月1日から施行する。")
+    document.save(path)
+
+    chunks = StructuredDocxLoader(str(path), chunk_size=500).load()
+
+    assert [chunk.metadata["heading"] for chunk in chunks] == ["総則", "総則 > 申請", "附則"]
+    assert chunks[1].page_content == "総則 > 申請\n申請は上長の承認を得て行う。"
+
+
+def test_pdf_section_spanning_pages_is_split_per_page(tmp_path):
+    """ページをまたぐセクションは、ページごとのチャンクとして正しいページ番号を持つ"""
+    path = tmp_path / "manual.pdf"
+    pdf = fitz.open()
+    first = pdf.new_page()
+    first.insert_text((72, 72), "Chapter 1", fontsize=20)
+    first.insert_text((72, 110), "Setup steps on the first page.", fontsize=11)
+    second = pdf.new_page()
+    second.insert_text((72, 72), "More setup steps on the second page.", fontsize=11)
+    pdf.save(str(path))
+    pdf.close()
+
+    chunks = StructuredPDFLoader(str(path), chunk_size=500).load()
+
+    assert [(chunk.metadata["heading"], chunk.metadata["page"]) for chunk in chunks] == [
+        ("Chapter 1", 0), ("Chapter 1", 1)
+    ]
+    assert "second page" in chunks[1].page_content and "first page" not in chunks[1].page_content
@@ -0,0 +1,126 @@
+import asyncio
+from collections import defaultdict
+
+import httpx
+
+from web_fetcher import WebFetcher, WebPageCache
+
+PAGE = "<html lang='ja'><head><title>お知らせ</title></head><body>{body}</body></html>"
+
+
+class StubSite:
+    """httpx.MockTransportに渡すハンドラー（ETag・Last-Modifiedによる304と、ホストごとの同時リクエスト数を記録）"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.body = "新しいお知らせ"
+        self.etag = '"v1"'
+        self.last_modified = "Wed, 01 Jan 2025 00:00:00 GMT"
+        self.fail = False
+        self.requests = []
+        self.active = defaultdict(int)
+        self.peak = defaultdict(int)
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        self.requests.append(request)
+        self.active[host] += 1
+        self.peak[host] = max(self.peak[host], self.active[host])
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail:
+                return httpx.Response(503)
+            if request.headers.get("If-None-Match") == self.etag:
+                return httpx.Response(304, headers={"ETag": self.etag})
+            return httpx.Response(
+                200,
+                headers={"ETag": self.etag, "Last-Modified": self.last_modified, "Content-Type": "text/html; charset=utf-8"},
+                text=PAGE.format(body=self.body)
+            )
+        finally:
+            self.active[host] -= 1
+
+
+def make_fetcher(site, cache=None, **kwargs):
+    return WebFetcher(cache=cache, transport=httpx.MockTransport(site), **kwargs)
+
+
+def test_fetch_converts_html_to_documents_in_input_order():
+    """取得したページは入力の順に、本文とタイトルなどのメタデータを持つドキュメントとして返す"""
+    site = StubSite()
+    urls = ["https://example.com/b", "https://example.com/a"]
+
+    results = make_fetcher(site).fetch_all(urls)
+
+    assert [url for url, _ in results] == urls
+    doc = results[0][1][0]
+    assert "新しいお知らせ" in doc.page_content
+    assert doc.metadata == {"source": urls[0], "title": "お知らせ", "language": "ja"}
+
+
+def test_conditional_request_uses_cache_on_304(tmp_path):
+    """2回目の取得ではETag・Last-Modifiedを送り、304が返ればキャッシュの内容を使う"""
+    site = StubSite()
+    cache = WebPageCache(str(tmp_path))
+    url = "https://example.com/news"
+    make_fetcher(site, cache).fetch_all([url])
+
+    fetcher = make_fetcher(site, cache)
+    (_, docs), = fetcher.fetch_all([url])
+
+    request = site.requests[-1]
+    assert request.headers["If-None-Match"] == '"v1"'
+    assert request.headers["If-Modified-Since"] == "Wed, 01 Jan 2025 00:00:00 GMT"
+    assert "新しいお知らせ" in docs[0].page_content
+    assert fetcher.stats == {"fetched": 0, "not_modified": 1, "stale": 0, "failed": 0}
+
+
+def test_changed_page_is_fetched_and_cache_updated(tmp_path):
+    """ETagが変わったページは本文を取得し直し、キャッシュも更新する"""
+    site = StubSite()
+    cache = WebPageCache(str(tmp_path))
+    url = "https://example.com/news"
+    make_fetcher(site, cache).fetch_all([url])
+
+    site.etag, site.body = '"v2"', "更新されたお知らせ"
+    (_, docs), = make_fetcher(site, cache).fetch_all([url])
+
+    assert "更新されたお知らせ" in docs[0].page_content
+    assert cache.get(url)["etag"] == '"v2"'
+
+
+def test_error_falls_back_to_stale_cache(tmp_path):
+    """取得に失敗した場合は、キャッシュがあれば前回の内容を使い、なければNoneを返す"""
+    site = StubSite()
+    cache = WebPageCache(str(tmp_path))
+    cached_url, new_url = "https://example.com/cached", "https://example.com/new"
+    make_fetcher(site, cache).fetch_all([cached_url])
+
+    site.fail = True
+    fetcher = make_fetcher(site, cache)
+    results = dict(fetcher.fetch_all([cached_url, new_url]))
+
+    assert "新しいお知らせ" in results[cached_url][0].page_content
+    assert results[new_url] is None
+    assert fetcher.stats == {"fetched": 0, "not_modified": 0, "stale": 1, "failed": 1}
+
+
+def test_requests_per_host_are_limited():
+    """同じホストへの同時リクエスト数は上限以下に抑え、別のホストとは並行して取得する"""
+    site = StubSite(delay=0.05)
+    urls = [f"https://a.example.com/{i}" for i in range(6)] + [f"https://b.example.com/{i}" for i in range(6)]
+
+    results = make_fetcher(site, max_connections_per_host=2).fetch_all(urls)
+
+    assert all(docs is not None for _, docs in results)
+    assert site.peak["a.example.com"] == 2
+    assert site.peak["b.example.com"] == 2
+
+
+def test_cache_ignores_entry_for_other_url(tmp_path):
+    """キャッシュファイルのURLが一致しない場合（ハッシュの衝突など）は使わない"""
+    cache = WebPageCache(str(tmp_path))
+    cache.put("https://example.com/a", "<html></html>", '"x"', None)
+
+    assert cache.get("https://example.com/a")["etag"] == '"x"'
+    assert cache.get("https://example.com/b") is None
@@ -0,0 +1,33 @@
+"""
+このファイルは、LLM・埋め込みモデルに送るテキストのトークン数を数える処理が記述されたファイルです。
+"""
+
+############################################################
+# ライブラリの読み込み
+############################################################
+from functools import lru_cache
+
+
+############################################################
+# 関数定義
+############################################################
+@lru_cache(maxsize=None)
+def get_token_counter(model: str):
+    """
+    トークン数を数える関数を取得（tiktokenのエンコーディングが取得できない環境では文字数で近似する）
+
+    エンコーディングの読み込みには時間がかかるため、モデルごとに1度だけ取得して使い回す
+
+    Args:
+        model: モデル名
+
+    Returns:
+        テキストを受け取り、トークン数を返す関数
+    """
+    try:
+        import tiktoken
+        encoding = tiktoken.encoding_for_model(model)
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception:
+        # 日本語は1文字≒1トークン以上になることが多いため、文字数をそのまま上限の目安として使う
+        return len
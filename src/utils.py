@@ -6,15 +6,27 @@
 # ライブラリの読み込み
 ############################################################
 import os
+import re
+import logging
+import unicodedata
+import httpx
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import streamlit as st
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.schema import HumanMessage
 from langchain_openai import ChatOpenAI
-from langchain.chains import create_history_aware_retriever, create_retrieval_chain
+from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 import constants as ct
 from filter_extraction_llm import extract_filters_from_text
+from answer_cache import SemanticAnswerCache
+from question_rewriter import QuestionRewriter, needs_rewrite
+from initialize import get_retriever_registry
+from index_builder import find_employee_csv_path
+from csv_employee_loader import EmployeeCSVLoader
+from retriever_modules.near_duplicate import split_sources
 
 ############################################################
 # 設定関連
@@ -61,6 +73,25 @@ def get_source_icon(source):
     return icon
 
 
+def iter_document_sources(documents):
+    """
+    ドキュメントの参照元を、関連性の高い順に取得（重複チャンクとして統合されたほかの参照元も含む）
+
+    Args:
+        documents: 検索されたドキュメントのリスト
+
+    Yields:
+        「参照元のありか」と「ページ番号（0始まり。取得できない場合はNone）」のタプル
+    """
+    for document in documents:
+        main_source = document.metadata["source"]
+        yield main_source, document.metadata.get("page")
+        # 統合されたほかの参照元は、ページ位置が異なる場合があるためページ番号は表示しない
+        for source in split_sources(document.metadata.get("sources")):
+            if source != main_source:
+                yield source, None
+
+
 def build_error_message(message):
     """
     エラーメッセージと管理者問い合わせテンプレートの連結
@@ -83,31 +114,53 @@ def is_employee_query(chat_message):
     ]
     return any(keyword in chat_message for keyword in keywords)
 
-def get_llm_response(chat_message):
+@st.cache_resource(show_spinner=False)
+def get_http_client():
     """
-    LLMからの回答取得
+    LLMへのリクエストで共有するHTTPクライアントを取得
 
-    Args:
-        chat_message: ユーザー入力値
+    コネクションプールを全セッション・全リクエストで使い回し、リクエストのたびにTLSハンドシェイクが発生しないようにする
 
     Returns:
-        LLMからの回答
+        HTTPクライアント
     """
-    # LLMのオブジェクトを用意
-    llm = ChatOpenAI(model_name=ct.MODEL, temperature=ct.TEMPERATURE)
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=ct.LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=ct.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS
+        ),
+        timeout=ct.LLM_HTTP_TIMEOUT
+    )
 
-    # 会話履歴なしでもLLMに理解してもらえる、独立した入力テキストを取得するためのプロンプトテンプレートを作成
-    question_generator_template = ct.SYSTEM_PROMPT_CREATE_INDEPENDENT_TEXT
-    question_generator_prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", question_generator_template),
-            MessagesPlaceholder("chat_history"),
-            ("human", "{input}")
-        ]
+
+@st.cache_resource(show_spinner=False)
+def get_llm():
+    """
+    LLMのオブジェクトを取得（プロセス内で1度だけ作成）
+
+    Returns:
+        LLMのオブジェクト
+    """
+    return ChatOpenAI(
+        model_name=ct.MODEL,
+        temperature=ct.TEMPERATURE,
+        http_client=get_http_client()
     )
 
+
+@st.cache_resource(show_spinner=False)
+def get_answer_chain(mode):
+    """
+    「モード」ごとの、検索済みのドキュメントから回答を生成するChainを取得（プロセス内で1度だけ構築）
+
+    Args:
+        mode: 回答モード（「社内文書検索」or「社内問い合わせ」）
+
+    Returns:
+        回答生成用のChain
+    """
     # モードによってLLMから回答を取得する用のプロンプトを変更
-    if st.session_state.mode == ct.ANSWER_MODE_1:
+    if mode == ct.ANSWER_MODE_1:
         question_answer_template = ct.SYSTEM_PROMPT_DOC_SEARCH
     else:
         question_answer_template = ct.SYSTEM_PROMPT_INQUIRY
@@ -120,58 +173,389 @@ def get_llm_response(chat_message):
         ]
     )
 
-    # === retrieverを社員か文書かで切り替え ===
-    if is_employee_query(chat_message):
-        retriever = st.session_state.employee_retriever
+    return create_stuff_documents_chain(get_llm(), question_answer_prompt)
+
+
+def get_question_generator_prompt():
+    """
+    会話履歴なしでもLLMに理解してもらえる、独立した入力テキストを取得するためのプロンプトテンプレートを作成
+
+    Returns:
+        プロンプトテンプレート
+    """
+    return ChatPromptTemplate.from_messages(
+        [
+            ("system", ct.SYSTEM_PROMPT_CREATE_INDEPENDENT_TEXT),
+            MessagesPlaceholder("chat_history"),
+            ("human", "{input}")
+        ]
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def get_question_rewrite_chain():
+    """
+    会話履歴をもとに、ユーザー入力を独立した質問文に書き換えるChainを取得（プロセス内で1度だけ構築）
+
+    Returns:
+        質問文の書き換え用のChain
+    """
+    return get_question_generator_prompt() | get_llm() | StrOutputParser()
+
+
+@st.cache_resource(show_spinner=False)
+def get_question_rewriter():
+    """
+    書き換えの要否判定とキャッシュ付きで質問文を書き換えるオブジェクトを取得（全セッションで共有）
+
+    Returns:
+        質問文の書き換え用のオブジェクト
+    """
+    return QuestionRewriter(get_question_rewrite_chain())
+
+
+@st.cache_resource(show_spinner=False)
+def get_history_summary_chain():
+    """
+    会話履歴の要約を更新するChainを取得（プロセス内で1度だけ構築）
+
+    Returns:
+        会話履歴の要約用のChain
+    """
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", ct.SYSTEM_PROMPT_SUMMARIZE_HISTORY),
+            MessagesPlaceholder("chat_history"),
+            ("human", "ここまでの会話の要約を更新してください。")
+        ]
+    )
+    return prompt | get_llm() | StrOutputParser()
+
+
+@st.cache_resource(show_spinner=False)
+def get_query_executor():
+    """
+    互いに依存しないLLM呼び出しを並行して実行するためのスレッドプールを取得（全セッションで共有）
+
+    Returns:
+        スレッドプール
+    """
+    return ThreadPoolExecutor(
+        max_workers=ct.QUERY_PREPARATION_MAX_WORKERS,
+        thread_name_prefix="query-preparation"
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def get_retrieval_chain(mode):
+    """
+    「モード」ごとの、retrieverで検索してから回答するChainを取得（初回のみ構築）
+
+    retrieverはChainに組み込まず、呼び出し時の設定（「configurable」の「retriever」）で渡す。
+    ファイル監視でretrieverが差し替えられてもChainを作り直さないため、古いretrieverをキャッシュに残さない
+
+    Args:
+        mode: 回答モード（「社内文書検索」or「社内問い合わせ」）
+
+    Returns:
+        回答生成用のChain
+    """
+    # 質問文の書き換えは、会話履歴があり単独で意味が通らない入力の場合のみLLMで行う
+    question_rewriter = get_question_rewriter()
+
+    def retrieve(x, config):
+        standalone_question = question_rewriter.rewrite(x["input"], x["chat_history"])
+        return config["configurable"]["retriever"].invoke(standalone_question, config)
+
+    history_aware_retriever = RunnableLambda(retrieve).with_config(run_name="chat_retriever_chain")
+    return create_retrieval_chain(history_aware_retriever, get_answer_chain(mode))
+
+
+@st.cache_resource(show_spinner=False)
+def get_structured_query_chain(mode):
+    """
+    検索済みのドキュメント（入力の「context」）から回答を生成するChainを取得
+
+    社員名簿の検索エンジンでの抽出結果や、事前に実行した検索の結果から回答する場合に使う。
+
+    出力の形式（「input」「context」「answer」）は、retrieverを使うChainと同じ
 
-        # 🔹 LLMでフィルタ抽出
-        filters = extract_filters_from_text(chat_message)
+    Args:
+        mode: 回答モード（「社内文書検索」or「社内問い合わせ」）
+
+    Returns:
+        回答生成用のChain
+    """
+    return RunnablePassthrough.assign(answer=get_answer_chain(mode))
+
+
+def display_extracted_filters(filters):
+    """
+    LLMが抽出したフィルタ条件を画面に表示（ユーザーに明示）
+
+    Args:
+        filters: 抽出したフィルタ条件
+    """
+    st.markdown("#### 🧠 AIが抽出した検索条件")
+    for key, value in filters.items():
+        if value:
+            st.markdown(f"- **{key}**: {value}")
+    st.markdown("（※条件が意図と違う場合は、修正して再入力してください）")
+
+
+def prepare_llm_chain(chat_message):
+    """
+    ユーザー入力に応じたChainと、Chainに渡す入力データを用意
+
+    Args:
+        chat_message: ユーザー入力値
+
+    Returns:
+        回答生成用のChainと、Chainに渡す入力データのタプル
+    """
+    chain_input = {
+        "input": chat_message,
+        "chat_history": st.session_state.chat_history.messages()
+    }
+
+    # === 社員に関する質問は、フィルタ条件に応じて名簿の検索エンジンかretrieverで検索済みのドキュメントから回答 ===
+    if is_employee_query(chat_message):
+        # 検索結果を上位のみに絞り込んだかどうか（該当社員数の表示に使う）
+        st.session_state.employee_results_truncated = False
+
+        # 🔹 質問文の書き換え（LLMを使う場合）は、フィルタ抽出と依存しないため並行して実行する
+        rewrite_future = None
+        question_rewriter = get_question_rewriter()
+        if ct.PARALLEL_QUERY_PREPARATION and needs_rewrite(chat_message, chain_input["chat_history"]):
+            rewrite_future = get_query_executor().submit(
+                question_rewriter.rewrite, chat_message, chain_input["chat_history"]
+            )
+
+        # 🔹 LLMでフィルタ抽出（名簿上の部署名・従業員区分がそのまま含まれていればLLMは使わない）
+        vocabulary = get_roster_vocabulary()
+        filters = extract_filters_from_text(
+            chat_message,
+            departments=vocabulary["department"],
+            employment_types=vocabulary["employment_type"],
+            roles=vocabulary["role"],
+            skills=vocabulary["skill"]
+        )
 
         # ✅ フィルタキーのマッピング変換
         key_mapping = {
             "部署": "department",
-            "従業員区分": "employment_type"  # 今後の拡張を見据えて、英語に統一
+            "従業員区分": "employment_type",  # 今後の拡張を見据えて、英語に統一
+            "役職": "role",
+            "スキル": "skill",
+            "入社年": "join_year"
         }      
         converted_filters = {key_mapping.get(k, k): v for k, v in filters.items() if v}
 
-        # 🔹 フィルタ条件を画面に表示（ユーザーに明示）
         if filters:
-            st.markdown("#### 🧠 AIが抽出した検索条件")
-            for key, value in filters.items():
-                if value:
-                    st.markdown(f"- **{key}**: {value}")
-            st.markdown("（※条件が意図と違う場合は、修正して再入力してください）")
-
-            # 🔹 検索フィルタに反映
-            retriever.search_kwargs["filter"] = {
-                "$and": [{"category": "employee"}] + [{k: v} for k, v in converted_filters.items()]
-            }
-
-            # 🔍 フィルタ条件をデバッグ出力
-            print("[DEBUG] 設定された検索フィルタ:", retriever.search_kwargs["filter"])
-    else:
-        retriever = st.session_state.full_retriever
+            display_extracted_filters(filters)
+
+        # 🔹 名簿の列だけで答えられる条件であれば、ベクトル検索を使わずに名簿から漏れなく抽出する
+        query_engine = get_retriever_registry().get("employee_query_engine")
+        if query_engine is not None and query_engine.supports(converted_filters):
+            positions = query_engine.query(converted_filters)
+            context = [query_engine.summarize(positions, converted_filters)] + query_engine.to_documents(positions)
+            logging.getLogger(ct.LOGGER_NAME).debug(f"社員名簿の検索エンジンで抽出: {converted_filters} → {len(positions)}名")
+            if rewrite_future:
+                # 書き換え後の質問文は検索にしか使わないため、まだ始まっていなければ取り消す
+                rewrite_future.cancel()
+            return get_structured_query_chain(st.session_state.mode), {**chain_input, "context": context}
+
+        # 🔹 検索フィルタに反映（ベクターストアのメタデータにある項目のみ）
+        # 共有のretrieverは変更せず、このリクエスト専用の条件付きretrieverを作る
+        metadata_filters = {k: v for k, v in converted_filters.items() if k in ("department", "employment_type")}
+        retriever = st.session_state.employee_retriever.with_filters(metadata_filters)
+
+        # 🔍 フィルタ条件をデバッグ出力
+        logging.getLogger(ct.LOGGER_NAME).debug(f"設定された検索フィルタ: {retriever.search_filter}")
+
+        # 🔹 フィルタ抽出と書き換えの両方がそろった時点で検索し、回答生成のChainには検索結果を直接渡す
+        if rewrite_future:
+            standalone_question = rewrite_future.result()
+        else:
+            standalone_question = question_rewriter.rewrite(chat_message, chain_input["chat_history"])
+        context = retriever.invoke(standalone_question)
+
+        # 🔹 条件のない意味検索の場合のみ、最大100件の検索結果を質問文との関連度順に並べ替え、上位のみをLLMに渡す
+        # （部署・従業員区分で絞り込んだ結果は条件に一致する社員の一覧のため、件数を削らずにすべて渡す）
+        reranker = get_retriever_registry().get("reranker")
+        if reranker is not None and not metadata_filters:
+            st.session_state.employee_results_truncated = len(context) > ct.RERANK_EMPLOYEE_TOP_N
+            context = reranker.rerank(standalone_question, context, ct.RERANK_EMPLOYEE_TOP_N)
+        return get_structured_query_chain(st.session_state.mode), {**chain_input, "context": context}
+
+    # 構築済みのChainを取得（初回のみ構築）し、このセッションのretrieverで検索するよう設定
+    chain = get_retrieval_chain(st.session_state.mode).with_config(
+        configurable={"retriever": st.session_state.full_retriever}
+    )
+
+    return chain, chain_input
+
+
+def append_chat_history(chat_message, answer):
+    """
+    LLMとのやりとり用の会話ログに、ユーザー入力とLLMからの回答を追加
+
+    会話ログが一定のサイズを超えた場合、古いやりとりはバックグラウンドで要約に置き換える
+
+    Args:
+        chat_message: ユーザー入力値
+        answer: LLMからの回答
+    """
+    chat_history = st.session_state.chat_history
+    chat_history.add_turn(chat_message, answer)
+
+    summary_chain = get_history_summary_chain()
+    chat_history.compact(
+        lambda summary, messages: summary_chain.invoke({"summary": summary or "（なし）", "chat_history": messages}),
+        executor=get_query_executor()
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def get_roster_vocabulary():
+    """
+    社員名簿に登場する部署名・従業員区分・役職・スキルの一覧を取得（プロセス内で1度だけ読み込む）
+
+    Returns:
+        「department」「employment_type」「role」「skill」をキーとする辞書
+    """
+    try:
+        return EmployeeCSVLoader(find_employee_csv_path()).load_vocabulary()
+    except Exception as e:
+        logging.getLogger(ct.LOGGER_NAME).warning(f"社員名簿の部署名・従業員区分の取得に失敗: {e}")
+        return {"department": [], "employment_type": [], "role": [], "skill": []}
+
+
+@st.cache_resource(show_spinner=False)
+def get_answer_cache():
+    """
+    全セッションで共有する回答キャッシュを取得
 
-    # retriever に基づいて chain を構築
-    history_aware_retriever = create_history_aware_retriever(
-        llm, retriever, question_generator_prompt
+    Returns:
+        回答キャッシュ
+    """
+    return SemanticAnswerCache(
+        similarity_threshold=ct.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+        ttl_seconds=ct.ANSWER_CACHE_TTL_SECONDS,
+        max_entries=ct.ANSWER_CACHE_MAX_ENTRIES
     )
 
-    question_answer_chain = create_stuff_documents_chain(llm, question_answer_prompt)
 
-    chain = create_retrieval_chain(history_aware_retriever, question_answer_chain)
+def extract_cache_entities(chat_message):
+    """
+    回答キャッシュで完全一致を条件とする、質問文に含まれる固有の語（名簿上の部署名・従業員区分と数値）を抽出
+
+    Args:
+        chat_message: ユーザー入力値
+
+    Returns:
+        抽出した語を並べ替えたタプル
+    """
+    text = unicodedata.normalize("NFKC", chat_message)
+    vocabulary = get_roster_vocabulary()
+    terms = [term for term in vocabulary["department"] + vocabulary["employment_type"] if term and term in text]
+    return tuple(sorted(set(terms + re.findall(r"\d+", text))))
+
+
+def get_answer_cache_key(chat_message):
+    """
+    回答キャッシュの検索・保存に使うキー（モード、質問文の埋め込みベクトル、インデックスのバージョン、固有の語）を取得
+
+    会話の流れによって意味が変わる質問に誤った回答を返さないよう、会話履歴がない状態の質問のみを対象とする
+    社員に関する質問は、部署名・氏名などの条件の違いで回答が変わるため対象外とする
+
+    Args:
+        chat_message: ユーザー入力値
+
+    Returns:
+        「mode」「query_vector」「index_version」「entities」をキーとする辞書（対象外の場合はNone）
+    """
+    if not ct.ENABLE_ANSWER_CACHE or st.session_state.chat_history or is_employee_query(chat_message):
+        return None
+
+    # 検索時と同じ埋め込みモデルを使うことで、同じ質問文の埋め込みは埋め込みキャッシュから返される
+    embeddings = st.session_state.full_retriever.vectorstore.embeddings
+    return {
+        "mode": st.session_state.mode,
+        "query_vector": embeddings.embed_query(chat_message),
+        "index_version": get_retriever_registry().version,
+        "entities": extract_cache_entities(chat_message)
+    }
+
+
+def get_llm_response(chat_message):
+    """
+    LLMからの回答取得
+
+    Args:
+        chat_message: ユーザー入力値
+
+    Returns:
+        LLMからの回答
+    """
+    # 似た質問への回答がキャッシュにあれば、LLMを呼ばずにそのまま返す
+    cache_key = get_answer_cache_key(chat_message)
+    if cache_key:
+        cached = get_answer_cache().lookup(**cache_key)
+        if cached:
+            append_chat_history(chat_message, cached["answer"])
+            return {"input": chat_message, "context": cached["context"], "answer": cached["answer"]}
+
+    chain, chain_input = prepare_llm_chain(chat_message)
 
     # LLMへのリクエストとレスポンス取得
-    llm_response = chain.invoke({
-        "input": chat_message,
-        "chat_history": st.session_state.chat_history
-    })
+    llm_response = chain.invoke(chain_input)
 
     # 会話履歴に追加
-    st.session_state.chat_history.extend([
-        HumanMessage(content=chat_message),
-        llm_response["answer"]
-    ])
+    append_chat_history(chat_message, llm_response["answer"])
+
+    if cache_key:
+        get_answer_cache().store(**cache_key, answer=llm_response["answer"], context=llm_response["context"])
 
     return llm_response
 
+
+def stream_llm_response(chat_message):
+    """
+    LLMからの回答を、生成されたトークンから順次取得
+
+    Args:
+        chat_message: ユーザー入力値
+
+    Yields:
+        検索完了時に「("context", 検索されたドキュメントのリスト)」を1回、
+        以降は回答のトークンが生成されるたびに「("answer", トークン)」
+    """
+    # 似た質問への回答がキャッシュにあれば、LLMを呼ばずにそのまま返す
+    cache_key = get_answer_cache_key(chat_message)
+    if cache_key:
+        cached = get_answer_cache().lookup(**cache_key)
+        if cached:
+            yield "context", cached["context"]
+            yield "answer", cached["answer"]
+            append_chat_history(chat_message, cached["answer"])
+            return
+
+    chain, chain_input = prepare_llm_chain(chat_message)
+
+    context = []
+    answer_tokens = []
+    for chunk in chain.stream(chain_input):
+        if "context" in chunk:
+            context = chunk["context"]
+            yield "context", context
+        if "answer" in chunk:
+            answer_tokens.append(chunk["answer"])
+            yield "answer", chunk["answer"]
+
+    # 回答がすべて生成されてから会話履歴に追加
+    answer = "".join(answer_tokens)
+    append_chat_history(chat_message, answer)
+
+    if cache_key:
+        get_answer_cache().store(**cache_key, answer=answer, context=context)
@@ -0,0 +1,266 @@
+"""
+このファイルは、Webページのデータソースを並行取得し、ローカルのキャッシュを使って変更のないページの再取得を省く処理が記述されたファイルです。
+"""
+
+############################################################
+# ライブラリの読み込み
+############################################################
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+from langchain_core.documents import Document
+
+import constants as ct
+
+
+############################################################
+# 関数定義
+############################################################
+def detect_encoding(content: bytes) -> Optional[str]:
+    """
+    Content-Typeに文字コードの指定がないページの文字コードを推定（日本語のShift_JISやEUC-JPのページ向け）
+
+    Args:
+        content: レスポンスの本文
+
+    Returns:
+        推定した文字コード（推定できない場合はNone）
+    """
+    import charset_normalizer
+    best = charset_normalizer.from_bytes(content).best()
+    return best.encoding if best else None
+
+
+def html_to_documents(url: str, html: str) -> List[Document]:
+    """
+    HTMLから本文のテキストを取り出し、ドキュメントを作成（WebBaseLoaderと同じ本文・メタデータの形式）
+
+    Args:
+        url: ページのURL
+        html: ページのHTML
+
+    Returns:
+        ドキュメントのリスト（1ページ1件）
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "xml" if url.endswith(".xml") else "html.parser")
+    metadata = {"source": url}
+    if title := soup.find("title"):
+        metadata["title"] = title.get_text()
+    if description := soup.find("meta", attrs={"name": "description"}):
+        metadata["description"] = description.get("content", "No description found.")
+    if html_tag := soup.find("html"):
+        metadata["language"] = html_tag.get("lang", "No language found.")
+    return [Document(page_content=soup.get_text(), metadata=metadata)]
+
+
+def fetch_web_documents(urls: List[str]) -> List[Tuple[str, Optional[List[Document]]]]:
+    """
+    設定に従ってWebページを並行取得し、ドキュメントに変換
+
+    Args:
+        urls: 取得するURLのリスト
+
+    Returns:
+        「URL」と「ドキュメントのリスト（取得できず、キャッシュもない場合はNone）」のタプルのリスト（入力順）
+    """
+    cache = WebPageCache(ct.WEB_PAGE_CACHE_DIR) if ct.ENABLE_WEB_PAGE_CACHE else None
+    fetcher = WebFetcher(
+        cache=cache,
+        timeout=ct.WEB_FETCH_TIMEOUT_SECONDS,
+        max_connections=ct.WEB_FETCH_MAX_CONNECTIONS,
+        max_connections_per_host=ct.WEB_FETCH_MAX_CONNECTIONS_PER_HOST,
+        user_agent=ct.WEB_FETCH_USER_AGENT
+    )
+    return fetcher.fetch_all(urls)
+
+
+############################################################
+# クラス定義
+############################################################
+class WebPageCache:
+    """
+    取得したページのHTMLと検証用のヘッダー（ETag / Last-Modified）をURLごとのJSONファイルに保存するキャッシュ
+
+    次回の取得時にこれらのヘッダーで条件付きリクエストを送り、304（変更なし）が返ればキャッシュのHTMLを使う。
+    """
+
+    def __init__(self, cache_dir: str):
+        """
+        Args:
+            cache_dir: キャッシュファイルの保存先フォルダ
+        """
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json")
+
+    def get(self, url: str) -> Optional[Dict]:
+        """
+        キャッシュしたページを取得
+
+        Args:
+            url: ページのURL
+
+        Returns:
+            「html」「etag」「last_modified」「fetched_at」をキーとする辞書（キャッシュがない場合はNone）
+        """
+        try:
+            with open(self._path(url), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get("url") == url else None
+
+    def put(self, url: str, html: str, etag: Optional[str], last_modified: Optional[str]):
+        """
+        ページをキャッシュに保存（一時ファイルに書き出してから置き換えることで、書き込み途中の破損を防ぐ）
+
+        Args:
+            url: ページのURL
+            html: ページのHTML
+            etag: レスポンスのETagヘッダー
+            last_modified: レスポンスのLast-Modifiedヘッダー
+        """
+        path = self._path(url)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        entry = {
+            "url": url,
+            "html": html,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time()
+        }
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+class WebFetcher:
+    """
+    複数のWebページを、接続を使い回す非同期HTTPクライアントで並行取得するクラス
+
+    - 同じホストへの同時リクエスト数を制限し、取得先のサーバーに負荷をかけすぎないようにする
+    - キャッシュがあるページは条件付きリクエスト（If-None-Match / If-Modified-Since）を送り、変更がなければ本文を受け取らない
+    - 通信エラー時は、キャッシュがあればそれを使う（起動時の一時的な障害で、検索対象からページが消えないようにする）
+    """
+
+    def __init__(
+        self,
+        cache: Optional[WebPageCache] = None,
+        timeout: float = 10.0,
+        max_connections: int = 16,
+        max_connections_per_host: int = 4,
+        user_agent: Optional[str] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        """
+        Args:
+            cache: ページのキャッシュ（省略時は毎回取得する）
+            timeout: 1リクエストあたりのタイムアウト（秒）
+            max_connections: 全体での同時接続数の上限
+            max_connections_per_host: 同じホストへの同時リクエスト数の上限
+            user_agent: リクエストに付けるUser-Agent
+            transport: HTTPクライアントのトランスポート（動作確認でモックのサーバーに差し替える場合に指定）
+        """
+        self.cache = cache
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.user_agent = user_agent
+        self.transport = transport
+        self.logger = logging.getLogger(ct.LOGGER_NAME)
+        self.stats = {"fetched": 0, "not_modified": 0, "stale": 0, "failed": 0}
+
+    def fetch_all(self, urls: List[str]) -> List[Tuple[str, Optional[List[Document]]]]:
+        """
+        Webページを並行取得し、ドキュメントに変換
+
+        Args:
+            urls: 取得するURLのリスト
+
+        Returns:
+            「URL」と「ドキュメントのリスト（取得できず、キャッシュもない場合はNone）」のタプルのリスト（入力順）
+        """
+        if not urls:
+            return []
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.afetch_all(urls))
+
+        # すでにイベントループが動いているスレッドから呼ばれた場合は、別スレッドで実行する
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self.afetch_all(urls)).result()
+
+    async def afetch_all(self, urls: List[str]) -> List[Tuple[str, Optional[List[Document]]]]:
+        started = time.monotonic()
+        host_limits: Dict[str, asyncio.Semaphore] = defaultdict(
+            lambda: asyncio.Semaphore(self.max_connections_per_host)
+        )
+        headers = {"User-Agent": self.user_agent} if self.user_agent else {}
+
+        async with httpx.AsyncClient(
+            timeout=httpx.Timeout(self.timeout),
+            limits=httpx.Limits(max_connections=self.max_connections),
+            headers=headers,
+            follow_redirects=True,
+            default_encoding=lambda content: detect_encoding(content) or "utf-8",
+            transport=self.transport
+        ) as client:
+
+            async def fetch(url: str):
+                async with host_limits[urlsplit(url).netloc]:
+                    return url, await self._fetch_one(client, url)
+
+            results = await asyncio.gather(*(fetch(url) for url in urls))
+
+        self.logger.info(
+            f"Web読み込み完了: {len(urls)}件（{time.monotonic() - started:.2f}秒, 取得{self.stats['fetched']}件, "
+            f"変更なし{self.stats['not_modified']}件, キャッシュ使用{self.stats['stale']}件, 失敗{self.stats['failed']}件）"
+        )
+        return list(results)
+
+    async def _fetch_one(self, client: httpx.AsyncClient, url: str) -> Optional[List[Document]]:
+        cached = self.cache.get(url) if self.cache else None
+        request_headers = {}
+        if cached:
+            if cached.get("etag"):
+                request_headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                request_headers["If-Modified-Since"] = cached["last_modified"]
+
+        try:
+            response = await client.get(url, headers=request_headers)
+            if response.status_code == 304 and cached:
+                self.stats["not_modified"] += 1
+                self.logger.info(f"Webページに変更なし（キャッシュを使用）: {url}")
+                return html_to_documents(url, cached["html"])
+            response.raise_for_status()
+        except Exception as e:
+            if cached:
+                self.stats["stale"] += 1
+                self.logger.warning(f"Web読み込みエラーのため、前回取得した内容を使います {url}: {type(e).__name__}: {e}")
+                return html_to_documents(url, cached["html"])
+            self.stats["failed"] += 1
+            self.logger.error(f"Web読み込みエラー {url}: {type(e).__name__}: {e}")
+            return None
+
+        html = response.text
+        if self.cache:
+            self.cache.put(url, html, response.headers.get("etag"), response.headers.get("last-modified"))
+        self.stats["fetched"] += 1
+        self.logger.info(f"Web読み込み成功: {url}")
+        return html_to_documents(url, html)